@@ -0,0 +1,38 @@
+"""
+Benchmark of assembly of Fourier kernels (projections) on grids of increasing size.
+
+The kernels are built by broadcasting one-dimensional frequencies, so that
+the time per grid point should stay (roughly) constant, i.e. the build time
+scales linearly with the number of grid points.
+
+Run as: python examples/benchmarks/kernel_build.py
+"""
+import numpy as np
+from ffthompy.general.base import Timer
+import ffthompy.projections as proj
+from ffthompy.tensors.projection import (scalar, elasticity_small_strain,
+                                        elasticity_large_deformation)
+
+print('running benchmark of kernel assembly...')
+
+builders = {'projections.scalar': lambda N, Y: proj.scalar(N, Y),
+            'projections.elasticity': lambda N, Y: proj.elasticity(N, Y),
+            'tensors.projection.scalar': lambda N, Y: scalar(N, Y),
+            'elasticity_small_strain': lambda N, Y: elasticity_small_strain(N, Y),
+            'elasticity_large_deformation': lambda N, Y: elasticity_large_deformation(N, Y)}
+
+N_list = [8, 16, 32, 48, 64]
+dim = 3
+Y = np.ones(dim)
+
+for name, builder in builders.items():
+    print('\n== {} =========='.format(name))
+    print('{:>6} {:>12} {:>12} {:>16}'.format('N', 'points', 'time [s]', 'time/point [ns]'))
+    for n in N_list:
+        N = n*np.ones(dim, dtype=np.int)
+        tim = Timer(name=name)
+        kernels = builder(N, Y)
+        tim.measure(print_time=False)
+        del kernels
+        t = tim.vals[0][2]
+        print('{:>6} {:>12} {:>12.4f} {:>16.2f}'.format(n, np.prod(N), t, 1e9*t/np.prod(N)))
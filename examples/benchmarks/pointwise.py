@@ -0,0 +1,53 @@
+"""
+Benchmark of strategies of pointwise products of matrices with vectors
+(ffthompy.tensors.pointwise), i.e. of application of material coefficients
+and dense projections (multype 21 and 42) on grids of increasing size.
+
+The vectors are stored contiguously or with the grid axes in the transposed
+order (as values from FFT backends). The strategy 'auto' should be close to
+the fastest strategy for every shape and layout; the last column names the
+fastest strategy. The strategy 'numba' (if numba is installed, see
+ffthompy.kernels) is not chosen by 'auto'; on one core, it was 1.4-5 times
+slower than the fastest strategy for all shapes and layouts.
+
+Run as: python examples/benchmarks/pointwise.py
+"""
+import itertools
+import numpy as np
+from timeit import repeat
+from ffthompy.tensors import pointwise
+
+print('running benchmark of pointwise products (threads={})...'.format(
+    pointwise.config['threads']))
+
+# shapes of matrices: scalar problem in 2d/3d, elasticity in Mandel's notation
+# and elasticity with full strains (dim, dim, dim, dim) reshaped to (dim**2, dim**2)
+shapes = {'scalar 2d': ((2, 2), 2), 'scalar 3d': ((3, 3), 3),
+          'Mandel 3d': ((6, 6), 3), 'full 3d': ((9, 9), 3)}
+N_list = [8, 16, 32, 64, 128]
+dtype = np.float64
+
+for (name, (mshape, dim)), layout in itertools.product(shapes.items(),
+                                                     ['contiguous', 'transposed']):
+    print('\n== {} ({} vectors) =========='.format(name, layout))
+    print(('{:>6} {:>10}'+len(pointwise.strategies+['auto'])*' {:>10}'+' {:>10}').format(
+        'N', 'points', *(pointwise.strategies+['auto', 'fastest'])))
+    for n in N_list:
+        if n**dim > 2**18:
+            continue
+        N = dim*(n,)
+        A = np.random.random(mshape+N).astype(dtype)
+        x = np.random.random(mshape[1:]+N).astype(dtype)
+        if layout in ['transposed']: # e.g. layout of values from FFT backends
+            x = np.ascontiguousarray(np.swapaxes(x, 1, -1))
+            x = np.swapaxes(x, 1, -1)
+        out = np.empty(mshape[:1]+N, dtype=dtype)
+        number = max(1, int(2**20/np.prod(N)))
+        times = []
+        for strategy in pointwise.strategies+['auto']:
+            t = min(repeat(lambda: pointwise.matvec(A, x, out=out, strategy=strategy),
+                           number=number, repeat=3))/number
+            times.append(t)
+        fastest = pointwise.strategies[int(np.argmin(times[:-1]))]
+        print(('{:>6} {:>10}'+len(times)*' {:>10.2e}'+' {:>10}').format(n, np.prod(N), *times,
+                                                                        fastest))
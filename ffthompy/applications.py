@@ -1,11 +1,17 @@
 import numpy as np
 import ffthompy.projections as proj
 from ffthompy.materials import Material
+from ffthompy.mechanics.matcoef import ElasticTensor
 from ffthompy.postprocess import postprocess, add_macro2minimizer
 from ffthompy.general.solver import linear_solver
-from ffthompy.general.solver_pp import CallBack, CallBack_GA
+from ffthompy.general.solver_pp import CallBack, CallBack_GA, CallBack_block
 from ffthompy.general.base import Timer
-from ffthompy.tensors import Tensor, DFT, Operator
+from ffthompy.tensors import Tensor, DFT, Operator, unstack
+from ffthompy.tensors.projection import (symmetric_kernel, ScalarProjection,
+                                        ElasticityProjection, ScalarGreen, ElasticityGreen)
+from ffthompy.tensors.distributed import (distribute, from_local, gather, get_comm, local_slice,
+                                          DistributedDFT)
+from ffthompy.trigpol import fft_form_default
 
 
 def scalar(problem):
@@ -20,8 +26,44 @@ def scalar(problem):
     pb = problem
     print(pb)
 
+    # mirror-symmetric cell; the kernels are adjusted to the parity of loads
+    symmetric = pb.solve.get('symmetric', False)
+    fft_form = 's' if symmetric else fft_form_default
+    # slab decomposition of the grid over MPI processes (mpi4py)
+    distributed = pb.solve.get('distributed', False)
+    if symmetric and distributed:
+        raise NotImplementedError('Distributed solution on mirror-symmetric cell.')
+    # precision of material coefficients, kernels and fields (e.g. numpy.float32)
+    dtype = pb.solve.get('dtype', None)
+    # symmetric material coefficients and kernels stored as upper triangles
+    packed = get_packed(pb, symmetric, distributed)
+    # all macroscopic loads solved at once by block conjugate gradients
+    block = get_block(pb, symmetric, distributed)
+    # Green operator of homogeneous reference medium preconditioning the solver
+    precond = get_precond(pb, symmetric, distributed, block)
+
+    # matrix-free projections evaluate the kernels on the fly from frequencies
+    matrix_free = pb.solve.get('matrix_free', not symmetric)
+    if matrix_free and symmetric:
+        raise NotImplementedError('Matrix-free projections on mirror-symmetric cell.')
+    if not matrix_free and distributed: # every process evaluates its block of frequencies
+        raise NotImplementedError('Dense kernels on distributed grid.')
+
+    # discrete derivative defining the projections (spectral or finite differences)
+    scheme = get_scheme(pb, symmetric)
+    # unlike the spectral derivative, finite differences are unique at Nyquist frequencies
+    NyqNul = scheme in ['spectral']
+
     # Fourier projections
-    _, hG1N, hG2N = proj.scalar(pb.solve['N'], pb.Y, NyqNul=True, tensor=True)
+    if matrix_free:
+        hG1N = ScalarProjection(pb.solve['N'], pb.Y, kind='G1', NyqNul=NyqNul,
+                                fft_form=fft_form_default, scheme=scheme)
+        hG2N = ScalarProjection(pb.solve['N'], pb.Y, kind='G2', NyqNul=NyqNul,
+                                fft_form=fft_form_default, scheme=scheme)
+    else:
+        _, hG1N, hG2N = proj.scalar(pb.solve['N'], pb.Y, NyqNul=NyqNul, tensor=True,
+                                    fft_form=0 if symmetric else fft_form_default, dtype=dtype,
+                                    scheme=scheme)
 
     if pb.solve['kind'] is 'GaNi':
         Nbar = pb.solve['N']
@@ -29,9 +71,15 @@ def scalar(problem):
         Nbar = 2*pb.solve['N'] - 1
         hG1N = hG1N.enlarge(Nbar)
         hG2N = hG2N.enlarge(Nbar)
+    if packed and not matrix_free:
+        hG1N, hG2N = hG1N.pack(), hG2N.pack()
+    if symmetric: # kernels built on the whole cell, restricted to non-negative frequencies
+        hG1N, hG2N = symmetric_kernel(hG1N), symmetric_kernel(hG2N)
 
-    FN = DFT(name='FN', inverse=False, N=Nbar)
-    FiN = DFT(name='FiN', inverse=True, N=Nbar)
+    if distributed:
+        hG1N, hG2N = distribute(hG1N), distribute(hG2N)
+    FN = get_DFT(name='FN', inverse=False, N=Nbar, fft_form=fft_form, distributed=distributed)
+    FiN = get_DFT(name='FiN', inverse=True, N=Nbar, fft_form=fft_form, distributed=distributed)
 
     G1N = Operator(name='G1', mat=[[FiN, hG1N, FN]])
     G2N = Operator(name='G2', mat=[[FiN, hG2N, FN]])
@@ -46,48 +94,80 @@ def scalar(problem):
         mat = Material(pb.material)
 
         if pb.solve['kind'] is 'GaNi':
-            A = mat.get_A_GaNi(pb.solve['N'], primaldual)
+            A = get_A_GaNi(mat, pb.solve['N'], primaldual, dtype=dtype, distributed=distributed)
         elif pb.solve['kind'] is 'Ga':
-            A = mat.get_A_Ga(Nbar=Nbar, primaldual=primaldual)
+            A = mat.get_A_Ga(Nbar=Nbar, primaldual=primaldual, dtype=dtype)
+        if precond: # reference medium from unpacked coefficients
+            A0 = get_reference(A, pb.physics, anisotropic=(primaldual is 'primal' and
+                                                            pb.solver['kind'].lower() in ['cg']))
+        if packed:
+            A = A.pack()
 
         if primaldual is 'primal':
-            GN = G1N
+            GN, hGN = G1N, hG1N
         else:
-            GN = G2N
-
-        Afun = Operator(name='FiGFA', mat=[[GN, A]])
-
-        for iL in np.arange(pb.dim): # iteration over unitary loads
-            E = np.zeros(pb.dim)
-            E[iL] = 1
-            print(('macroscopic load E = ' + str(E)))
-            EN = Tensor(name='EN', N=Nbar, shape=(pb.dim,), Fourier=False)
-            EN.set_mean(E)
-            # initial approximation for solvers
-            x0 = Tensor(name='x0', N=Nbar, shape=(pb.dim,), Fourier=False)
-
-            B = Afun(-EN) # RHS
-
-            if not hasattr(pb.solver, 'callback'):
-                cb = CallBack(A=Afun, B=B)
-            elif pb.solver['callback'] == 'detailed':
-                cb = CallBack_GA(A=Afun, B=B, EN=EN, A_Ga=A, GN=GN)
-            else:
-                raise NotImplementedError("The solver callback (%s) is not \
-                    implemented" % (pb.solver['callback']))
+            GN, hGN = G2N, hG2N
+
+        if precond: # Green operator of reference medium in place of the projection
+            hGammaN = ScalarGreen(pb.solve['N'], pb.Y, A0,
+                                  kind='G1' if primaldual is 'primal' else 'G2', NyqNul=NyqNul,
+                                  fft_form=fft_form_default, scheme=scheme).enlarge(Nbar)
+            GammaN = Operator(name='Gamma0', mat=[[FiN, hGammaN, FN]])
+            Afun = Operator(name='FiGammaFA', mat=[[GammaN, A]])
+            # conjugate gradients in the scalar product (x, A0*y) are preconditioned
+            par = dict(pb.solver, scal=hGammaN.scal)
+        else:
+            Afun = Operator(name='FiGFA', mat=[[GN, distribute(A) if distributed else A]])
+            par = pb.solver
+        if symmetric: # assembled on the whole cell (also for postprocessing), then restricted
+            As = A.fold()
 
-            print(('solver : {}'.format(pb.solver['kind'])))
-            X, info = linear_solver(solver=pb.solver['kind'], Afun=Afun, B=B,
-                                    x0=x0, par=pb.solver, callback=cb)
+        if block:
+            solutions, results = solve_block(pb, Afun, Nbar, pb.dim, fft_form, dtype)
+        else:
+            for iL in np.arange(pb.dim): # iteration over unitary loads
+                E = np.zeros(pb.dim)
+                E[iL] = 1
+                print(('macroscopic load E = ' + str(E)))
+                parity = None
+                if symmetric:
+                    parity = get_parity(pb.physics, pb.dim, iL)
+                    GN, Afun = get_symmetric_operators(FN, FiN, hGN, As, parity)
+                EN = Tensor(name='EN', N=Nbar, shape=(pb.dim,), Fourier=False,
+                            fft_form=fft_form, parity=parity, dtype=dtype)
+                EN.set_mean(E)
+                if distributed:
+                    EN = distribute(EN)
+                # initial approximation for solvers
+                x0 = EN.zeros_like(name='x0')
+
+                B = Afun(-EN) # RHS
+
+                if pb.solver.get('callback') is None:
+                    cb = CallBack(A=Afun, B=B)
+                elif pb.solver['callback'] == 'detailed':
+                    cb = CallBack_GA(A=Afun, B=B, EN=EN, A_Ga=A, GN=GN,
+                                     every=pb.solver.get('callback_every', 10))
+                else:
+                    raise NotImplementedError("The solver callback (%s) is not \
+                    implemented" % (pb.solver['callback']))
 
-            solutions[iL] = add_macro2minimizer(X, E)
-            results[iL] = {'cb': cb, 'info': info}
-            print(cb)
+                print(('solver : {}'.format(pb.solver['kind'])))
+                X, info = linear_solver(solver=pb.solver['kind'], Afun=Afun, B=B,
+                                        x0=x0, par=par, callback=cb)
+
+                if symmetric:
+                    X = X.unfold()
+                elif distributed:
+                    X = X.gather()
+                solutions[iL] = add_macro2minimizer(X, E)
+                results[iL] = {'cb': cb, 'info': info}
+                print(cb)
         tim.measure()
 
         # POSTPROCESSING
-        del Afun, B, E, EN, GN, X
-        postprocess(pb, A, mat, solutions, results, primaldual)
+        del Afun, GN
+        postprocess(pb, gather(A), mat, solutions, results, primaldual)
 
 
 def elasticity(problem):
@@ -102,24 +182,67 @@ def elasticity(problem):
     pb = problem
     print(pb)
 
+    # mirror-symmetric cell; the kernels are adjusted to the parity of loads
+    symmetric = pb.solve.get('symmetric', False)
+    fft_form = 's' if symmetric else fft_form_default
+    # slab decomposition of the grid over MPI processes (mpi4py)
+    distributed = pb.solve.get('distributed', False)
+    if symmetric and distributed:
+        raise NotImplementedError('Distributed solution on mirror-symmetric cell.')
+    # precision of material coefficients, kernels and fields (e.g. numpy.float32)
+    dtype = pb.solve.get('dtype', None)
+    # symmetric material coefficients and kernels stored as upper triangles
+    packed = get_packed(pb, symmetric, distributed)
+    # all macroscopic loads solved at once by block conjugate gradients
+    block = get_block(pb, symmetric, distributed)
+    # Green operator of homogeneous reference medium preconditioning the solver
+    precond = get_precond(pb, symmetric, distributed, block)
+
+    # matrix-free projections evaluate the kernels on the fly from frequencies
+    matrix_free = pb.solve.get('matrix_free', not symmetric)
+    if matrix_free and symmetric:
+        raise NotImplementedError('Matrix-free projections on mirror-symmetric cell.')
+    if not matrix_free and distributed: # every process evaluates its block of frequencies
+        raise NotImplementedError('Dense kernels on distributed grid.')
+
+    # discrete derivative defining the projections (spectral or finite differences)
+    scheme = get_scheme(pb, symmetric)
+    # unlike the spectral derivative, finite differences are unique at Nyquist frequencies
+    NyqNul = scheme in ['spectral']
+
     # Fourier projections
-    _, hG1hN, hG1sN, hG2hN, hG2sN = proj.elasticity(pb.solve['N'], pb.Y, NyqNul=True)
-    del _
+    if matrix_free:
+        hG1N = ElasticityProjection(pb.solve['N'], pb.Y, kind='G1', NyqNul=NyqNul,
+                                    fft_form=fft_form_default, scheme=scheme)
+        hG2N = ElasticityProjection(pb.solve['N'], pb.Y, kind='G2', NyqNul=NyqNul,
+                                    fft_form=fft_form_default, scheme=scheme)
+    else:
+        _, hG1hN, hG1sN, hG2hN, hG2sN = proj.elasticity(
+            pb.solve['N'], pb.Y, NyqNul=NyqNul, fft_form=0 if symmetric else fft_form_default,
+            dtype=dtype, scheme=scheme)
+        del _
+        hG1N = hG1hN + hG1sN
+        hG2N = hG2hN + hG2sN
+        del hG1hN, hG1sN, hG2hN, hG2sN
 
     if pb.solve['kind'] is 'GaNi':
         Nbar = pb.solve['N']
     elif pb.solve['kind'] is 'Ga':
         Nbar = 2*pb.solve['N'] - 1
-        hG1hN = hG1hN.enlarge(Nbar)
-        hG1sN = hG1sN.enlarge(Nbar)
-        hG2hN = hG2hN.enlarge(Nbar)
-        hG2sN = hG2sN.enlarge(Nbar)
+        hG1N = hG1N.enlarge(Nbar)
+        hG2N = hG2N.enlarge(Nbar)
+    if packed and not matrix_free:
+        hG1N, hG2N = hG1N.pack(), hG2N.pack()
+    if symmetric: # kernels built on the whole cell, restricted to non-negative frequencies
+        hG1N, hG2N = symmetric_kernel(hG1N), symmetric_kernel(hG2N)
 
-    FN = DFT(name='FN', inverse=False, N=Nbar)
-    FiN = DFT(name='FiN', inverse=True, N=Nbar)
+    FN = get_DFT(name='FN', inverse=False, N=Nbar, fft_form=fft_form, distributed=distributed)
+    FiN = get_DFT(name='FiN', inverse=True, N=Nbar, fft_form=fft_form, distributed=distributed)
 
-    G1N = Operator(name='G1', mat=[[FiN, hG1hN + hG1sN, FN]])
-    G2N = Operator(name='G2', mat=[[FiN, hG2hN + hG2sN, FN]])
+    if distributed:
+        hG1N, hG2N = distribute(hG1N), distribute(hG2N)
+    G1N = Operator(name='G1', mat=[[FiN, hG1N, FN]])
+    G2N = Operator(name='G2', mat=[[FiN, hG2N, FN]])
 
     for primaldual in pb.solve['primaldual']:
         tim = Timer(name='primal-dual')
@@ -131,49 +254,265 @@ def elasticity(problem):
         mat = Material(pb.material)
 
         if pb.solve['kind'] is 'GaNi':
-            A = mat.get_A_GaNi(pb.solve['N'], primaldual)
+            A = get_A_GaNi(mat, pb.solve['N'], primaldual, dtype=dtype, distributed=distributed)
         elif pb.solve['kind'] is 'Ga':
-            A = mat.get_A_Ga(Nbar=Nbar, primaldual=primaldual)
+            A = mat.get_A_Ga(Nbar=Nbar, primaldual=primaldual, dtype=dtype)
+        if precond: # reference medium from unpacked coefficients
+            A0 = get_reference(A, pb.physics)
+        if packed:
+            A = A.pack()
 
         if primaldual is 'primal':
-            GN = G1N
+            GN, hGN = G1N, hG1N
         else:
-            GN = G2N
-
-        Afun = Operator(name='FiGFA', mat=[[GN, A]])
+            GN, hGN = G2N, hG2N
+
+        if precond: # Green operator of reference medium in place of the projection
+            hGammaN = ElasticityGreen(pb.solve['N'], pb.Y, A0,
+                                      kind='G1' if primaldual is 'primal' else 'G2', NyqNul=NyqNul,
+                                      fft_form=fft_form_default, scheme=scheme).enlarge(Nbar)
+            GammaN = Operator(name='Gamma0', mat=[[FiN, hGammaN, FN]])
+            Afun = Operator(name='FiGammaFA', mat=[[GammaN, A]])
+            # conjugate gradients in the scalar product (x, A0*y) are preconditioned
+            par = dict(pb.solver, scal=hGammaN.scal)
+        else:
+            Afun = Operator(name='FiGFA', mat=[[GN, distribute(A) if distributed else A]])
+            par = pb.solver
 
         D = int(pb.dim*(pb.dim+1)/2)
-        for iL in range(D): # iteration over unitary loads
-            E = np.zeros(D)
-            E[iL] = 1
-            print(('macroscopic load E = ' + str(E)))
-            EN = Tensor(name='EN', N=Nbar, shape=(D,), Fourier=False)
-            EN.set_mean(E)
-            # initial approximation for solvers
-            x0 = EN.zeros_like(name='x0')
-
-            B = Afun(-EN) # RHS
-
-            if not hasattr(pb.solver, 'callback'):
-                cb = CallBack(A=Afun, B=B)
-            elif pb.solver['callback'] == 'detailed':
-                cb = CallBack_GA(A=Afun, B=B, EN=EN, A_Ga=A, GN=GN)
-            else:
-                raise NotImplementedError("The solver callback (%s) is not \
-                    implemented" % (pb.solver['callback']))
+        if symmetric: # assembled on the whole cell (also for postprocessing), then restricted
+            As = A.fold()
 
-            print(('solver : %s' % pb.solver['kind']))
-            X, info = linear_solver(solver=pb.solver['kind'], Afun=Afun, B=B,
-                                    x0=x0, par=pb.solver, callback=cb)
+        if block:
+            solutions, results = solve_block(pb, Afun, Nbar, D, fft_form, dtype)
+        else:
+            for iL in range(D): # iteration over unitary loads
+                E = np.zeros(D)
+                E[iL] = 1
+                print(('macroscopic load E = ' + str(E)))
+                parity = None
+                if symmetric:
+                    parity = get_parity(pb.physics, pb.dim, iL)
+                    GN, Afun = get_symmetric_operators(FN, FiN, hGN, As, parity)
+                EN = Tensor(name='EN', N=Nbar, shape=(D,), Fourier=False,
+                            fft_form=fft_form, parity=parity, dtype=dtype)
+                EN.set_mean(E)
+                if distributed:
+                    EN = distribute(EN)
+                # initial approximation for solvers
+                x0 = EN.zeros_like(name='x0')
+
+                B = Afun(-EN) # RHS
+
+                if pb.solver.get('callback') is None:
+                    cb = CallBack(A=Afun, B=B)
+                elif pb.solver['callback'] == 'detailed':
+                    cb = CallBack_GA(A=Afun, B=B, EN=EN, A_Ga=A, GN=GN,
+                                     every=pb.solver.get('callback_every', 10))
+                else:
+                    raise NotImplementedError("The solver callback (%s) is not \
+                    implemented" % (pb.solver['callback']))
 
-            solutions[iL] = add_macro2minimizer(X, E)
-            results[iL] = {'cb': cb, 'info': info}
-            print(cb)
+                print(('solver : %s' % pb.solver['kind']))
+                X, info = linear_solver(solver=pb.solver['kind'], Afun=Afun, B=B,
+                                        x0=x0, par=par, callback=cb)
+
+                if symmetric:
+                    X = X.unfold()
+                elif distributed:
+                    X = X.gather()
+                solutions[iL] = add_macro2minimizer(X, E)
+                results[iL] = {'cb': cb, 'info': info}
+                print(cb)
         tim.measure()
 
         # POSTPROCESSING
-        del Afun, B, E, EN, GN, X
-        postprocess(pb, A, mat, solutions, results, primaldual)
+        del Afun, GN
+        postprocess(pb, gather(A), mat, solutions, results, primaldual)
+
+
+def get_A_GaNi(mat, N, primaldual='primal', dtype=None, distributed=False):
+    """
+    Material coefficients of GaNi; on distributed grid, every process evaluates
+    the block of its slab only (a material given by a function is evaluated
+    on the whole grid and distributed).
+    """
+    if not distributed:
+        return mat.get_A_GaNi(N, primaldual, dtype=dtype)
+    elif 'fun' in mat.conf:
+        return distribute(mat.get_A_GaNi(N, primaldual, dtype=dtype))
+    slab = local_slice(N[0], get_comm())
+    return from_local(mat.get_A_GaNi(N, primaldual, dtype=dtype, slab=slab), N)
+
+
+def get_DFT(distributed=False, **kwargs):
+    """
+    DFT, or DFT distributed over MPI processes.
+    """
+    if distributed:
+        return DistributedDFT(**kwargs)
+    return DFT(**kwargs)
+
+
+def get_scheme(pb, symmetric=False):
+    """
+    Discrete derivative defining the projections (key 'derivative' in
+    pb.solve, see ffthompy.trigpol.get_derivative_freq); finite-difference
+    schemes are available for Galerkin approximation with numerical
+    integration (GaNi) only.
+    """
+    scheme = pb.solve.get('derivative', 'spectral')
+    if scheme not in ['spectral'] and pb.solve['kind'] != 'GaNi':
+        raise NotImplementedError('Derivative scheme ({}) with kind ({}).'.format(
+            scheme, pb.solve['kind']))
+    if scheme in ['forward', 'backward'] and symmetric:
+        raise NotImplementedError('Staggered scheme ({}) on mirror-symmetric cell.'.format(
+            scheme))
+    return scheme
+
+
+def get_packed(pb, symmetric=False, distributed=False):
+    """
+    Packed storage of symmetric material coefficients and dense kernels
+    (key 'packed' in pb.solve, see ffthompy.tensors.SymmetricTensor).
+    """
+    packed = pb.solve.get('packed', False)
+    if packed and (symmetric or distributed):
+        raise NotImplementedError('Packed storage on mirror-symmetric cell or distributed grid.')
+    # dense kernels of staggered schemes are Hermitian, not symmetric
+    matrix_free = pb.solve.get('matrix_free', not symmetric)
+    if (packed and not matrix_free
+            and pb.solve.get('derivative', 'spectral') in ['forward', 'backward']):
+        raise NotImplementedError('Packed storage of dense kernels of staggered schemes.')
+    return packed
+
+
+def get_block(pb, symmetric=False, distributed=False):
+    """
+    Block conjugate gradients solving all macroscopic loads at once (key
+    'block' in pb.solver, see ffthompy.general.solver.CG_block).
+    """
+    block = pb.solver.get('block', False)
+    if block and (symmetric or distributed or pb.solver.get('outofcore')):
+        raise NotImplementedError('Block solver on mirror-symmetric cell, distributed grid '
+                                  'or out-of-core.')
+    if block and pb.solver['kind'].lower() not in ['cg']:
+        raise NotImplementedError('Block solver of kind ({}).'.format(pb.solver['kind']))
+    if block and pb.solver.get('callback') is not None:
+        raise NotImplementedError('Block solver with callback ({}).'.format(pb.solver['callback']))
+    return block
+
+
+def get_precond(pb, symmetric=False, distributed=False, block=False):
+    """
+    Preconditioning of solvers by the Green operator of homogeneous reference
+    medium (key 'precond' in pb.solver with value 'reference', see
+    ffthompy.tensors.projection.ScalarGreen and get_reference); the Green
+    operator replaces the projection in the linear systems. For conjugate
+    gradients of the primal scalar problem, the reference is anisotropic.
+    """
+    precond = pb.solver.get('precond', None)
+    if precond is None:
+        return None
+    if precond not in ['reference']:
+        raise NotImplementedError('Preconditioner ({}).'.format(precond))
+    if symmetric or distributed or block or pb.solver.get('outofcore'):
+        raise NotImplementedError('Preconditioner on mirror-symmetric cell, distributed grid, '
+                                  'with block solver or out-of-core.')
+    if pb.solver['kind'].lower() not in ['cg', 'richardson']:
+        raise NotImplementedError('Preconditioner of solver ({}).'.format(pb.solver['kind']))
+    return precond
+
+
+def get_reference(A, physics, anisotropic=False):
+    """
+    Homogeneous reference medium as the mean of the bounds of pointwise
+    eigenvalues of material coefficients A (in the dual formulation, of the
+    compliances): the isotropic conductivity a0 (scalar problem), or the
+    bulk and shear eigenvalues (h0, s0) of the stiffness in the Mandel
+    notation (elasticity). With anisotropic=True, the scalar reference is
+    the conductivity matrix with the mean of the bounds in every eigendirection
+    of the mean coefficients; an isotropic reference does not change the
+    iterates of conjugate gradients of scalar problems.
+    """
+    D = A.val.shape[0]
+    mats = np.moveaxis(A.val.reshape((D, D, -1)), -1, 0).astype(np.float)
+    if physics == 'scalar' and anisotropic:
+        _, V = np.linalg.eigh(np.mean(mats, axis=0))
+        eigs = np.einsum('ia,pij,ja->pa', V, mats, V) # Rayleigh quotients
+        return np.einsum('ia,a,ja->ij', V, 0.5*(eigs.min(axis=0) + eigs.max(axis=0)), V)
+    elif physics == 'scalar':
+        eigs = np.linalg.eigvalsh(mats)
+        return 0.5*(eigs.min() + eigs.max())
+
+    dim = int(round((np.sqrt(8*D + 1) - 1)/2))
+    vol = np.zeros(D)
+    vol[:dim] = dim**-0.5 # unit volumetric strain
+    Q, _ = np.linalg.qr(np.column_stack([vol, np.eye(D)[:, 1:]]))
+    V = Q[:, 1:] # orthonormal basis of deviatoric strains
+    h = np.einsum('i,pij,j->p', vol, mats, vol)
+    s = np.linalg.eigvalsh(np.einsum('ia,pij,jb->pab', V, mats, V))
+    return 0.5*(h.min() + h.max()), 0.5*(s.min() + s.max())
+
+
+def solve_block(pb, Afun, Nbar, D, fft_form=fft_form_default, dtype=None):
+    """
+    Minimizers for all D unitary macroscopic loads solved at once; the fields
+    of loads are stacked along the leading axis of Tensors. The results keep
+    the callback and the number of iterations of every load.
+    """
+    E = np.eye(D)
+    print(('macroscopic loads E = ' + str(E.tolist())))
+    EN = Tensor(name='EN', N=Nbar, shape=(D, D), Fourier=False, fft_form=fft_form,
+                dtype=dtype)
+    for ENl, El in zip(unstack(EN), E):
+        ENl.set_mean(El)
+    # initial approximation for solvers
+    x0 = EN.zeros_like(name='x0')
+
+    B = Afun(-EN) # RHS
+    cbs = [CallBack(A=Afun, B=Bl) for Bl in unstack(B)]
+
+    print(('solver : {} (block)'.format(pb.solver['kind'])))
+    X, info = linear_solver(solver=pb.solver['kind'], Afun=Afun, B=B,
+                            x0=x0, par=pb.solver, callback=CallBack_block(cbs))
+    solutions = [add_macro2minimizer(Xl, El) for Xl, El in zip(unstack(X), E)]
+    results = []
+    for cb, kit, norm_res in zip(cbs, info['kit_loads'], info['norm_res_loads']):
+        del cb.res_norm[kit+1:] # records after the convergence of the load
+        cb.iter = kit
+        print(cb)
+        results.append({'cb': cb, 'info': {'kit': int(kit), 'norm_res': norm_res}})
+    return solutions, results
+
+
+def get_parity(physics, dim, iL):
+    """
+    Parity (0 even, 1 odd along every axis) of components of the minimizer
+    for unitary macroscopic load iL on mirror-symmetric cell.
+    """
+    E = np.eye(dim, dtype=np.int)
+    if physics == 'scalar':
+        return (E[iL] + E) % 2
+    elif physics == 'elasticity': # components in Mandel's notation
+        pairs = ElasticTensor.get_mandel_pairs(dim)
+        i, j = pairs[iL]
+        return np.array([(E[a] + E[b] + E[i] + E[j]) % 2 for a, b in pairs])
+    else:
+        raise NotImplementedError('Physics ({}).'.format(physics))
+
+
+def get_symmetric_operators(FN, FiN, hGN, As, parity):
+    """
+    Projection and linear system operators on mirror-symmetric cell for
+    the fields with given parity.
+    """
+    for ii, jj in np.ndindex(*As.shape):
+        if np.any(parity[ii] != parity[jj]) and np.any(As.val[ii, jj] != 0):
+            raise ValueError('Material coefficients do not respect the mirror symmetry.')
+    GN = Operator(name='G', mat=[[FiN, symmetric_kernel(hGN, parity), FN]])
+    Afun = Operator(name='FiGFA', mat=[[GN, As]])
+    return GN, Afun
 
 
 if __name__ == '__main__':
@@ -68,11 +68,11 @@ class Timer():
 
     def start(self):
         self.vals = []
-        self.ttin = [time.process_time(), time.clock(), time.time()]
+        self.ttin = [time.process_time(), time.perf_counter(), time.time()]
 
     def measure(self, print_time=True):
         self.vals.append([time.process_time()-self.ttin[0],
-                          time.clock()-self.ttin[1],
+                          time.perf_counter()-self.ttin[1],
                           time.time()-self.ttin[2]])
         if print_time:
             print(self)
@@ -2,7 +2,10 @@
 import numpy as np
 from ffthompy.general.base import Timer
 from ffthompy.matvecs import VecTri
-from ffthompy.tensors import Tensor
+from ffthompy.tensors import Tensor, Operator
+from ffthompy.tensors import outofcore
+from ffthompy.tensors.objects import unstack, gram_matrix
+from ffthompy.general.solver_pp import notify
 import scipy.sparse.linalg as spslin
 
 def linear_solver(Afun, B, ATfun=None, x0=None, par=None,
@@ -14,10 +17,9 @@ def linear_solver(Afun, B, ATfun=None, x0=None, par=None,
     if x0 is None:
         x0 = B.zeros_like()
 
-    if callback is not None:
-        callback(x0)
-
-    if solver.lower() in ['cg']: # conjugate gradients
+    if solver.lower() in ['cg'] and par is not None and par.get('block'):
+        x, info = CG_block(Afun, B, x0=x0, par=par, callback=callback)
+    elif solver.lower() in ['cg']: # conjugate gradients
         x, info = CG(Afun, B, x0=x0, par=par, callback=callback)
     elif solver.lower() in ['bicg']: # biconjugate gradients
         x, info = BiCG(Afun, ATfun, B, x0=x0, par=par, callback=callback)
@@ -30,27 +32,39 @@ def linear_solver(Afun, B, ATfun=None, x0=None, par=None,
             x0vec=x0.ravel()
         else:
             x0vec=x0.vec()
-
+        callback_vec = None
+        if callback is not None: # iterates are viewed as Tensors
+            notify(callback, 0, x0)
+            kit = [0] # the residua are not provided by scipy
+            def callback_vec(xk):
+                kit[0] += 1
+                notify(callback, kit[0], B.revec(xk, name='x'))
+
+        Afun.define_operand(B)
         if solver in ['scipy.sparse.linalg.cg','scipy_cg']:
-            Afun.define_operand(B)
             Afunvec = spslin.LinearOperator(Afun.matshape, matvec=Afun.matvec,
-                                            dtype=np.float64)
+                                            dtype=B.val.dtype)
             xcol, info = spslin.cg(Afunvec, B.vec(), x0=x0vec,
                                    tol=par['tol'], maxiter=par['maxiter'],
-                                   M=None, callback=callback)
-            info = {'info': info}
+                                   M=None, callback=callback_vec)
         elif solver in ['scipy.sparse.linalg.bicg','scipy_bicg']:
-            Afun.define_operand(B)
-            ATfun.define_operand(B)
-            Afunvec = spslin.LinearOperator(Afun.shape, matvec=Afun.matvec,
-                                            rmatvec=ATfun.matvec, dtype=np.float64)
-            xcol, info = spslin.bicg(Afunvec, B.vec(), x0=x0.vec(),
+            if ATfun is not None:
+                ATfun.define_operand(B)
+                rmatvec = ATfun.matvec
+            else:
+                rmatvec = Afun.rmatvec
+            Afunvec = spslin.LinearOperator(Afun.matshape, matvec=Afun.matvec,
+                                            rmatvec=rmatvec, dtype=B.val.dtype)
+            xcol, info = spslin.bicg(Afunvec, B.vec(), x0=x0vec,
                                      tol=par['tol'], maxiter=par['maxiter'],
-                                     M=None, callback=callback)
-        res = dict()
-        res['info'] = info
-        x = B.empty_like(name='x')
-        x.val = np.reshape(xcol, B.val.shape)
+                                     M=None, callback=callback_vec)
+        else:
+            msg = "This kind (%s) of linear solver is not implemented" % solver
+            raise NotImplementedError(msg)
+        info = {'info': info}
+        x = B.revec(xcol, name='x')
+        if callback is not None:
+            notify(callback, kit[0], x, final=True)
     else:
         msg = "This kind (%s) of linear solver is not implemented" % solver
         raise NotImplementedError(msg)
@@ -61,19 +75,26 @@ def linear_solver(Afun, B, ATfun=None, x0=None, par=None,
 
 
 def richardson(Afun, B, x0, par=None, callback=None):
-    omega = 1./par['alpha']
+    if par.get('precond'): # Green operator of reference medium in Afun, i.e. the basic scheme
+        omega = 1.
+    else:
+        omega = 1./par['alpha']
     res = {'norm_res': 1e15,
            'kit': 0}
-    x = x0
     norm=get_norm(B, par)
+    if isinstance(Afun, Operator) and isinstance(x0, Tensor):
+        Afun = Afun.compile(x0)
 
+    x = copy_vector(x0) # work vectors updated in place
+    residuum = None
     while (res['norm_res'] > par['tol'] and res['kit'] < par['maxiter']):
-        res['kit'] += 1
-        residuum=B-Afun(x)
-        x = x + omega*residuum
+        residuum = subtract(B, Afun(x), out=residuum)
         res['norm_res'] = norm(residuum)
-        if callback is not None:
-            callback(x)
+        notify(callback, res['kit'], x, norm_res=res['norm_res'], res=residuum)
+        res['kit'] += 1
+        x = axpy(omega, residuum, x)
+    notify(callback, res['kit'], x) # the residuum is not known
+    notify(callback, res['kit'], x, final=True)
     return x, res
 
 
@@ -91,7 +112,9 @@ def CG(Afun, B, x0, par=None, callback=None):
     x0 : VecTri or numpy.array of shape (n,)
         initial approximation of solution of linear system
     par : dict
-        parameters of the method
+        parameters of the method; with par['outofcore'] (a scratch directory
+        or True for the default one), the work vectors (Tensors) are stored
+        in files and updated over slabs, see ffthompy.tensors.outofcore
     callback :
 
     Returns
@@ -107,38 +130,137 @@ def CG(Afun, B, x0, par=None, callback=None):
         par['tol'] = 1e-6
     if 'maxiter' not in list(par.keys()):
         par['maxiter'] = int(1e3)
+    scratch = par.get('outofcore')
+    with outofcore.set_scratch(scratch if isinstance(scratch, str) else None):
+        scal=get_scal(B, par)
+        if isinstance(Afun, Operator) and isinstance(x0, Tensor) and not par.get('outofcore'):
+            Afun = Afun.compile(x0) # preallocated buffers; Afun(x) is overwritten by next call
 
-    scal=get_scal(B, par)
+        res = dict()
+        xCG = copy_vector(x0, par) # work vectors updated in place
+        R = subtract(B, Afun(xCG), out=copy_vector(B, par))
+        P = copy_vector(R, par)
+        rr = scal(R,R)
+        res['kit'] = 0
+        res['norm_res'] = np.double(rr)**0.5 # /np.norm(E_N)
+        norm_res_log = []
+        norm_res_log.append(res['norm_res'])
+        notify(callback, 0, xCG, norm_res=res['norm_res'], res=R)
+        while (res['norm_res'] > par['tol']) and (res['kit'] < par['maxiter']):
+            res['kit'] += 1 # number of iterations
+            AP = Afun(P)
+            alp = float(rr/scal(P,AP))
+            xCG = axpy(alp, P, xCG)
+            R = axpy(-alp, AP, R)
+            del AP # out-of-core result frees its file
+            rrnext = scal(R,R)
+            bet = rrnext/rr
+            rr = rrnext
+            P = xpay(R, bet, P)
+            res['norm_res'] = np.double(rr)**0.5
+            norm_res_log.append(res['norm_res'])
+            notify(callback, res['kit'], xCG, norm_res=res['norm_res'], res=R)
+        notify(callback, res['kit'], xCG, norm_res=res['norm_res'], res=R, final=True)
+        if res['kit'] == 0:
+            res['norm_res'] = 0
+        return xCG, res
+
+
+def CG_block(Afun, B, x0, par=None, callback=None):
+    """
+    Block conjugate gradients solver of systems with several right-hand
+    sides stacked along the leading (load) axis of Tensors (see
+    ffthompy.tensors.stack); the operator is applied once per iteration
+    to the block of search directions of all loads. The directions are
+    orthonormalized and the linearly dependent ones are dropped, which
+    avoids the breakdown of the method; the loads with the norm of residuum
+    below par['tol'] are deflated, i.e. the new directions are generated
+    only by the residua of the remaining loads.
+
+    Parameters and returns are the same as for CG; the results contain
+    also the norms of residua ('norm_res_loads') and the numbers of
+    iterations ('kit_loads') of individual loads.
+    """
+    if par is None:
+        par = dict()
+    if 'tol' not in list(par.keys()):
+        par['tol'] = 1e-6
+    if 'maxiter' not in list(par.keys()):
+        par['maxiter'] = int(1e3)
+
+    if 'scal' in par or type(B) is not Tensor:
+        scal = get_scal(B, par)
+        gram = lambda X, Y: np.array([[scal(x, y) for y in unstack(Y)] for x in unstack(X)],
+                                     dtype=np.float)
+    else: # all scalar products of the blocks at once
+        gram = lambda X, Y: gram_matrix(X, Y, dtype=par.get('accumulate')).astype(np.float)
+    norm = get_norm(B, par)
+    norm_block = lambda norms: np.sum(norms**2)**0.5
+    plans = dict() # compiled operators for the numbers of directions
+
+    def Afun_block(X):
+        if not (isinstance(Afun, Operator) and isinstance(X, Tensor)):
+            return Afun(X)
+        if X.shape[0] not in plans:
+            plans[X.shape[0]] = Afun.compile(X)
+        return plans[X.shape[0]](X)
+
+    def combine(X, C): # columns of the block X times the matrix C
+        return X.copy(val=np.tensordot(C.T.astype(X.val.dtype), X.val, axes=1))
+
+    def orthonormalize(X): # by the eigenvectors of the correlation matrix
+        G = gram(X, X)
+        # columns of unit norm, so the cutoff does not depend on the scale of loads
+        d = np.diag(G)**0.5
+        d[d == 0] = 1.
+        s, V = np.linalg.eigh(G/np.outer(d, d))
+        keep = s > np.max(s, initial=0.)*np.finfo(X.val.dtype).eps**0.5
+        return combine(X, (V[:, keep]/s[keep]**0.5)/d[:, np.newaxis])
 
     res = dict()
-    xCG = x0
-    Ax = Afun(x0)
-    R = B - Ax
-    P = R
-    rr = scal(R,R)
+    xCG = x0.copy()
+    R = B - Afun_block(xCG)
     res['kit'] = 0
-    res['norm_res'] = np.double(rr)**0.5 # /np.norm(E_N)
-    norm_res_log = []
-    norm_res_log.append(res['norm_res'])
-    while (res['norm_res'] > par['tol']) and (res['kit'] < par['maxiter']):
+    res['kit_loads'] = np.zeros(B.shape[0], dtype=np.int)
+    res['norm_res_loads'] = np.array([norm(r) for r in unstack(R)])
+    active = res['norm_res_loads'] > par['tol']
+    # norm of residuum of the whole block
+    notify(callback, 0, xCG, norm_res=norm_block(res['norm_res_loads']), res=R)
+    P = orthonormalize(R.copy(val=R.val[active]))
+    while np.any(active) and P.shape[0] > 0 and res['kit'] < par['maxiter']:
         res['kit'] += 1 # number of iterations
-        AP = Afun(P)
-        alp = float(rr/scal(P,AP))
-        xCG = xCG + alp*P
-        R = R - alp*AP
-        rrnext = scal(R,R)
-        bet = rrnext/rr
-        rr = rrnext
-        P = R + bet*P
-        res['norm_res'] = np.double(rr)**0.5
-        norm_res_log.append(res['norm_res'])
-        if callback is not None:
-            callback(xCG)
-    if res['kit'] == 0:
-        res['norm_res'] = 0
+        AP = Afun_block(P)
+        PAP = gram(P, AP)
+        alp = solve_gram(PAP, gram(P, R))
+        xCG.val += combine(P, alp).val
+        R.val -= combine(AP, alp).val
+        res['norm_res_loads'] = np.array([norm(r) for r in unstack(R)])
+        converged = active & (res['norm_res_loads'] <= par['tol'])
+        res['kit_loads'][converged] = res['kit']
+        active &= ~converged # deflation
+        Ra = R if np.all(active) else R.copy(val=R.val[active])
+        bet = -solve_gram(PAP, gram(AP, Ra))
+        Z = combine(P, bet)
+        Z.val += Ra.val
+        P = orthonormalize(Z)
+        notify(callback, res['kit'], xCG, norm_res=norm_block(res['norm_res_loads']), res=R)
+    notify(callback, res['kit'], xCG, norm_res=norm_block(res['norm_res_loads']), res=R,
+           final=True)
+    res['kit_loads'][active] = res['kit']
+    res['norm_res'] = np.max(res['norm_res_loads'])
     return xCG, res
 
 
+def solve_gram(G, H):
+    """
+    Solution of the (small) system G*X=H with the Gram matrix G.
+    """
+    try:
+        return np.linalg.solve(G, H)
+    except np.linalg.LinAlgError:
+        return np.linalg.lstsq(G, H, rcond=None)[0]
+
+
 def BiCG(Afun, ATfun, B, x0, par=None, callback=None):
     """
     BiConjugate gradient solver.
@@ -182,6 +304,7 @@ def BiCG(Afun, ATfun, B, x0, par=None, callback=None):
     res['norm_res'] = rr**0.5 # /np.norm(E_N)
     norm_res_log = []
     norm_res_log.append(res['norm_res'])
+    notify(callback, 0, xBiCG) # norm_res is not the norm of residuum
     while (res['norm_res'] > par['tol']) and (res['kit'] < par['maxiter']):
         res['kit'] += 1 # number of iterations
         AP = Afun*P
@@ -196,8 +319,7 @@ def BiCG(Afun, ATfun, B, x0, par=None, callback=None):
         Ps = Rs + bet*Ps
         res['norm_res'] = rr**0.5
         norm_res_log.append(res['norm_res'])
-        if callback is not None:
-            callback(xBiCG)
+        notify(callback, res['kit'], xBiCG)
 
     if res['kit'] == 0:
         res['norm_res'] = 0
@@ -244,11 +366,16 @@ def cheby2TERM(A, B, x0, M=None, par=None, callback=None):
     Ib = 1.0/bnrm2
     if bnrm2 == 0:
         bnrm2 = 1.0
-    x = x0
+    if isinstance(A, Operator) and isinstance(x0, Tensor):
+        A = A.compile(x0)
+    x = copy_vector(x0) # work vectors updated in place
     r = B - A(x)
     r0 = np.double(r*r)**0.5
+    norm_r = r0
     res['norm_res'] = Ib*r0 # For Normal Residue
+    notify(callback, 0, x, norm_res=r0, res=r)
     if res['norm_res'] < par['tol']: # if errnorm is less than tol
+        notify(callback, 0, x, norm_res=r0, res=r, final=True)
         return x, res
 
     d = (Egv[1]+Egv[0])/2.0 # np.mean(par['eigrange'])
@@ -256,7 +383,6 @@ def cheby2TERM(A, B, x0, M=None, par=None, callback=None):
     v = 0*x0
     while (res['norm_res'] > par['tol']) and (res['kit'] < par['maxit']):
         res['kit'] += 1
-        x_prev = x
         if res['kit'] == 1:
             p = 0
             w = 1/d
@@ -266,14 +392,14 @@ def cheby2TERM(A, B, x0, M=None, par=None, callback=None):
         else:
             p = -(c*c/4)*w*w
             w = 1/(d-c*c*w/4)
-        v = r - p*v
-        x = x_prev + w*v
-        r = B - A(x)
-
-        res['norm_res'] = (1.0/r0)*r.norm()
+        v = xpay(r, -p, v)
+        x = axpy(w, v, x)
+        r = subtract(B, A(x), out=r)
 
-        if callback is not None:
-            callback(x)
+        norm_r = r.norm()
+        res['norm_res'] = (1.0/r0)*norm_r
+        notify(callback, res['kit'], x, norm_res=norm_r, res=r)
+    notify(callback, res['kit'], x, norm_res=norm_r, res=r, final=True)
 
     if par['tol'] < res['norm_res']: # if tolerance is less than error norm
         print("Chebyshev solver does not converges!")
@@ -285,18 +411,62 @@ def cheby2TERM(A, B, x0, M=None, par=None, callback=None):
     return x, res
 
 def get_scal(B, par):
-    "defines scalar multiplication depending on vectors"
+    """
+    defines scalar multiplication depending on vectors; the scalar products
+    of Tensors are accumulated in par['accumulate'] (e.g. numpy.float64 for
+    single precision) if it is provided
+    """
     if 'scal' in par:
         scal=par['scal']
     else:
         if isinstance(B, np.matrix) or isinstance(B, VecTri):
             scal = lambda X,Y: float(X.T*Y)
+        elif isinstance(B, Tensor) and par.get('outofcore'): # over slabs of files
+            scal = outofcore.scal
+        elif isinstance(B, Tensor) and par.get('accumulate') is not None:
+            scal = lambda X,Y: X(Y, dtype=par['accumulate'])
         elif isinstance(B, Tensor):
             scal = lambda X,Y: X*Y
         else:
-            scal = lambda X,Y: np.sum(X*Y.conj()).real
+            scal = lambda X,Y: np.vdot(Y, X).real
     return scal
 
+def copy_vector(x, par=None):
+    """
+    Copy of vector that is updated in place by the functions below; Tensors
+    are copied to files if par['outofcore'] is set.
+    """
+    if isinstance(x, Tensor) and par is not None and par.get('outofcore'):
+        return outofcore.to_outofcore(x)
+    elif isinstance(x, Tensor):
+        return x.copy()
+    return x
+
+def axpy(a, x, y):
+    """
+    y = y + a*x; in place for Tensors (see Tensor.axpy)
+    """
+    if isinstance(y, Tensor):
+        return y.axpy(a, x)
+    return y + a*x
+
+def xpay(x, a, y):
+    """
+    y = x + a*y; in place for Tensors (see Tensor.xpay)
+    """
+    if isinstance(y, Tensor):
+        return y.xpay(x, a)
+    return x + a*y
+
+def subtract(x, y, out=None):
+    """
+    x - y; written to out if it is provided and x is Tensor
+    """
+    if out is None or not isinstance(x, Tensor):
+        return x - y
+    np.subtract(x.val, y.val, out=out.val)
+    return out
+
 def get_norm(B, par):
     scal = get_scal(B, par)
     norm = lambda X: scal(X, X)**0.5
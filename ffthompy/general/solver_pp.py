@@ -1,9 +1,42 @@
 import numpy as np
 from ffthompy.matvecs import VecTri
 from ffthompy.tensors import Tensor
+from ffthompy.tensors.objects import unstack
+
+
+class Iteration():
+    """
+    Record of an iteration of linear solver passed to the callbacks that
+    accept it (attribute records=True, e.g. CallBack): the number of
+    iteration kit, the approximation of solution x, the norm of residuum
+    norm_res and the residuum res known to the solver (None otherwise);
+    final=True for the record after the last iteration.
+    """
+    def __init__(self, kit, x, norm_res=None, res=None, final=False):
+        self.kit = kit
+        self.x = x
+        self.norm_res = norm_res
+        self.res = res
+        self.final = final
+
+
+def notify(callback, kit, x, norm_res=None, res=None, final=False):
+    """
+    Calls the callback of linear solver with the record of iteration
+    (Iteration) if it accepts records; otherwise with the approximation x
+    (the final record is not passed).
+    """
+    if callback is None:
+        return
+    if getattr(callback, 'records', False):
+        return callback(Iteration(kit, x, norm_res=norm_res, res=res, final=final))
+    elif not final:
+        return callback(x)
 
 
 class CallBack():
+    records = True # accepts records of iterations from solvers
+
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
         self.iter = -1
@@ -11,7 +44,16 @@ class CallBack():
         self.energy_norm = []
 
     def __call__(self, x):
-        self.iter += 1
+        if isinstance(x, Iteration):
+            if x.final and x.kit == self.iter: # already recorded
+                return
+            self.iter = x.kit
+            if x.norm_res is not None: # no additional application of operator
+                self.res_norm.append(x.norm_res)
+                return
+            x = x.x
+        else:
+            self.iter += 1
         if isinstance(x, np.ndarray):
             if isinstance(self.B, VecTri):
                 X = VecTri(val=np.reshape(x, self.B.dN()))
@@ -34,34 +76,79 @@ class CallBack():
         return ss
 
 
+class CallBack_block():
+    """
+    Callback of block solvers (see ffthompy.general.solver.CG_block) that
+    passes the norms of residua of the individual loads (the fields stacked
+    along the leading axis) to their callbacks cbs, e.g. CallBack.
+    """
+    records = True
+
+    def __init__(self, cbs):
+        self.cbs = cbs
+
+    def __call__(self, x):
+        for cb, res in zip(self.cbs, unstack(x.res)):
+            cb(Iteration(x.kit, None, norm_res=res.norm(), final=x.final))
+
+
 class CallBack_GA():
+    """
+    Callback evaluating also the upper bound on homogenized properties and
+    the nonconformity of the approximations; these (expensive) diagnostics
+    are evaluated every self.every (default 10) iterations and after
+    the last iteration.
+    """
+    records = True # accepts records of iterations from solvers
+
     def __init__(self, **kwargs):
+        self.every = 10
         self.__dict__.update(kwargs)
+        if 'E2N' not in kwargs: # keywords used in applications
+            self.E2N, self.Aex = self.EN, self.A_Ga
         self.iter = -1
         self.res_norm = []
         self.bound = []
         self.nonconformity = []
 
     def __call__(self, x):
-        self.iter += 1
-        if not isinstance(x, VecTri):
-            X = VecTri(val=np.reshape(x, self.E2N.dN()))
+        if not isinstance(x, Iteration):
+            x = Iteration(self.iter+1, x)
+        if isinstance(x.x, np.ndarray):
+            X = self.E2N.revec(x.x)
         else:
-            X = x
+            X = x.x
+        if x.final and x.kit == self.iter:
+            if self.iter % self.every != 0:
+                self.diagnostics(X)
+            return
+
+        self.iter = x.kit
+        if x.norm_res is not None:
+            self.res_norm.append(x.norm_res)
+        elif x.res is not None:
+            self.res_norm.append(x.res.norm())
+        elif self.is_total(X):
+            self.res_norm.append(self.A(X).norm())
+        else:
+            self.res_norm.append((self.B-self.A(X)).norm())
+        if self.iter % self.every == 0 or x.final:
+            self.diagnostics(X)
+        return
+
+    def is_total(self, X):
+        # approximation of total field, i.e. with the macroscopic value
+        return np.linalg.norm(X.mean() - self.E2N.mean()) < 1e-8
 
-        if np.linalg.norm(X.mean() - self.E2N.mean()) < 1e-8:
-            res = self.A(X)
+    def diagnostics(self, X):
+        if self.is_total(X):
             eN = X
         else:
-            res = self.B-self.A(X)
             eN = X + self.E2N
-
-        self.res_norm.append(res.norm())
-        GeN = self.GN*eN + self.E2N
+        GeN = self.GN(eN) + self.E2N
         GeN_E = GeN + self.E2N
         self.bound.append(self.Aex*GeN_E*GeN_E)
         self.nonconformity.append((GeN-eN).norm())
-        return
 
     def __repr__(self):
         try:
@@ -69,7 +156,7 @@ class CallBack_GA():
             ss += '    iterations    : %d\n' % self.iter
             ss += '    res_norm      : %g\n' % self.res_norm[-1]
             ss += '    bound         : %g\n' % self.bound[-1]
-            ss += '    nonconformity : %g' % self.bound[-1]
+            ss += '    nonconformity : %g' % self.nonconformity[-1]
         except:
             ss = 'no output'
         return ss
@@ -2,10 +2,11 @@ import unittest
 import numpy as np
 from numpy.linalg import norm
 from ffthompy import PrintControl
-from ffthompy.tensors import Tensor, DFT, Operator
-from ffthompy.tensors.projection import scalar as scalar_tensor
+from ffthompy.tensors import Tensor, DFT, Operator, stack, unstack
+from ffthompy.tensors.projection import scalar as scalar_tensor, ScalarGreen
 from ffthompy.projections import scalar
 from ffthompy.general.solver import linear_solver
+from ffthompy.general.solver_pp import CallBack, CallBack_GA
 
 prt=PrintControl()
 
@@ -70,8 +71,140 @@ class Test_solvers(unittest.TestCase):
         for solver in ['CG', 'scipy_cg', 'richardson', 'chebyshev']:
             x,_=linear_solver(Afun=GAfun, B=B, x0=x0, par=par, solver=solver)
             self.assertAlmostEqual(0, norm(X.val-x.val), delta=1e-8, msg=solver)
+
+        # Green operator of reference medium in place of the projection (alpha is ignored)
+        for A0, solvers in [(6., ['CG', 'richardson']), ([[6., 1.], [1., 6.]], ['CG'])]:
+            Gamma=ScalarGreen(N, np.ones(dim), A0)
+            Gamma0=Operator(name='Gamma0', mat=[[FiN, Gamma, FN]])
+            GammaAfun=Operator(name='GammaA', mat=[[Gamma0, A]])
+            parM=dict(par, precond='reference', scal=Gamma.scal)
+            for solver in solvers:
+                x,_=linear_solver(Afun=GammaAfun, B=GammaAfun(-E), x0=x0, par=dict(parM),
+                                  solver=solver)
+                self.assertAlmostEqual(0, norm(X.val-x.val), delta=1e-8, msg=solver)
+        prt.enable()
+
+        print('...ok')
+
+    def test_callbacks(self):
+        print('\nChecking callbacks of solvers...')
+        dim=2
+        N=dim*(6,)
+        _, hG1N, _=scalar_tensor(N, Y=np.ones(dim))
+        FN=DFT(name='FN', inverse=False, N=N)
+        FiN=DFT(name='FiN', inverse=True, N=N)
+        G1N=Operator(name='G1', mat=[[FiN, hG1N, FN]])
+        A=Tensor(name='A', val=np.einsum('ij,...->ij...', np.eye(dim), 1.+10.*np.random.random(N)),
+                 order=2, N=N, multype=21)
+        GAfun=Operator(name='GA', mat=[[G1N, A]])
+        E=Tensor(name='E', shape=(dim,), N=N)
+        E.set_mean(np.array([1., 0.]))
+        B=GAfun(-E)
+        par={'tol': 1e-8, 'maxiter': 100, 'alpha': 0.5*(1.+10.), 'eigrange': [1., 10.]}
+
+        nmatvecs=[0]
+        def Acount(x):
+            nmatvecs[0]+=1
+            return GAfun(x)
+
+        prt.disable()
+        for solver in ['CG', 'richardson', 'chebyshev', 'scipy_cg']:
+            # residua of approximations evaluated by the callback
+            norms=[]
+            linear_solver(Afun=GAfun, B=B, x0=E.zeros_like(), par=dict(par), solver=solver,
+                          callback=lambda x: norms.append((B-GAfun(x)).norm()))
+            nmatvecs[0]=0
+            cb=CallBack(A=Acount, B=B)
+            linear_solver(Afun=GAfun, B=B, x0=E.zeros_like(), par=dict(par), solver=solver,
+                          callback=cb)
+            self.assertEqual(cb.iter, len(norms)-1, msg=solver)
+            self.assertAlmostEqual(0, norm(np.array(cb.res_norm)-norms), delta=1e-10, msg=solver)
+            # the residua are provided by solvers (except scipy)
+            self.assertLessEqual(nmatvecs[0], len(norms) if solver in ['scipy_cg'] else 1,
+                                 msg=solver)
+
+            cb=CallBack_GA(A=GAfun, B=B, EN=E, A_Ga=A, GN=G1N, every=3)
+            linear_solver(Afun=GAfun, B=B, x0=E.zeros_like(), par=dict(par), solver=solver,
+                          callback=cb)
+            self.assertAlmostEqual(0, norm(np.array(cb.res_norm)-norms), delta=1e-10, msg=solver)
+            self.assertEqual(len(cb.bound), cb.iter//3+1+(cb.iter%3>0), msg=solver)
         prt.enable()
+        print('...ok')
+
+    def test_block(self):
+        print('\nChecking block solver...')
+        from ffthompy.tensors.projection import ScalarProjection
+        for dim in [2, 3]:
+            N=dim*(6,)
+            FN=DFT(name='FN', inverse=False, N=N)
+            FiN=DFT(name='FiN', inverse=True, N=N)
+            G1N=Operator(name='G1', mat=[[FiN, ScalarProjection(N, np.ones(dim)), FN]])
+            A=Tensor(name='A', val=np.einsum('ij,...->ij...', np.eye(dim),
+                                             1.+10.*np.random.random(N)), order=2, N=N, multype=21)
+            GAfun=Operator(name='GA', mat=[[G1N, A]])
+
+            loads=[]
+            for E in np.eye(dim):
+                EN=Tensor(name='E', shape=(dim,), N=N)
+                loads.append(EN.set_mean(E))
+            loads[1]=1e-7*loads[1] # right-hand side of small norm
+            loads.append(loads[0]) # linearly dependent right-hand sides
+            EN=stack(loads)
+            par={'tol': 1e-10, 'maxiter': int(1e3)}
+            X, info=linear_solver(Afun=GAfun, B=GAfun(-EN), x0=EN.zeros_like(), solver='CG',
+                                  par=dict(par, block=True))
+            self.assertLessEqual(info['norm_res'], par['tol'])
+            self.assertEqual(info['kit_loads'].size, dim+1)
+            kits=[]
+            for x, E in zip(unstack(X), loads):
+                x0, info0=linear_solver(Afun=GAfun, B=GAfun(-E), x0=E.zeros_like(),
+                                        par=dict(par), solver='CG')
+                self.assertAlmostEqual(0, norm(x.val-x0.val), delta=1e-8)
+                kits.append(info0['kit'])
+            # the load of small norm is not dropped from the search directions
+            self.assertLessEqual(info['kit_loads'][1], kits[1]+1)
+        print('...ok')
 
+    def test_outofcore(self):
+        print('\nChecking out-of-core tensors and solver...')
+        import tempfile
+        from ffthompy.tensors import outofcore
+        config=dict(outofcore.config)
+        with outofcore.set_scratch(chunk=512): # a few grid lines in every slab
+            for dim, fft_form in [(2, 'r'), (2, 0), (3, 'r')]:
+                N=tuple(range(5, 5+dim))
+                u=Tensor(name='u', shape=(dim,), N=N, Fourier=False, fft_form=fft_form).randomize()
+                uo=outofcore.to_outofcore(u)
+                F=outofcore.OutOfCoreDFT(N=N, fft_form=fft_form)
+                iF=outofcore.OutOfCoreDFT(N=N, fft_form=fft_form, inverse=True)
+                Fuo=F(uo)
+                self.assertTrue(outofcore.is_outofcore(Fuo))
+                self.assertAlmostEqual(0, (DFT(N=N, fft_form=fft_form)(u)==Fuo)[1], delta=1e-13)
+                self.assertAlmostEqual(0, (u==iF(Fuo))[1], delta=1e-13)
+
+            dim=2
+            N=(5, 6)
+            _, hG1N, _ = scalar(N, Y=np.ones(dim))
+            FN=outofcore.OutOfCoreDFT(name='FN', inverse=False, N=N)
+            FiN=outofcore.OutOfCoreDFT(name='FiN', inverse=True, N=N)
+            G1N=Operator(name='G1', mat=[[FiN, hG1N, FN]])
+            A=Tensor(name='A', val=np.einsum('ij,...->ij...', np.eye(dim),
+                                             1.+10.*np.random.random(N)),
+                     order=2, N=N, multype=21)
+            GAfun=Operator(name='GA', mat=[[G1N, A]])
+            E=Tensor(name='E', shape=(dim,), N=N)
+            E.set_mean(np.array([1., 0.]))
+            B=GAfun(-E)
+            par={'tol': 1e-10, 'maxiter': int(1e3)}
+            X,_=linear_solver(Afun=GAfun, B=B, x0=E.zeros_like(), par=par, solver='CG')
+            with tempfile.TemporaryDirectory() as dirname:
+                par['outofcore']=dirname
+                Xo,_=linear_solver(Afun=GAfun, B=outofcore.to_outofcore(B), x0=E.zeros_like(),
+                                   par=par, solver='CG')
+                self.assertTrue(outofcore.is_outofcore(Xo))
+                self.assertAlmostEqual(0, norm(X.val-Xo.val), delta=1e-8)
+                del Xo
+        self.assertEqual(config, outofcore.config) # the settings are restored
         print('...ok')
 
 
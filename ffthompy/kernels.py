@@ -0,0 +1,180 @@
+"""
+This module contains kernels of loops over grid points of FFT-based
+solvers: pointwise products of matrices with vectors (application of
+material coefficients and dense projections), matrix-free scalar
+projections and Hadamard products of bases of low-rank tensors (also in
+the real layout of scipy rfft, fft_form='sr'). Every kernel evaluates one
+step; e.g. the residual B-A(x) of solvers and the projection followed by
+the product with material coefficients are not fused.
+
+The kernels are compiled by Numba with parallel loops over grid points
+if it is installed and enabled (set_numba() or environment variable
+FFTHOMPY_NUMBA=0 to disable); otherwise the functions evaluate the same
+results by numpy. The grid kernels work with arrays of arbitrary strides
+(e.g. in the transposed layout of FFT backends) on grids of dimension
+2 or 3.
+"""
+
+import os
+import numpy as np
+from warnings import warn
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+config = {'numba': numba is not None and os.environ.get('FFTHOMPY_NUMBA', '1') not in ['0', '']}
+
+def set_numba(enable=True):
+    """
+    Enable (or disable) the kernels compiled by Numba; returns the actual state.
+    """
+    if enable and numba is None:
+        warn('Numba is not available; the kernels are evaluated by numpy.')
+    config['numba'] = bool(enable) and numba is not None
+    return config['numba']
+
+def use_numba():
+    return config['numba']
+
+def grid3(val, order):
+    # view of values on grid of dimension 2 or 3 with three grid axes
+    if val.ndim-order == 2:
+        val = val[..., np.newaxis]
+    return val
+
+def grid_perm(val, order):
+    # permutation of (three) grid axes that traverses val in the order of memory
+    strides = val.strides[order:]
+    return tuple(range(order))+tuple(order+np.argsort(strides, kind='stable')[::-1])
+
+
+if numba is not None:
+
+    @numba.njit(parallel=True, cache=True)
+    def _matvec(A, x, out):
+        m, n = A.shape[0], A.shape[1]
+        n0, n1, n2 = x.shape[1], x.shape[2], x.shape[3]
+        for i0 in numba.prange(n0):
+            for i1 in range(n1):
+                for i2 in range(n2):
+                    for i in range(m):
+                        s = A[i, 0, i0, i1, i2]*x[0, i0, i1, i2]
+                        for j in range(1, n):
+                            s += A[i, j, i0, i1, i2]*x[j, i0, i1, i2]
+                        out[i, i0, i1, i2] = s
+
+    @numba.njit(parallel=True, cache=True)
+    def _scalar_projection(x, xi0, xi1, xi2, xinorm2, out, G2):
+        dim = x.shape[0]
+        n0, n1, n2 = x.shape[1], x.shape[2], x.shape[3]
+        for i0 in numba.prange(n0):
+            for i1 in range(n1):
+                for i2 in range(n2):
+                    k0, k1 = xi0[i0, i1, i2], xi1[i0, i1, i2]
+                    k2 = xi2[i0, i1, i2] if dim == 3 else 0.
+                    xix = k0*x[0, i0, i1, i2]+k1*x[1, i0, i1, i2]
+                    if dim == 3:
+                        xix += k2*x[2, i0, i1, i2]
+                    xix /= xinorm2[i0, i1, i2]
+                    for ii in range(dim):
+                        k = k0 if ii == 0 else (k1 if ii == 1 else k2)
+                        if G2:
+                            out[ii, i0, i1, i2] = x[ii, i0, i1, i2]-k*xix
+                        else:
+                            out[ii, i0, i1, i2] = k*xix
+
+    @numba.njit(parallel=True, cache=True)
+    def _hadamard_basis(a, b, out, sr):
+        ra, n = a.shape
+        rb = b.shape[0]
+        for i in numba.prange(ra):
+            for j in range(rb):
+                r = i*rb+j
+                if not sr:
+                    for k in range(n):
+                        out[r, k] = a[i, k]*b[j, k]
+                    continue
+                out[r, 0] = a[i, 0]*b[j, 0]
+                for k in range(1, n-1, 2): # pairs of real and imaginary parts
+                    out[r, k] = a[i, k]*b[j, k]-a[i, k+1]*b[j, k+1]
+                    out[r, k+1] = a[i, k]*b[j, k+1]+a[i, k+1]*b[j, k]
+                if n % 2 == 0: # real value at Nyquist frequency
+                    out[r, n-1] = a[i, n-1]*b[j, n-1]
+
+
+def matvec(A, x, out):
+    """
+    Pointwise product of matrices A of shape (m,n)+N with vectors x of shape
+    (n,)+N written to out (of shape (m,)+N); the numpy variant is numpy.einsum.
+    """
+    dim = x.ndim-1
+    if not use_numba() or dim not in [2, 3]:
+        return np.einsum('ij...,j...->i...', A, x, out=out)
+    A, x, val = grid3(A, 2), grid3(x, 1), grid3(out, 1)
+    perm = grid_perm(x, 1)
+    _matvec(A.transpose((0, 1)+tuple(p+1 for p in perm[1:])), x.transpose(perm),
+            val.transpose(perm))
+    return out
+
+def scalar_projection(x, xi, xi2, out, kind='G1'):
+    """
+    Matrix-free scalar projection (kind 'G1' or 'G2') of values x of shape
+    (dim,)+N with frequencies xi (broadcastable to N) and their squared norms
+    xi2; the zero frequency is not treated (see ScalarProjection).
+    """
+    dim = x.shape[0]
+    if not use_numba() or dim not in [2, 3]:
+        xix = xi[0]*x[0]
+        for ii in range(1, dim):
+            xix += xi[ii]*x[ii]
+        xix /= xi2
+        for ii in range(dim):
+            np.multiply(xi[ii], xix, out=out[ii])
+        if kind in ['G2']:
+            np.subtract(x, out, out=out)
+        return out
+    grid = x.shape[1:]
+    xv, val = grid3(x, 1), grid3(out, 1)
+    perm = grid_perm(xv, 1)
+    gperm = tuple(p-1 for p in perm[1:])
+    xi = [grid3(np.broadcast_to(f, grid), 0).transpose(gperm) for f in xi]
+    xi2 = grid3(np.broadcast_to(xi2, grid), 0).transpose(gperm)
+    _scalar_projection(xv.transpose(perm), xi[0], xi[1], xi[-1], xi2, val.transpose(perm),
+                       kind in ['G2'])
+    return out
+
+def hadamard_basis(a, b, sr=False):
+    """
+    Basis (of shape (ra*rb, n)) of the Hadamard product of low-rank tensors
+    from the bases a (ra, n) and b (rb, n) along one dimension; sr=True for
+    values in the real layout of scipy rfft (fft_form='sr').
+    """
+    ra, n = a.shape
+    rb = b.shape[0]
+    if use_numba():
+        out = np.empty((ra*rb, n), dtype=np.result_type(a, b))
+        _hadamard_basis(a, b, out, sr)
+        return out
+
+    if not sr:
+        return np.reshape(np.multiply(a[:, np.newaxis, :], b[np.newaxis, :, :]), (-1, n))
+    B = np.empty((ra*rb, n))
+    B[:, 0] = np.kron(a[:, 0], b[:, 0])
+    if n % 2 != 0:
+        ar, ai = a[:, 1::2], a[:, 2::2]
+        br, bi = b[:, 1::2], b[:, 2::2]
+        B[:, 1::2] = (ar[:, np.newaxis, :]*br[np.newaxis, :, :]
+                      - ai[:, np.newaxis, :]*bi[np.newaxis, :, :]).reshape(ra*rb, -1)
+        B[:, 2::2] = (ar[:, np.newaxis, :]*bi[np.newaxis, :, :]
+                      + ai[:, np.newaxis, :]*br[np.newaxis, :, :]).reshape(ra*rb, -1)
+    else:
+        B[:, -1] = np.kron(a[:, -1], b[:, -1])
+        ar, ai = a[:, 1:-1:2], a[:, 2:-1:2]
+        br, bi = b[:, 1:-1:2], b[:, 2:-1:2]
+        B[:, 1:-1:2] = (ar[:, np.newaxis, :]*br[np.newaxis, :, :]
+                        - ai[:, np.newaxis, :]*bi[np.newaxis, :, :]).reshape(ra*rb, -1)
+        B[:, 2:-1:2] = (ar[:, np.newaxis, :]*bi[np.newaxis, :, :]
+                        + ai[:, np.newaxis, :]*br[np.newaxis, :, :]).reshape(ra*rb, -1)
+    return B
@@ -51,9 +51,10 @@ class Material():
         else:
             raise NotImplementedError("Improper material definition!")
 
-    def get_A_Ga(self, Nbar, primaldual='primal', order=-1, P=None):
+    def get_A_Ga(self, Nbar, primaldual='primal', order=-1, P=None, dtype=None):
         """
-        Returns stiffness matrix for scheme with exact integration.
+        Returns stiffness matrix for scheme with exact integration;
+        the values are converted to the precision dtype if it is provided.
         """
         if order == -1:
             if 'order' in self.conf:
@@ -109,18 +110,36 @@ class Material():
 
             name = 'A_Ga_o{0}_P{1}'.format(order, np.array(P).max())
 
-        return Tensor(name=name, val=val, N=Nbar, order=2, Y=self.Y, multype=21,
-                      Fourier=False, origin='c').shift()
+        A = Tensor(name=name, val=val, N=Nbar, order=2, Y=self.Y, multype=21,
+                   Fourier=False, origin='c').shift()
+        if dtype is not None:
+            A = A.astype(dtype)
+        return A
 
-    def get_A_GaNi(self, N, primaldual='primal', tensor=True):
+    def get_A_GaNi(self, N, primaldual='primal', tensor=True, dtype=None, slab=None):
         """
-        Returns stiffness matrix for a scheme with trapezoidal quadrature rule.
+        Returns stiffness matrix for a scheme with trapezoidal quadrature rule;
+        the values are converted to the precision dtype if it is provided.
+        If slab (slice of grid points along the first axis) is provided, only
+        the block of the grid is evaluated, e.g. on distributed grid.
         """
-        coord = Grid.get_coordinates(N, self.Y)
+        if slab is None:
+            coord = Grid.get_coordinates(N, self.Y)
+        else: # coordinates of the block with origin at zero
+            xl = [np.fft.ifftshift(self.Y[ii]*ZNl/N[ii])
+                  for ii, ZNl in enumerate(Grid.get_ZNl(N, fft_form='c'))]
+            xl[0] = xl[0][slab]
+            coord = np.array(np.meshgrid(*xl, indexing='ij'))
         A = self.evaluate(coord, tensor=tensor)
         if primaldual is 'dual':
             A = A.inv()
-        return A.shift()
+        if slab is None:
+            A = A.shift()
+        else:
+            A.origin = 0
+        if dtype is not None:
+            A = A.astype(dtype)
+        return A
 
     def get_shape_functions(self, N2):
         """
@@ -126,6 +126,18 @@ class ElasticTensor():
     def get_sym(dim):
         return dim*(dim+1)/2
 
+    @staticmethod
+    def get_mandel_pairs(dim):
+        """
+        Indices (i, j) of tensor components stored in Mandel's notation.
+        """
+        if dim == 2:
+            return [(0, 0), (1, 1), (0, 1)]
+        elif dim == 3:
+            return [(0, 0), (1, 1), (2, 2), (1, 2), (0, 2), (0, 1)]
+        else:
+            raise ValueError("Incorrect dimension (%d)" % dim)
+
     @staticmethod
     def get_decomposition():
         """
@@ -1,6 +1,5 @@
 import numpy as np
 from ffthompy.general.base import Timer
-import itertools
 
 
 def postprocess(pb, A, mat, solutions, results, primaldual):
@@ -53,7 +52,8 @@ def postprocess(pb, A, mat, solutions, results, primaldual):
 def assembly_matrix(Afun, solutions):
     """
     The function assembles the homogenized matrix from minimizers (corrector
-    functions).
+    functions); the operator is applied once to every minimizer, so that
+    only one field of the operator's result is kept in memory.
     """
     dim = len(solutions)
     if not np.allclose(Afun.N, solutions[0].N):
@@ -65,8 +65,10 @@ def assembly_matrix(Afun, solutions):
         sol = solutions
 
     AH = np.zeros([dim, dim])
-    for ii, jj in itertools.product(list(range(dim)), repeat=2):
-        AH[ii, jj] = Afun(sol[ii]) * sol[jj]
+    for ii in range(dim):
+        Asol = Afun(sol[ii])
+        for jj in range(dim):
+            AH[ii, jj] = Asol*sol[jj]
     return AH
 
 
@@ -76,9 +78,10 @@ def add_macro2minimizer(X, E):
     property or equaling to macroscopic value) and returns a corrector function
     with mean that equals to macroscopic value E.
     """
-    if np.allclose(X.mean(), E):
+    atol = max(1e-8, 10*np.finfo(X.val.dtype).eps) # also for single precision
+    if np.allclose(X.mean(), E, atol=atol):
         return X
-    elif np.allclose(X.mean(), np.zeros_like(E)):
+    elif np.allclose(X.mean(), np.zeros_like(E), atol=atol):
         EN = X.zeros_like(name='EN')
         EN.set_mean(E)
         return X + EN
@@ -1,21 +1,32 @@
 import numpy as np
-import scipy as sp
-from ffthompy.trigpol import Grid, get_Nodd, mean_index, fft_form_default
+from ffthompy.trigpol import mean_index, fft_form_default, get_derivative_freq, zero_nyquist
 from ffthompy.matvecs import Matrix
 from ffthompy.tensors import Tensor
-import itertools
+from ffthompy.tensors.cache import get_kernel
+from ffthompy.tensors.fft import complex_dtype
+from ffthompy.mechanics.matcoef import ElasticTensor
 
 
-def scalar(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default):
+def scalar(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default, dtype=None,
+           scheme='spectral'):
     """
     Assembly of discrete kernels in Fourier space for scalar elliptic problems.
 
+    The kernels are evaluated directly in the layout of fft_form; the values
+    at Nyquist frequencies are set to zero (NyqNul=True).
+
     Parameters
     ----------
     N : numpy.ndarray
         no. of discretization points
     Y : numpy.ndarray
         size of periodic unit cell
+    dtype : numpy.dtype
+        precision of kernels, e.g. numpy.float32
+    scheme : str
+        discrete derivative defining the curl-free fields (see
+        ffthompy.trigpol.get_derivative_freq); the kernels of staggered
+        schemes ('forward', 'backward') are complex
 
     Returns
     -------
@@ -26,69 +37,13 @@ def scalar(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default):
         discrete kernel in Fourier space; provides projection
         on divergence-free fields with zero mean
     """
-    if fft_form in ['r']:
-        fft_form_r=True
-        fft_form=0
-    else:
-        fft_form_r=False
-
-    d = np.size(N)
     N = np.array(N, dtype=np.int)
-    if NyqNul:
-        Nred = get_Nodd(N)
-    else:
-        Nred = N
-
-    xi = Grid.get_xil(Nred, Y, fft_form=fft_form)
-    xi2 = []
-    for m in np.arange(d):
-        xi2.append(xi[m]**2)
-
-    G0l = np.zeros(np.hstack([d, d, Nred]))
-    G1l = np.zeros(np.hstack([d, d, Nred]))
-    G2l = np.zeros(np.hstack([d, d, Nred]))
-    num = np.zeros(np.hstack([d, d, Nred]))
-    denom = np.zeros(Nred)
+    if dtype is None:
+        dtype = np.float
 
-    ind_center = mean_index(Nred, fft_form=fft_form)
-    for m in np.arange(d): # diagonal components
-        Nshape = np.ones(d, dtype=np.int)
-        Nshape[m] = Nred[m]
-        Nrep = np.copy(Nred)
-        Nrep[m] = 1
-        a = np.reshape(xi2[m], Nshape)
-        num[m][m] = np.tile(a, Nrep) # numerator
-        denom = denom + num[m][m]
-        G0l[m, m][ind_center] = 1
-
-    for m in np.arange(d): # upper diagonal components
-        for n in np.arange(m+1, d):
-            NshapeM = np.ones(d, dtype=np.int)
-            NshapeM[m] = Nred[m]
-            NrepM = np.copy(Nred)
-            NrepM[m] = 1
-            NshapeN = np.ones(d, dtype=np.int)
-            NshapeN[n] = Nred[n]
-            NrepN = np.copy(Nred)
-            NrepN[n] = 1
-            num[m][n] = np.tile(np.reshape(xi[m], NshapeM), NrepM) \
-                * np.tile(np.reshape(xi[n], NshapeN), NrepN)
-
-    # avoiding a division by zero
-    denom[ind_center] = 1
-
-    # calculation of projections
-    for m in np.arange(d):
-        for n in np.arange(m, d):
-            G1l[m][n] = num[m][n]/denom
-            G2l[m][n] = (m == n)*np.ones(Nred) - G1l[m][n]
-            G2l[m][n][ind_center] = 0
-
-    # symmetrization
-    for m in np.arange(1, d):
-        for n in np.arange(m):
-            G1l[m][n] = G1l[n][m]
-            G2l[m][n] = G2l[n][m]
+    G0l, G1l, G2l = get_kernel(lambda: scalar_kernels(N, Y, NyqNul, fft_form, dtype, scheme),
+                               'projections.scalar', N, Y, fft_form=fft_form,
+                               NyqNul=NyqNul, dtype=dtype, scheme=scheme)
 
     if tensor:
         G0l = Tensor(name='hG0', val=G0l, order=2, N=N, multype=21, Fourier=True, fft_form=fft_form)
@@ -98,20 +53,57 @@ def scalar(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default):
         G0l = Matrix(name='hG0', val=G0l, Fourier=True)
         G1l = Matrix(name='hG1', val=G1l, Fourier=True)
         G2l = Matrix(name='hG2', val=G2l, Fourier=True)
+    return G0l, G1l, G2l
 
-    if NyqNul:
-        G0l = G0l.enlarge(N)
-        G1l = G1l.enlarge(N)
-        G2l = G2l.enlarge(N)
+def scalar_kernels(N, Y, NyqNul=True, fft_form=fft_form_default, dtype=np.float,
+                   scheme='spectral'):
+    """
+    Values of kernels G0l, G1l, G2l (see scalar) stacked in one array.
+    """
+    d = N.size
+    xi, shift, N_fft = get_derivative_freq(N, Y, fft_form=fft_form, scheme=scheme, common=False)
+    ind_center = mean_index(N, fft_form=fft_form)
 
-    if fft_form_r:
-        for tensor in [G0l, G1l, G2l]:
-            tensor.set_fft_form(fft_form='r')
-            tensor.val/=np.prod(tensor.N)
+    denom = np.zeros(N_fft)
+    for m in range(d):
+        denom += xi[m]**2
+    denom[denom == 0] = 1 # avoiding a division by zero (zero frequency)
 
-    return G0l, G1l, G2l
+    G = np.zeros((3, d, d)+N_fft, dtype=dtype)
+    G0l, G1l, G2l = G
+    for m in range(d):
+        G0l[m, m][ind_center] = 1
+        for n in range(m, d):
+            G1l[m, n] = xi[m]*xi[n]/denom
+            np.negative(G1l[m, n], out=G2l[m, n])
+        G2l[m, m] += 1
+        G2l[m, m][ind_center] = 0
 
-def elasticity(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default):
+    # symmetrization
+    for m in range(1, d):
+        for n in range(m):
+            G1l[m, n] = G1l[n, m]
+            G2l[m, n] = G2l[n, m]
+
+    if shift is not None: # staggered components
+        G = G*get_phase(shift).astype(complex_dtype(dtype))
+    if NyqNul:
+        zero_nyquist(G, N, fft_form=fft_form)
+    return G
+
+def get_phase(shift):
+    """
+    Phase factors shift[I]*conj(shift[J]) of kernels (of shape (I, J)+N_fft)
+    acting on staggered components.
+    """
+    n = len(shift)
+    phase = np.empty((n, n)+np.broadcast(*shift).shape, dtype=np.complex)
+    for I, J in np.ndindex(n, n):
+        phase[I, J] = shift[I]*np.conj(shift[J])
+    return phase
+
+def elasticity(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default, dtype=None,
+               scheme='spectral'):
     """
     Projection matrix on a space of admissible strain fields
     INPUT =
@@ -119,149 +111,80 @@ def elasticity(N, Y, NyqNul=True, tensor=True, fft_form=fft_form_default):
         d : dimension; d = 2
         D : dimension in engineering notation; D = 3
         Y : the size of periodic unit cell
+        dtype : precision of kernels, e.g. numpy.float32
+        scheme : discrete derivative (see ffthompy.trigpol.get_derivative_freq)
     OUTPUT =
         G1h,G1s,G2h,G2s : projection matrices of size DxDxN
-    """
-    if fft_form in ['r']:
-        fft_form_r=True
-        fft_form=0
-    else:
-        fft_form_r=False
 
-    xi = Grid.get_xil(N, Y, fft_form=fft_form)
+    The kernels are evaluated directly in the layout of fft_form
+    for components in Mandel's notation.
+    """
     N = np.array(N, dtype=np.int)
-    d = N.size
-    D = int(d*(d+1)/2)
-
-    if NyqNul:
-        Nred = get_Nodd(N)
-    else:
-        Nred = N
-
-    xi2 = []
-    for ii in range(d):
-        xi2.append(xi[ii]**2)
-
-    num = np.zeros(np.hstack([d, d, Nred]))
-    norm2_xi = np.zeros(Nred)
-    for mm in np.arange(d): # diagonal components
-        Nshape = np.ones(d, dtype=np.int)
-        Nshape[mm] = Nred[mm]
-        Nrep = np.copy(Nred)
-        Nrep[mm] = 1
-        num[mm][mm] = np.tile(np.reshape(xi2[mm], Nshape), Nrep) # numerator
-        norm2_xi += num[mm][mm]
-
-    norm4_xi = norm2_xi**2
-    ind_center = mean_index(Nred, fft_form=fft_form)
-    # avoid division by zero
-    norm2_xi[ind_center] = 1
-    norm4_xi[ind_center] = 1
-
-    for m in np.arange(d): # upper diagonal components
-        for n in np.arange(m+1, d):
-            NshapeM = np.ones(d, dtype=np.int)
-            NshapeM[m] = Nred[m]
-            NrepM = np.copy(Nred)
-            NrepM[m] = 1
-            NshapeN = np.ones(d, dtype=np.int)
-            NshapeN[n] = Nred[n]
-            NrepN = np.copy(Nred)
-            NrepN[n] = 1
-            num[m][n] = np.tile(np.reshape(xi[m], NshapeM), NrepM) \
-                * np.tile(np.reshape(xi[n], NshapeN), NrepN)
-
-    # G1h = np.zeros([D,D]).tolist()
-    G1h = np.zeros(np.hstack([D, D, Nred]))
-    G1s = np.zeros(np.hstack([D, D, Nred]))
-    IS0 = np.zeros(np.hstack([D, D, Nred]))
-    mean = np.zeros(np.hstack([D, D, Nred]))
-    Lamh = np.zeros(np.hstack([D, D, Nred]))
-    S = np.zeros(np.hstack([D, D, Nred]))
-    W = np.zeros(np.hstack([D, D, Nred]))
-    WT = np.zeros(np.hstack([D, D, Nred]))
+    if dtype is None:
+        dtype = np.float
 
-    for m in np.arange(d):
-        S[m][m] = 2*num[m][m]/norm2_xi
-        for n in np.arange(d):
-            G1h[m][n] = num[m][m]*num[n][n]/norm4_xi
-            Lamh[m][n] = np.ones(Nred)/d
-            Lamh[m][n][ind_center] = 0
-
-    for m in np.arange(D):
-        IS0[m][m] = np.ones(Nred)
-        IS0[m][m][ind_center] = 0
-        mean[m][m][ind_center] = 1
-
-    if d == 2:
-        S[0][2] = 2**0.5*num[0][1]/norm2_xi
-        S[1][2] = 2**0.5*num[0][1]/norm2_xi
-        S[2][2] = np.ones(Nred)
-        S[2][2][ind_center] = 0
-        G1h[0][2] = 2**0.5*num[0][0]*num[0][1]/norm4_xi
-        G1h[1][2] = 2**0.5*num[0][1]*num[1][1]/norm4_xi
-        G1h[2][2] = 2*num[0][0]*num[1][1]/norm4_xi
-        for m in np.arange(d):
-            for n in np.arange(d):
-                W[m][n] = num[m][m]/norm2_xi
-            W[2][m] = 2**.5*num[0][1]/norm2_xi
-
-    elif d == 3:
-        for m in np.arange(d):
-            S[m+3][m+3] = 1 - num[m][m]/norm2_xi
-            S[m+3][m+3][ind_center] = 0
-        for m in np.arange(d):
-            for n in np.arange(m+1, d):
-                S[m+3][n+3] = num[m][n]/norm2_xi
-                G1h[m+3][n+3] = num[m][m]*num[n][n]/norm4_xi
-        for m in np.arange(d):
-            for n in np.arange(d):
-                ind = sp.setdiff1d(np.arange(d), [n])
-                S[m][n+3] = (0 == (m == n))*2**.5*num[ind[0]][ind[1]]/norm2_xi
-                G1h[m][n+3] = 2**.5*num[m][m]*num[ind[0]][ind[1]]/norm4_xi
-                W[m][n] = num[m][m]/norm2_xi
-                W[n+3][m] = 2**.5*num[ind[0]][ind[1]]/norm2_xi
-        for m in np.arange(d):
-            for n in np.arange(d):
-                ind_m = sp.setdiff1d(np.arange(d), [m])
-                ind_n = sp.setdiff1d(np.arange(d), [n])
-                G1h[m+3][n+3] = 2*num[ind_m[0]][ind_m[1]] \
-                    * num[ind_n[0]][ind_n[1]] / norm4_xi
-    # symmetrization
-    for n in np.arange(D):
-        for m in np.arange(n+1, D):
-            S[m][n] = S[n][m]
-            G1h[m][n] = G1h[n][m]
-    for m in np.arange(D):
-        for n in np.arange(D):
-            G1s[m][n] = S[m][n] - 2*G1h[m][n]
-            WT[m][n] = W[n][m]
-    G2h = 1./(d-1)*(d*Lamh + G1h - W - WT)
-    G2s = IS0 - G1h - G1s - G2h
+    G0, G1h, G1s, G2h, G2s = get_kernel(
+        lambda: elasticity_kernels(N, Y, NyqNul, fft_form, dtype, scheme),
+        'projections.elasticity', N, Y, fft_form=fft_form, NyqNul=NyqNul, dtype=dtype,
+        scheme=scheme)
 
     if tensor:
-        G0 = Tensor(name='hG0', val=mean, order=2, N=N, Fourier=True, multype=21, fft_form=fft_form)
+        G0 = Tensor(name='hG0', val=G0, order=2, N=N, Fourier=True, multype=21, fft_form=fft_form)
         G1h = Tensor(name='hG1h', val=G1h, order=2, N=N, Fourier=True, multype=21, fft_form=fft_form)
         G1s = Tensor(name='hG1s', val=G1s, order=2, N=N, Fourier=True, multype=21, fft_form=fft_form)
         G2h = Tensor(name='hG2h', val=G2h, order=2, N=N, Fourier=True, multype=21, fft_form=fft_form)
         G2s = Tensor(name='hG2s', val=G2s, order=2, N=N, Fourier=True, multype=21, fft_form=fft_form)
     else:
-        G0 = Matrix(name='hG0', val=mean, Fourier=True)
+        G0 = Matrix(name='hG0', val=G0, Fourier=True)
         G1h = Matrix(name='hG1h', val=G1h, Fourier=True)
         G1s = Matrix(name='hG1s', val=G1s, Fourier=True)
         G2h = Matrix(name='hG2h', val=G2h, Fourier=True)
         G2s = Matrix(name='hG2s', val=G2s, Fourier=True)
+    return G0, G1h, G1s, G2h, G2s
 
+def elasticity_kernels(N, Y, NyqNul=True, fft_form=fft_form_default, dtype=np.float,
+                       scheme='spectral'):
+    """
+    Values of kernels G0, G1h, G1s, G2h, G2s (see elasticity) stacked in one array.
+    """
+    d = N.size
+    D = int(d*(d+1)/2)
+    xi, shift, N_fft = get_derivative_freq(N, Y, fft_form=fft_form, scheme=scheme, common=False)
+    ind_center = mean_index(N, fft_form=fft_form)
+
+    norm2_xi = np.zeros(N_fft)
+    for m in range(d):
+        norm2_xi += xi[m]**2
+    norm2_xi[norm2_xi == 0] = 1 # avoid division by zero (zero frequency)
+
+    # components of symmetrized dyad xi*xi in Mandel's notation
+    pairs = ElasticTensor.get_mandel_pairs(d)
+    coef = [1. if a == b else 2**.5 for a, b in pairs]
+    q = lambda I: coef[I]*xi[pairs[I][0]]*xi[pairs[I][1]]
+    delta = lambda i, j: float(i == j)
+
+    G = np.zeros((5, D, D)+N_fft, dtype=dtype)
+    G0, G1h, G1s, G2h, G2s = G
+    for I, J in np.ndindex(D, D):
+        (a, b), (c, e) = pairs[I], pairs[J]
+        G1h[I, J] = q(I)*q(J)/norm2_xi**2
+        # projection on compatible strains
+        S = coef[I]*coef[J]/2*(delta(a, c)*xi[b]*xi[e] + delta(a, e)*xi[b]*xi[c] +
+                               delta(b, c)*xi[a]*xi[e] + delta(b, e)*xi[a]*xi[c])/norm2_xi
+        G1s[I, J] = S - 2*G1h[I, J]
+        G2h[I, J] = G1h[I, J] - (I < d)*q(J)/norm2_xi - (J < d)*q(I)/norm2_xi
+        if I < d and J < d:
+            G2h[I, J] += 1
+        G2h[I, J] /= d-1
+        G2h[I, J][ind_center] = 0
+        G2s[I, J] = delta(I, J) - G1h[I, J] - G1s[I, J] - G2h[I, J]
+        G2s[I, J][ind_center] = 0
+    for I in range(D):
+        G0[I, I][ind_center] = 1
+
+    if shift is not None: # strain component (a,b) is shifted along axes a and b
+        shift = [shift[a]*shift[b] for a, b in pairs]
+        G = G*get_phase(shift).astype(complex_dtype(dtype))
     if NyqNul:
-        G0 = G0.enlarge(N)
-        G1h = G1h.enlarge(N)
-        G1s = G1s.enlarge(N)
-        G2h = G2h.enlarge(N)
-        G2s = G2s.enlarge(N)
-
-    if fft_form_r:
-        for tensor in [G0, G1h, G1s, G2h, G2s]:
-            tensor.set_fft_form(fft_form='r')
-            tensor.val=1./np.prod(tensor.N)*tensor.val
-
-    return G0, G1h, G1s, G2h, G2s
+        zero_nyquist(G, N, fft_form=fft_form)
+    return G
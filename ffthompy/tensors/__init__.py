@@ -1,3 +1,3 @@
-from .objects import Tensor
-from .operators import (DFT, grad, div, symgrad, potential, Operator, matrix2tensor,
-                        grad_div_tensor, grad_tensor, div_tensor)
+from .objects import Tensor, SymmetricTensor, stack, unstack
+from .operators import (DFT, grad, div, laplace, symgrad, potential, Operator, matrix2tensor,
+                        grad_div_tensor, grad_tensor, div_tensor, Grad, Div, Laplace)
@@ -0,0 +1,164 @@
+"""
+This module contains a process-wide cache of Fourier kernels (projections
+and frequency grids); the kernels are built by get_kernel in the modules
+defining them (e.g. ffthompy.projections), so they are shared by all
+calculations with the same grid.
+
+The kernels are stored as read-only numpy arrays under a key (kind, N, Y,
+fft_form, NyqNul, dtype, scheme); the least recently used kernels are evicted when
+the total size exceeds a memory cap. The kernels can be also stored on disk
+(one .npy file per kernel), so that other processes memory-map them instead
+of building them again; the store is enabled by set_cache(path=...) or by
+setting the environment variable FFTHOMPY_KERNELS to a directory.
+"""
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+from collections import OrderedDict
+from warnings import warn
+
+
+class KernelCache():
+    """
+    LRU cache of kernels (numpy.ndarray).
+
+    Parameters
+    ----------
+    maxsize : int
+        memory cap in bytes; larger kernels are not cached
+    path : str
+        directory of on-disk store; if None, the kernels are kept in memory only
+    """
+    def __init__(self, maxsize=2**28, path=None):
+        self.maxsize=int(maxsize)
+        self.path=path
+        self.data=OrderedDict()
+        self.nbytes=0
+        self.hits=0
+        self.misses=0
+
+    @staticmethod
+    def get_key(kind, N, Y=None, fft_form=None, NyqNul=None, dtype=None, scheme=None):
+        N=tuple(int(n) for n in np.atleast_1d(N))
+        if Y is None:
+            Y=np.ones(len(N))
+        Y=tuple(float(y) for y in np.atleast_1d(Y))
+        dtype=None if dtype is None else np.dtype(dtype).str
+        return (kind, N, Y, fft_form, NyqNul, dtype, scheme)
+
+    def get(self, key, builder):
+        """
+        Returns the kernel with the key; the kernel is built by builder()
+        if it is neither in memory nor on disk.
+        """
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits+=1
+            return self.data[key]
+
+        self.misses+=1
+        val=self.load(key)
+        if val is None:
+            val=np.asarray(builder())
+            self.save(key, val)
+        if val.nbytes<=self.maxsize:
+            val.flags.writeable=False # shared by all callers
+            self.data[key]=val
+            self.nbytes+=val.nbytes
+            self.evict()
+        return val
+
+    def evict(self):
+        while self.nbytes>self.maxsize:
+            _, val=self.data.popitem(last=False)
+            self.nbytes-=val.nbytes
+
+    def filename(self, key):
+        name=hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.path, '{}_{}.npy'.format(key[0], name))
+
+    def load(self, key):
+        if self.path is None:
+            return None
+        try: # plain array mapped to the file, so that it is not treated as out-of-core Tensor
+            return np.asarray(np.load(self.filename(key), mmap_mode='r'))
+        except FileNotFoundError:
+            return None
+        except Exception: # corrupted or incompatible file is built again
+            return None
+
+    def save(self, key, val):
+        if self.path is None:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmpname=tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fop:
+                np.save(fop, val)
+            os.replace(tmpname, self.filename(key))
+        except OSError as e:
+            warn('Kernel was not saved ({}).'.format(e))
+
+    def clear(self, disk=False):
+        self.data.clear()
+        self.nbytes=0
+        if disk and self.path is not None and os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.path, name))
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return 'KernelCache(kernels={}, nbytes={}, maxsize={}, path={})'.format(
+            len(self), self.nbytes, self.maxsize, self.path)
+
+
+config={'cache': KernelCache(maxsize=int(os.environ.get('FFTHOMPY_CACHE_SIZE', 2**28)),
+                             path=os.environ.get('FFTHOMPY_KERNELS'))}
+
+def set_cache(maxsize=None, path=None, enable=True):
+    """
+    Set the process-wide cache of kernels.
+
+    Parameters
+    ----------
+    maxsize : int
+        memory cap in bytes; if None the actual setting is kept
+    path : str
+        directory of on-disk store; see KernelCache
+    enable : bool
+        if False, the kernels are always built again
+    """
+    if maxsize is None:
+        maxsize=config['cache'].maxsize
+    config['cache']=KernelCache(maxsize=maxsize if enable else 0,
+                                path=path if enable else None)
+    return config['cache']
+
+def get_cache():
+    return config['cache']
+
+def get_kernel(builder, kind, N, Y=None, fft_form=None, NyqNul=None, dtype=None, scheme=None):
+    """
+    Returns the kernel from the process-wide cache; builder() evaluates
+    the kernel if it is not cached.
+
+    The cached kernel is shared by all callers, so it is read-only
+    (writeable=False) and in-place operations on it, e.g. hG.val*=2 for
+    a Tensor hG wrapping it, raise ValueError; such callers have to copy
+    the values first (np.copy) or disable the cache (set_cache(enable=False)).
+    """
+    cache=config['cache']
+    key=cache.get_key(kind, N, Y=Y, fft_form=fft_form, NyqNul=NyqNul, dtype=dtype,
+                      scheme=scheme)
+    return cache.get(key, builder)
+
+def clear_cache(disk=False):
+    config['cache'].clear(disk=disk)
@@ -0,0 +1,314 @@
+"""
+This module contains Tensor and DFT distributed over MPI processes (mpi4py).
+
+The grid is decomposed into slabs: in the real domain, every process stores
+a block of the first spatial axis, in the Fourier domain a block of the second
+spatial axis. The DFT transforms the local axes and redistributes the data
+by a global transposition (Alltoallv). Scalar products, norms and means are
+reduced over all processes, so that Operator and the solvers in
+ffthompy.general.solver work unchanged. The matrix-free projections are
+restricted to the local block of frequencies (see distribute), so that
+every process evaluates the kernels of its block only.
+
+Example
+-------
+mpirun -n 4 python main.py input_file.py  # with solve['distributed']=True
+"""
+
+import numpy as np
+from ffthompy.trigpol import fft_form_default
+from ffthompy.tensors.objects import Tensor, scalar_product, norm_fun, dot
+from ffthompy.tensors.operators import DFT
+from ffthompy.tensors.projection import FourierProjection
+from ffthompy.tensors.fft import get_backend, real_dtype, complex_dtype
+
+try:
+    from mpi4py import MPI
+except ImportError:
+    MPI=None
+
+
+def get_comm(comm=None):
+    if MPI is None:
+        raise ImportError('Distributed tensors require mpi4py.')
+    if comm is None:
+        comm=MPI.COMM_WORLD
+    return comm
+
+def partition(n, comm):
+    """
+    Sizes of blocks of n points distributed over processes.
+    """
+    size=comm.Get_size()
+    return [n//size+(rank<n % size) for rank in range(size)]
+
+def local_slice(n, comm):
+    """
+    Slice of global indices (of n points) owned by the actual process.
+    """
+    counts=partition(n, comm)
+    rank=comm.Get_rank()
+    start=sum(counts[:rank])
+    return slice(start, start+counts[rank])
+
+def get_local_axis(Fourier, dim):
+    # distributed spatial axis
+    return 1 if Fourier and dim>1 else 0
+
+
+class DistributedTensor(Tensor):
+    """
+    Tensor whose values (val) are the local block of the process; N is
+    the global grid. The block of distributed axis is given by local_slice
+    of the first spatial axis (real domain) or the second one (Fourier domain).
+    """
+    def __init__(self, name='', val=None, order=None, shape=None, N=None, Y=None,
+                 multype='scal', Fourier=False, fft_form=fft_form_default, comm=None,
+                 dtype=None, **kwargs):
+        self.comm=get_comm(comm)
+        if fft_form not in [0, 'r']:
+            raise NotImplementedError('Distributed Tensor with fft_form ({})'.format(fft_form))
+        if val is None: # allocation of local block
+            if shape is None or N is None:
+                raise ValueError('Initialization of DistributedTensor.')
+            N=tuple(np.array(N, dtype=np.int))
+            shape=tuple(np.array(shape, dtype=np.int))
+            Nval=list(self.get_N_real(N) if Fourier and fft_form in ['r'] else N)
+            ax=get_local_axis(Fourier, len(N))
+            Nval[ax]=partition(Nval[ax], self.comm)[self.comm.Get_rank()]
+            dtype=np.float if dtype is None else real_dtype(dtype)
+            val=np.zeros(shape+tuple(Nval), dtype=complex_dtype(dtype) if Fourier else dtype)
+            order=len(shape)
+        Tensor.__init__(self, name=name, val=val, order=order, N=N, Y=Y, multype=multype,
+                        Fourier=Fourier, fft_form=fft_form, **kwargs)
+
+    def copy(self, **kwargs):
+        kwargs.setdefault('comm', self.comm)
+        return self._copy(self.keys, **kwargs)
+
+    @property
+    def local_axis(self):
+        return get_local_axis(self.Fourier, self.dim)
+
+    def local_slice(self):
+        n=self.N[self.local_axis] if not self.Fourier else self.N_fft[self.local_axis]
+        return local_slice(n, self.comm)
+
+    def is_mean_owner(self):
+        # the process storing the zero frequency
+        return self.local_slice().start==0 or not self.Fourier
+
+    def __mul__(self, Y, *args, **kwargs):
+        if self.multype in ['scal', 'scalar']:
+            return distributed_scalar_product(self, Y, *args, **kwargs)
+        return Tensor.__mul__(self, Y, *args, **kwargs)
+
+    def norm(self, ntype='L2', componentwise=False):
+        if componentwise:
+            scal=np.empty(self.shape)
+            for ind in np.ndindex(*self.shape):
+                obj=self.copy(name='aux', val=self.val[ind], order=0)
+                scal[ind]=obj.norm(ntype=ntype)
+            return scal
+        elif ntype in ['L2', 2]:
+            return distributed_scalar_product(self, self)**0.5
+        elif ntype==1:
+            return self.comm.allreduce(norm_fun(self, ntype=1), op=MPI.SUM)
+        elif ntype=='inf':
+            return self.comm.allreduce(norm_fun(self, ntype='inf'), op=MPI.MAX)
+        else:
+            return norm_fun(self, ntype=ntype)
+
+    def mean(self):
+        mean=np.zeros(self.shape)
+        if self.Fourier:
+            if self.is_mean_owner():
+                mean=Tensor.mean(self)
+        else:
+            for di in np.ndindex(*self.shape):
+                mean[di]=np.sum(self.val[di])/self.pN()
+        return self.comm.allreduce(mean, op=MPI.SUM)
+
+    def add_mean(self, mean):
+        if not self.Fourier or self.is_mean_owner():
+            Tensor.add_mean(self, mean)
+        return self
+
+    def set_mean(self, mean):
+        assert(self.shape==mean.shape)
+        self.add_mean(mean-self.mean())
+        return self
+
+    def gather(self):
+        """
+        Returns the whole (not distributed) Tensor on every process.
+        """
+        ax=self.order+self.local_axis
+        val=np.concatenate(self.comm.allgather(self.val), axis=ax)
+        return Tensor(name=self.name, val=val, order=self.order, N=self.N, Y=self.Y,
+                      multype=self.multype, Fourier=self.Fourier, fft_form=self.fft_form,
+                      origin=self.origin)
+
+    def fourier(self, Fourier=None, copy=False, out=None):
+        if self.Fourier==Fourier:
+            return self.copy() if copy else self
+        F=DistributedDFT(N=self.N, inverse=self.Fourier, fft_form=self.fft_form,
+                         fft_backend=self.fft_backend, comm=self.comm)
+        res=F(self, out=out)
+        if not copy and out is None:
+            self.val, self.Fourier=res.val, res.Fourier
+            return self
+        return res
+
+
+def distribute(X, comm=None):
+    """
+    Distributes a whole Tensor (identical on all processes) to DistributedTensor;
+    a matrix-free projection (FourierProjection) is restricted to the local
+    block of frequencies.
+    """
+    comm=get_comm(comm)
+    if isinstance(X, DistributedTensor):
+        return X
+    elif isinstance(X, FourierProjection):
+        ax=get_local_axis(True, X.dim)
+        return X.restrict(ax, local_slice(X.N_fft[ax], comm))
+    ax=get_local_axis(X.Fourier, X.dim)
+    slc=local_slice(X.val.shape[X.order+ax], comm)
+    val=np.copy(X.val[(X.order+ax)*(slice(None),)+(slc,)])
+    return DistributedTensor(name=X.name, val=val, order=X.order, N=X.N, Y=X.Y,
+                             multype=X.multype, Fourier=X.Fourier, fft_form=X.fft_form,
+                             origin=X.origin, comm=comm)
+
+def from_local(X, N, comm=None):
+    """
+    DistributedTensor from the local block X (Tensor) of the process;
+    N is the global grid.
+    """
+    return DistributedTensor(name=X.name, val=X.val, order=X.order, N=N, Y=X.Y,
+                             multype=X.multype, Fourier=X.Fourier, fft_form=X.fft_form,
+                             origin=X.origin, comm=comm)
+
+def gather(X):
+    if isinstance(X, DistributedTensor):
+        return X.gather()
+    return X
+
+def distributed_scalar_product(y, x, dtype=None):
+    """
+    Scalar product reduced over processes; see scalar_product.
+    """
+    assert(y.val.shape==x.val.shape)
+    assert(y.fft_form==x.fft_form)
+    if y.Fourier and x.fft_form in ['r'] and y.dim>1 and y.local_axis==y.dim-1:
+        # distributed half-spectrum with doubled inner frequencies
+        n=y.N_fft[-1]
+        sl=y.local_slice()
+        scal=2*dot(y.val, x.val, conj=True, dtype=dtype).real
+        if sl.start==0 and sl.stop>0:
+            scal-=dot(y.val[...,0], x.val[...,0], conj=True, dtype=dtype).real
+        if y.N[-1] % 2 == 0 and sl.stop==n and sl.stop>sl.start:
+            scal-=dot(y.val[...,-1], x.val[...,-1], conj=True, dtype=dtype).real
+        scal/=np.prod(y.N)**2
+    else:
+        scal=scalar_product(y, x, dtype=dtype)
+    return y.comm.allreduce(scal, op=MPI.SUM)
+
+def transpose(val, order, N_join, comm, forward=True):
+    """
+    Global transposition of slabs; the distributed axis changes from the first
+    spatial axis to the second one (forward=True) or back.
+
+    Parameters
+    ----------
+    val : numpy.ndarray
+        local block of shape (...)+local grid
+    order : int
+        number of component axes
+    N_join : int
+        global size of the axis that becomes local
+    """
+    if comm.Get_size()==1:
+        return val
+    ax_split, ax_join=(order+1, order) if forward else (order, order+1)
+    counts_split=partition(val.shape[ax_split], comm)
+    counts_join=partition(N_join, comm)
+    rank=comm.Get_rank()
+
+    bounds=np.cumsum([0]+counts_split)
+    sendbuf=np.concatenate([np.take(val, range(bounds[p], bounds[p+1]), axis=ax_split).ravel()
+                            for p in range(comm.Get_size())])
+    sendcounts=[int(np.prod(val.shape)/val.shape[ax_split])*c for c in counts_split]
+
+    shapes=[]
+    for q in range(comm.Get_size()):
+        shape=list(val.shape)
+        shape[ax_split]=counts_split[rank]
+        shape[ax_join]=counts_join[q]
+        shapes.append(shape)
+    recvcounts=[int(np.prod(shape)) for shape in shapes]
+    recvbuf=np.empty(sum(recvcounts), dtype=val.dtype)
+    comm.Alltoallv([sendbuf, (sendcounts, list(np.cumsum([0]+sendcounts[:-1])))],
+                   [recvbuf, (recvcounts, list(np.cumsum([0]+recvcounts[:-1])))])
+    bounds=np.cumsum([0]+recvcounts)
+    blocks=[np.reshape(recvbuf[bounds[q]:bounds[q+1]], shapes[q])
+            for q in range(comm.Get_size())]
+    return np.concatenate(blocks, axis=ax_join)
+
+
+class DistributedDFT(DFT):
+    """
+    (inverse) DFT of DistributedTensor with slab decomposition;
+    fft_form in [0, 'r'].
+    """
+    def __init__(self, inverse=False, N=None, fft_form=fft_form_default, fft_backend=None,
+                 comm=None, **kwargs):
+        self.comm=get_comm(comm)
+        DFT.__init__(self, inverse=inverse, N=N, fft_form=fft_form, fft_backend=fft_backend,
+                     **kwargs)
+
+    def __call__(self, x, out=None):
+        if not isinstance(x, Tensor):
+            return DFT.__call__(self, x)
+        assert(x.Fourier==self.inverse)
+        if self.fft_form not in [0, 'r'] or len(self.N)<2:
+            raise NotImplementedError('Distributed DFT ({}, dim={})'.format(self.fft_form,
+                                                                          len(self.N)))
+        b=get_backend(self.fft_backend)
+        N=tuple(int(n) for n in self.N)
+        order=x.order
+        if self.inverse:
+            val=np.moveaxis(b.ifftn(np.moveaxis(x.val, order, -1), N[:1]), -1, order)
+            val=val*b.inverse_coef(N[:1])
+            val=transpose(val, order, N[1] if self.fft_form in [0] else self.N_fft[1],
+                          self.comm, forward=False)
+            if self.fft_form in ['r']:
+                val=b.irfftn(val, N[1:])*b.inverse_coef(N[1:])
+            else:
+                val=(b.ifftn(val, N[1:])*b.inverse_coef(N[1:])).real*np.prod(N)
+            name='iF({0})'.format(x.name[:10])
+        else:
+            assert(x.fft_form==self.fft_form)
+            if self.fft_form in ['r']:
+                val=np.copy(b.rfftn(x.val, N[1:]))
+            else:
+                val=b.fftn(x.val, N[1:])/np.prod(N)
+            val=transpose(val, order, N[0], self.comm, forward=True)
+            val=np.moveaxis(b.fftn(np.moveaxis(val, order, -1), N[:1]), -1, order)
+        if out is None:
+            return x.copy(name=name if self.inverse else 'F({0})'.format(x.name[:10]),
+                          val=np.copy(val), Fourier=not x.Fourier)
+        out.val[:]=val
+        out.update(Fourier=not x.Fourier)
+        return out
+
+    def empty_output(self, x, name=None):
+        # local block of the result
+        Nval=[int(n) for n in (self.N if self.inverse else self.N_fft)]
+        ax=get_local_axis(not self.inverse, len(Nval))
+        Nval[ax]=partition(Nval[ax], self.comm)[self.comm.Get_rank()]
+        dtype=x.dtype if self.inverse else complex_dtype(x.dtype)
+        if name is None:
+            name='empty({})'.format(x.name[:10])
+        return x.copy(name=name, val=np.empty(x.shape+tuple(Nval), dtype=dtype),
+                      Fourier=not x.Fourier)
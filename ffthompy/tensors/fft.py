@@ -1,43 +1,521 @@
+"""
+This module contains normalised (inverse) FFT algorithms used by Tensor and DFT.
+
+The transforms are evaluated by an FFT backend (numpy, scipy, pyfftw), which
+is chosen globally by set_backend() or per object by a parameter fft_backend.
+The backends cache their plans with a key (shape, N, axes, dtype, direction);
+backends with unavailable libraries fall back to numpy.fft.
+The mirror-symmetric transforms (sfftn, isfftn) work with non-negative grid
+points and frequencies only (fft_form='s').
+The plans of pyFFTW (wisdom) can be stored on disk by set_wisdom() or by
+setting the environment variable FFTHOMPY_WISDOM to a directory.
+"""
+
+import os
+import pickle
+import tempfile
 import numpy as np
 import numpy.fft as fft
+from warnings import warn
+from ffthompy.trigpol import mirror, get_parity
+from ffthompy.tensors.cache import KernelCache
+
+try:
+    import scipy.fft as scipy_fft
+except ImportError: # scipy<1.4
+    scipy_fft=None
+
+try:
+    import pyfftw
+    import pyfftw.builders
+except ImportError:
+    pyfftw=None
+
+
+class FFTBackend():
+    """
+    FFT backend based on numpy.fft; it is always available and serves
+    as a fallback of the other backends.
+
+    Parameters
+    ----------
+    threads : int
+        number of threads used by the backend (ignored by numpy.fft)
+
+    The methods (fftn, ifftn, rfftn, irfftn) write the result to the array out
+    if the library supports it; otherwise they return a new array
+    (fresh_output=True) or an internal buffer of a plan (fresh_output=False).
+    The inverse transforms are normalised after multiplication by
+    inverse_coef(N). The phase modulation of the centered transforms is
+    written to a scratch array of the backend (see get_buffer). The batch of components (e.g. the fields of several
+    loads) is transformed in chunks of about config['chunk'] values,
+    which stay in cache during the transforms along all axes.
+    """
+    name='numpy'
+    fresh_output=True
+
+    def __init__(self, threads=1):
+        self.threads=int(threads)
+        self.plans={}
+        self.buffer=None
+
+    @staticmethod
+    def get_axes(x, N):
+        return tuple(range(x.ndim-len(N), x.ndim))
+
+    def get_plan(self, x, N, direction):
+        N=tuple(int(n) for n in N)
+        axes=self.get_axes(x, N)
+        key=(x.shape, N, axes, x.dtype.str, direction)
+        if key not in self.plans:
+            self.plans[key]=self.plan(x, N, axes, direction)
+        return self.plans[key]
+
+    def plan(self, x, N, axes, direction):
+        fun=getattr(fft, direction)
+        dtype=result_dtype(x.dtype, direction) # numpy.fft computes in double precision
+        batch=int(np.prod(x.shape[:axes[0]]))
+        chunk=max(1, config['chunk']//int(np.prod(x.shape[axes[0]:])))
+        if chunk>=batch:
+            return lambda x, out=None: fun(x, N, axes=axes).astype(dtype, copy=False)
+
+        def execute(x, out=None):
+            xb=x.reshape((batch,)+x.shape[axes[0]:])
+            for ii in range(0, batch, chunk):
+                res=fun(xb[ii:ii+chunk], N, axes=tuple(range(1, len(N)+1)))
+                if ii==0:
+                    shape=x.shape[:axes[0]]+res.shape[1:]
+                    if out is None or out.shape!=shape or out.dtype!=dtype:
+                        out=np.empty(shape, dtype=dtype)
+                    val=out.reshape((batch,)+res.shape[1:])
+                    if not np.may_share_memory(val, out): # out cannot be reshaped to a view
+                        out=np.empty(shape, dtype=dtype)
+                        val=out.reshape((batch,)+res.shape[1:])
+                val[ii:ii+chunk]=res
+            return out
+        return execute
+
+    def clear(self):
+        self.plans.clear()
+        self.buffer=None
+
+    def empty(self, shape, dtype):
+        return np.empty(shape, dtype=dtype)
+
+    def get_buffer(self, shape, dtype):
+        # scratch array kept for the following calls of the same shape and precision
+        if self.buffer is None or self.buffer.shape!=shape or self.buffer.dtype!=dtype:
+            self.buffer=self.empty(shape, dtype)
+        return self.buffer
+
+    def inverse_coef(self, N):
+        return 1.
+
+    def fftn(self, x, N, out=None):
+        return self.get_plan(x, N, 'fftn')(x, out=out)
+
+    def ifftn(self, x, N, out=None):
+        return self.get_plan(x, N, 'ifftn')(x, out=out)
+
+    def rfftn(self, x, N, out=None):
+        return self.get_plan(x, N, 'rfftn')(x, out=out)
+
+    def irfftn(self, x, N, out=None):
+        return self.get_plan(x, N, 'irfftn')(x, out=out)
+
+    def __repr__(self):
+        return 'FFTBackend({0}, threads={1}, plans={2})'.format(self.name, self.threads,
+                                                              len(self.plans))
+
+
+class ScipyFFTBackend(FFTBackend):
+    """
+    FFT backend based on scipy.fft with multi-threading (parameter workers).
+    """
+    name='scipy'
+
+    def plan(self, x, N, axes, direction):
+        fun=getattr(scipy_fft, direction)
+        return lambda x, out=None: fun(x, N, axes=axes, workers=self.threads)
+
+
+class PyFFTWBackend(FFTBackend):
+    """
+    FFT backend based on pyFFTW; the plans (FFTW objects) are created once
+    for every key and then reused. The plans write directly to the arrays out
+    that are suitably aligned; otherwise they use their internal buffers.
+    """
+    name='pyfftw'
+    fresh_output=False
+    planner_effort='FFTW_MEASURE'
+
+    def plan(self, x, N, axes, direction):
+        store=get_wisdom()
+        if store is not None:
+            key=(self.name, pyfftw.__version__, direction, x.shape, N, axes, x.dtype.str,
+                 self.threads)
+            wisdom=store.load(key)
+            if wisdom is not None:
+                pyfftw.import_wisdom(wisdom)
+
+        builder=getattr(pyfftw.builders, direction)
+        plan=builder(pyfftw.empty_aligned(x.shape, dtype=x.dtype), s=N, axes=axes,
+                     threads=self.threads, planner_effort=self.planner_effort,
+                     avoid_copy=False, auto_align_input=True)
+
+        if store is not None and wisdom is None:
+            store.save(key, pyfftw.export_wisdom())
+        inp, buffer=plan.input_array, plan.output_array
+
+        def execute(x, out=None):
+            # the input is copied to internal array as c2r transforms destroy it
+            if out is None or out.dtype!=buffer.dtype or out.shape!=buffer.shape:
+                out=buffer
+            try:
+                plan.update_arrays(inp, out)
+            except ValueError: # misaligned output array
+                out=buffer
+                plan.update_arrays(inp, out)
+            np.copyto(inp, x)
+            plan.execute()
+            return out
+        return execute
+
+    def empty(self, shape, dtype):
+        return pyfftw.empty_aligned(shape, dtype=dtype)
+
+    def inverse_coef(self, N): # FFTW does not normalise the inverse transforms
+        return 1./np.prod(N)
+
+
+class WisdomStore():
+    """
+    On-disk store of FFT plans (wisdom); every plan is saved to a separate
+    file named by its key (library, version, direction, shape, N, axes,
+    dtype, threads). The files are written atomically (by renaming a temporary
+    file), so the store can be shared by concurrent processes.
+
+    Parameters
+    ----------
+    path : str
+        directory of the store; default is $FFTHOMPY_WISDOM or ~/.cache/ffthompy
+    """
+    def __init__(self, path=None):
+        if path is None:
+            path=os.environ.get('FFTHOMPY_WISDOM',
+                                os.path.join(os.path.expanduser('~'), '.cache', 'ffthompy'))
+        self.path=path
+
+    def filename(self, key):
+        name='_'.join('x'.join(map(str, k)) if isinstance(k, tuple) else str(k) for k in key)
+        for char in '<>|=':
+            name=name.replace(char, '')
+        return os.path.join(self.path, name+'.wisdom')
+
+    def load(self, key):
+        try:
+            with open(self.filename(key), 'rb') as fop:
+                return pickle.load(fop)
+        except FileNotFoundError:
+            return None
+        except Exception: # corrupted or incompatible file is planned again
+            return None
 
-def cfftnc(x, N):
+    def save(self, key, data):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmpname=tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fop:
+                pickle.dump(data, fop, protocol=3)
+            os.replace(tmpname, self.filename(key))
+        except OSError as e:
+            warn('FFT wisdom was not saved ({}).'.format(e))
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith('.wisdom'):
+                    os.remove(os.path.join(self.path, name))
+
+    def __repr__(self):
+        return 'WisdomStore({})'.format(self.path)
+
+
+backends={'numpy': FFTBackend,
+          'scipy': ScipyFFTBackend,
+          'pyfftw': PyFFTWBackend}
+
+available={'numpy': True,
+           'scipy': scipy_fft is not None,
+           'pyfftw': pyfftw is not None}
+
+config={'backend': 'numpy',
+        'threads': 1,
+        'chunk': 2**17, # no. of values in chunks of batches of the numpy backend
+        'wisdom': WisdomStore() if 'FFTHOMPY_WISDOM' in os.environ else None,
+        'phases': KernelCache(maxsize=2**26)} # phases of centered FFT capped in bytes
+
+_instances={}
+
+def set_backend(backend='numpy', threads=None):
+    """
+    Set the global FFT backend used by all objects without their own backend.
+
+    Parameters
+    ----------
+    backend : str
+        name of the backend; one of 'numpy', 'scipy', 'pyfftw'
+    threads : int
+        number of threads; if None the actual setting is kept
+    """
+    if backend not in backends:
+        raise ValueError('Unknown FFT backend ({}).'.format(backend))
+    config['backend']=backend
+    if threads is not None:
+        config['threads']=int(threads)
+    return get_backend()
+
+def get_backend(backend=None, threads=None):
+    """
+    Returns an instance of FFT backend; the instances (and thus their plans)
+    are shared for the same name and number of threads.
+    """
+    if isinstance(backend, FFTBackend):
+        return backend
+    if backend is None:
+        backend=config['backend']
+    if threads is None:
+        threads=config['threads']
+
+    if backend not in backends:
+        raise ValueError('Unknown FFT backend ({}).'.format(backend))
+    elif not available[backend]:
+        warn('FFT backend ({}) is not available; numpy.fft is used instead.'.format(backend))
+        backend='numpy'
+
+    key=(backend, int(threads))
+    if key not in _instances:
+        _instances[key]=backends[backend](threads=threads)
+    return _instances[key]
+
+def set_wisdom(path=None, enable=True):
+    """
+    Enable (or disable) the on-disk store of FFT plans.
+
+    Parameters
+    ----------
+    path : str
+        directory of the store; see WisdomStore
+    enable : bool
+        if False, the plans are not stored
+    """
+    config['wisdom']=WisdomStore(path) if enable else None
+    return config['wisdom']
+
+def get_wisdom():
+    return config['wisdom']
+
+def real_dtype(dtype):
+    return np.finfo(dtype).dtype
+
+def complex_dtype(dtype):
+    return np.result_type(real_dtype(dtype), np.complex64)
+
+def result_dtype(dtype, direction):
+    """
+    Data type of result of FFT preserving the precision of the input.
+    """
+    if direction in ['irfftn']:
+        return real_dtype(dtype)
+    return complex_dtype(dtype)
+
+def clear_plans():
+    for instance in _instances.values():
+        instance.clear()
+
+def empty(shape, dtype, backend=None):
+    """
+    Allocates an array suitable as an output of FFT (aligned for pyFFTW).
+    """
+    return get_backend(backend).empty(shape, dtype)
+
+def _store(res, out, b, coef=None):
+    # writes (scaled) result res of backend b to out
+    if out is None:
+        if b.fresh_output:
+            out=res
+        elif coef is None:
+            return res.copy()
+    if coef is None:
+        if res is not out:
+            np.copyto(out, res)
+        return out
+    return np.multiply(res, coef, out=out)
+
+def _real(res, out, coef):
+    # real part of complex result res scaled by coef
+    return np.multiply(res.real, coef, out=out)
+
+def get_phase(N, kind='in', conj=False, coef=1., dtype=np.float64):
+    """
+    Phase modulation replacing the shifts of centered FFT algorithms;
+    with h=fix(N/2) for every dimension, it holds
+    kind='in' : fftshift(fftn(x)) = fftn(phase*x)
+    kind='out' : fftshift(fftn(ifftshift(x))) = phase_out*fftn(phase_in*x)
+    For even N, the phase is real (+1 or -1). The phases are cached in
+    config['phases'] (a KernelCache with a cap in bytes) and are read-only.
+
+    Parameters
+    ----------
+    N : tuple
+        no. of grid points
+    kind : str
+        'in' (phase exp(2*pi*i*h*k/N)) or 'out' (phase exp(2*pi*i*h*(k-h)/N))
+    conj : bool
+        complex conjugate of the phase
+    coef : float
+        scaling factor included in the phase
+    dtype : numpy.dtype
+        precision of the phase
+    """
+    N=tuple(int(n) for n in N)
+    key=(N, kind, bool(conj), float(coef), np.dtype(dtype).str)
+    phase=config['phases'].get(key, lambda: _phase(N, kind, conj, coef, dtype))
+    phase.flags.writeable=False # also the phases over the cap, which are not cached
+    return phase
+
+def _phase(N, kind, conj, coef, dtype):
+    phase=np.ones(N, dtype=np.float)*coef
+    for ii, n in enumerate(N):
+        h=n//2
+        k=np.arange(n)
+        if kind not in ['in']:
+            k=k-h
+        if n % 2 == 0:
+            phi=(-1.)**k
+        else:
+            phi=np.exp((-1j if conj else 1j)*2*np.pi*h*k/n)
+        shape=np.ones(len(N), dtype=np.int)
+        shape[ii]=n
+        phase=phase*np.reshape(phi, shape)
+    return phase.astype(complex_dtype(dtype) if np.iscomplexobj(phase) else real_dtype(dtype))
+
+def _modulate(x, phase, b, out=None):
+    # x*phase written to out (if it can hold it) or to the scratch array of backend b
+    dtype=np.result_type(x.dtype, phase.dtype)
+    if out is None or out.shape!=x.shape or not np.can_cast(dtype, out.dtype):
+        out=b.get_buffer(x.shape, dtype)
+    return np.multiply(x, phase, out=out)
+
+def _check_grid(x, N):
+    N=tuple(int(n) for n in N)
+    assert(x.shape[x.ndim-len(N):]==N)
+    return N
+
+def cfftnc(x, N, backend=None, out=None):
     """
     real and Fourier centered n-dimensional FFT algorithm
     """
-    ax=tuple(np.setdiff1d(list(range(x.ndim)), list(range(x.ndim-N.__len__())), assume_unique=True))
-    return 1./np.prod(N)*fft.fftshift(fft.fftn(fft.ifftshift(x, ax), N), ax)
+    N=_check_grid(x, N)
+    b=get_backend(backend)
+    xp=_modulate(x, get_phase(N, 'in', coef=1./np.prod(N), dtype=real_dtype(x.dtype)), b, out)
+    res=b.fftn(xp, N, out=out)
+    if b.fresh_output and out is None:
+        out=res
+    return np.multiply(res, get_phase(N, 'out', dtype=real_dtype(x.dtype)), out=out)
 
-def icfftnc(Fx, N):
+def icfftnc(Fx, N, backend=None, out=None):
     """
     real and Fourier centered n-dimensional inverse FFT algorithm
     """
-    ax=tuple(np.setdiff1d(list(range(Fx.ndim)), list(range(Fx.ndim-N.__len__())), assume_unique=True))
-    return fft.fftshift(fft.ifftn(fft.ifftshift(Fx, ax), N), ax).real*np.prod(N)
+    N=_check_grid(Fx, N)
+    b=get_backend(backend)
+    dtype=real_dtype(Fx.dtype)
+    res=b.ifftn(_modulate(Fx, get_phase(N, 'in', conj=True, dtype=dtype), b), N)
+    res*=get_phase(N, 'out', conj=True, coef=np.prod(N)*b.inverse_coef(N), dtype=dtype)
+    return _real(res, out, 1.)
 
-def fftnc(x, N):
+def fftnc(x, N, backend=None, out=None):
     """
     Fourier centered n-dimensional FFT algorithm
     """
-    ax=tuple(np.setdiff1d(list(range(x.ndim)), list(range(x.ndim-N.__len__())), assume_unique=True))
-    return 1./np.prod(N)*fft.fftshift(fft.fftn(x, N), ax)
+    N=_check_grid(x, N)
+    b=get_backend(backend)
+    phase=get_phase(N, 'in', coef=1./np.prod(N), dtype=real_dtype(x.dtype))
+    return _store(b.fftn(_modulate(x, phase, b, out), N, out=out), out, b)
 
-def icfftn(Fx, N):
+def icfftn(Fx, N, backend=None, out=None):
     """
     Fourier centered n-dimensional inverse FFT algorithm
     """
-    ax=tuple(np.setdiff1d(list(range(Fx.ndim)), list(range(Fx.ndim-N.__len__())), assume_unique=True))
-    return fft.ifftn(fft.ifftshift(Fx, ax), N).real*np.prod(N)
+    N=_check_grid(Fx, N)
+    b=get_backend(backend)
+    res=b.ifftn(Fx, N)
+    res*=get_phase(N, 'in', conj=True, coef=np.prod(N)*b.inverse_coef(N),
+                   dtype=real_dtype(Fx.dtype))
+    return _real(res, out, 1.)
 
+def fftn(x, N, backend=None, out=None): # normalised FFT
+    b=get_backend(backend)
+    return _store(b.fftn(x, N, out=out), out, b, coef=1./np.prod(N))
 
-def fftn(x, N): # normalised FFT
-    return 1./np.prod(N)*fft.fftn(x, N)
+def ifftn(x, N, backend=None, out=None): # normalised FFT
+    b=get_backend(backend)
+    return _real(b.ifftn(x, N), out, np.prod(N)*b.inverse_coef(N))
 
-def ifftn(x, N): # normalised FFT
-    return fft.ifftn(x, N).real*np.prod(N)
+def rfftn(x, N, backend=None, out=None): # real-valued FFT
+    b=get_backend(backend)
+    return _store(b.rfftn(x, N, out=out), out, b)
 
-def rfftn(x, N): # real-valued FFT
-    return fft.rfftn(x, N)
+def irfftn(x, N, backend=None, out=None): # real-valued FFT
+    b=get_backend(backend)
+    coef=b.inverse_coef(N)
+    return _store(b.irfftn(x, N, out=out), out, b, coef=None if coef==1. else coef)
 
-def irfftn(x, N): # real-valued FFT
-    return fft.irfftn(x, N)
+def sfftn(x, N, parity=None, backend=None, out=None):
+    """
+    Normalised FFT of mirror-symmetric data stored at non-negative grid points;
+    the transform proceeds axis by axis by real FFT of the mirrored data,
+    the results are real (even parity) or imaginary (odd parity) and only
+    the real numbers are stored, i.e. the Fourier coefficients read
+    fftn(x)=prod(1j**parity)*sfftn(x).
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        data of shape (...)+Nsym with Nsym=fix(N/2)+1
+    N : tuple
+        no. of grid points of the whole cell
+    parity : numpy.ndarray
+        parity (0 even, 1 odd) of components along every axis; see get_parity
+    """
+    N=tuple(int(n) for n in N)
+    order=x.ndim-len(N)
+    parity=get_parity(parity, x.shape[:order], len(N))
+    if out is None:
+        out=np.empty(x.shape, dtype=real_dtype(x.dtype))
+    for ind in np.ndindex(*x.shape[:order]):
+        val=x[ind]
+        for ax, n in enumerate(N):
+            Fval=rfftn(np.moveaxis(mirror(val, ax, n, parity[ind][ax]), ax, -1), (n,),
+                       backend=backend)
+            val=np.moveaxis(Fval.imag if parity[ind][ax] else Fval.real, -1, ax)
+        np.multiply(val, 1./np.prod(N), out=out[ind])
+    return out
+
+def isfftn(Fx, N, parity=None, backend=None, out=None):
+    """
+    Normalised inverse FFT of mirror-symmetric data; inverse to sfftn.
+    """
+    N=tuple(int(n) for n in N)
+    order=Fx.ndim-len(N)
+    parity=get_parity(parity, Fx.shape[:order], len(N))
+    if out is None:
+        out=np.empty(Fx.shape, dtype=real_dtype(Fx.dtype))
+    for ind in np.ndindex(*Fx.shape[:order]):
+        val=Fx[ind]
+        for ax, n in enumerate(N):
+            Fval=np.moveaxis(val, ax, -1)*(1j if parity[ind][ax] else 1.+0j)
+            val=np.moveaxis(irfftn(Fval, (n,), backend=backend)[..., :Fval.shape[-1]], -1, ax)
+        np.multiply(val, np.prod(N), out=out[ind])
+    return out
@@ -8,9 +8,14 @@ from ffthompy.general.base import Representation
 from ffthompy.trigpol import mean_index, fft_form_default, get_Nodd
 from ffthompy.mechanics.matcoef import ElasticTensor
 from ffthompy.trigpol import enlarge, decrease, get_inverse
-from ffthompy.tensors.fft import fftn, ifftn, fftnc, icfftn, rfftn, irfftn
+from ffthompy.trigpol import get_Nsym, get_sym_weights, get_parity, sym_fold, sym_unfold
+from ffthompy.tensors.fft import fftn, ifftn, fftnc, icfftn, rfftn, irfftn, sfftn, isfftn
+from ffthompy.tensors.fft import real_dtype, complex_dtype
+from ffthompy.tensors import pointwise
 import itertools
+import math
 from copy import copy
+from functools import partial
 
 
 class TensorFuns(Representation):
@@ -37,7 +42,7 @@ class TensorFuns(Representation):
         return self.__dict__.update(**kwargs)
 
     def _copy(self, keys, **kwargs):
-        data={k:copy(self.__dict__[k]) for k in keys}
+        data={k:copy(self.__dict__[k]) for k in keys if k not in kwargs}
         data.update(kwargs)
         return self.__class__(**data)
 
@@ -45,7 +50,7 @@ class TensorFuns(Representation):
         return self._copy(self.keys, **kwargs)
 
     def _set_fft(self, fft_form):
-        assert(fft_form in ['c', 'r', 0])
+        assert(fft_form in ['c', 'r', 's', 0])
 
         if fft_form in ['r']:
             self.N_fft=self.get_N_real(self.N)
@@ -62,6 +67,15 @@ class TensorFuns(Representation):
             self.fftn=fftnc
             self.ifftn=icfftn
             self.fft_coef=1.
+        elif fft_form in ['s']: # mirror-symmetric cell
+            self.N_fft=get_Nsym(self.N)
+            self.fftn=partial(sfftn, parity=getattr(self, 'parity', None))
+            self.ifftn=partial(isfftn, parity=getattr(self, 'parity', None))
+            self.fft_coef=1.
+
+        if getattr(self, 'fft_backend', None) is not None: # otherwise the global backend is used
+            self.fftn=partial(self.fftn, backend=self.fft_backend)
+            self.ifftn=partial(self.ifftn, backend=self.fft_backend)
 
         self.fft_form=fft_form
 
@@ -88,14 +102,25 @@ class TensorFuns(Representation):
 
 
 class Tensor(TensorFuns):
-    keys=('name','val','order','Y','N','multype','Fourier','fft_form','origin')
+    keys=('name','val','order','Y','N','multype','Fourier','fft_form','origin','fft_backend',
+          'parity')
 
     def __init__(self, name='', val=None, order=None, shape=None, N=None, Y=None,
-                 multype='scal', Fourier=False, fft_form=fft_form_default, origin=0):
-
+                 multype='scal', Fourier=False, fft_form=fft_form_default, origin=0,
+                 fft_backend=None, parity=None, dtype=None):
+        """
+        The values of a mirror-symmetric tensor (fft_form='s') are stored only
+        at non-negative grid points (frequencies); the components are even or odd
+        along every axis according to parity (of shape shape+(dim,)).
+        The precision of values allocated from shape and N is given by dtype
+        (numpy.float64 by default, or numpy.float32); the values in the Fourier
+        domain are of corresponding complex type.
+        """
         self.name=name
         self.Fourier=Fourier
         self.origin=origin
+        self.fft_backend=fft_backend
+        self.parity=parity
 
         if isinstance(val, np.ndarray): # define: val + order
             self.val=val
@@ -110,10 +135,13 @@ class Tensor(TensorFuns):
             self.shape=tuple(np.array(shape, dtype=np.int))
             self.order=len(self.shape)
 
-            if not self.Fourier:
-                self.val=np.zeros(self.shape+self.N, dtype=np.float)
+            dtype=np.float if dtype is None else real_dtype(dtype)
+            if self.fft_form in ['s']: # real values in both domains
+                self.val=np.zeros(self.shape+self.N_fft, dtype=dtype)
+            elif not self.Fourier:
+                self.val=np.zeros(self.shape+self.N, dtype=dtype)
             else:
-                self.val=np.zeros(self.shape+self.N_fft, dtype=np.complex)
+                self.val=np.zeros(self.shape+self.N_fft, dtype=complex_dtype(dtype))
 
         else:
             raise ValueError('Initialization of Tensor.')
@@ -135,6 +163,8 @@ class Tensor(TensorFuns):
 
         if self.fft_form==fft_form:
             return R
+        elif 's' in [self.fft_form, fft_form]:
+            raise NotImplementedError('Use methods fold and unfold for symmetric cells.')
 
         fft_form_orig = self.fft_form
         if R.Fourier:
@@ -180,10 +210,25 @@ class Tensor(TensorFuns):
         else:
             raise ValueError()
 
+    @property
+    def dtype(self): # precision of values
+        return real_dtype(self.val.dtype)
+
+    def astype(self, dtype):
+        """
+        Copy of Tensor with values of given precision (e.g. numpy.float32).
+        """
+        if np.iscomplexobj(self.val):
+            dtype=complex_dtype(dtype)
+        else:
+            dtype=real_dtype(dtype)
+        return self.copy(val=self.val.astype(dtype))
+
     def randomize(self):
-        self.val=np.random.random(self.val.shape)
+        dtype=self.dtype
+        self.val=np.random.random(self.val.shape).astype(dtype)
         if self.Fourier:
-            self.val=self.val+1j*np.random.random(self.val.shape)
+            self.val=self.val+1j*np.random.random(self.val.shape).astype(dtype)
         return self
 
     def __neg__(self):
@@ -202,8 +247,39 @@ class Tensor(TensorFuns):
             raise ValueError('Tensor.__add__')
 
     def __sub__(self, x):
+        if isinstance(x, Tensor): # one pass without the negated copy of x
+            assert(self.Fourier==x.Fourier)
+            assert(self.val.shape==x.val.shape)
+            name='({0}-{1})'.format(self.name[:10], x.name[:10])
+            return self.copy(name=name, val=np.subtract(self.val, x.val))
         return self.__add__(-x)
 
+    def axpy(self, a, x):
+        """
+        In-place update self=self+a*x evaluated over chunks of values,
+        i.e. without temporary Tensors (e.g. in iterative solvers).
+        """
+        assert(self.Fourier==x.Fourier)
+        assert(self.val.shape==x.val.shape)
+        aux=None
+        for y, xc in chunks(self.val, x.val):
+            if aux is None or aux.size!=y.size:
+                aux=np.empty_like(y)
+            np.multiply(xc, a, out=aux)
+            y+=aux
+        return self
+
+    def xpay(self, x, a):
+        """
+        In-place update self=x+a*self evaluated over chunks of values.
+        """
+        assert(self.Fourier==x.Fourier)
+        assert(self.val.shape==x.val.shape)
+        for y, xc in chunks(self.val, x.val):
+            y*=a
+            y+=xc
+        return self
+
     def __rmul__(self, x):
         if isinstance(x, Scalar):
             return self.copy(val=x.val*self.val)
@@ -216,25 +292,43 @@ class Tensor(TensorFuns):
         return self.__mul__(*args, **kwargs)
 
     def __mul__(self, Y, *args, **kwargs):
+        assert(self.Fourier==Y.Fourier)
+        assert(self.fft_form==Y.fft_form)
+        if self.multype in ['scal', 'scalar']:
+            return scalar_product(self, Y, *args, **kwargs)
+        return einsum(self.get_str_operator(Y), self, Y, **kwargs)
+
+    def get_str_operator(self, Y):
+        # operator of numpy.einsum of the pointwise product with Tensor Y
         multype=self.multype
-        X=self
-        assert(X.Fourier==Y.Fourier)
-        assert(X.fft_form==Y.fft_form)
-        if multype in ['scal', 'scalar']:
-            return scalar_product(X, Y)
+        if multype in [21, '21'] and Y.order==2: # vectors stacked along the load axis
+            return 'ij...,lj...->li...'
         elif multype in [21, '21']:
-            return einsum('ij...,j...->i...', X, Y)
+            return 'ij...,j...->i...'
+        elif multype in [42, '42'] and Y.order==3:
+            return 'ijkl...,mkl...->mij...'
         elif multype in [42, '42']:
-            return einsum('ijkl...,kl...->ij...', X, Y)
+            return 'ijkl...,kl...->ij...'
         elif multype in [00, 'elementwise', 'hadamard']:
-            return einsum('...,...->...', X, Y)
+            return '...,...->...'
         elif multype in ['grad']:
-            return einsum('i...,...->i...', X, Y)
+            return 'i...,...->i...'
         elif multype in ['div']:
-            return einsum('i...,i...->...', X, Y)
+            return 'i...,i...->...'
         else:
             raise ValueError()
 
+    def empty_output(self, Y, name=None):
+        """
+        Allocates a Tensor that can store the result of the pointwise
+        product self*Y; the shape follows from the shapes of components.
+        """
+        shape=np.einsum(self.get_str_operator(Y), np.empty(self.shape), np.empty(Y.shape)).shape
+        val=np.empty(shape+Y.val.shape[Y.order:], dtype=np.result_type(self.val, Y.val))
+        if name is None:
+            name='empty({})'.format(Y.name[:10])
+        return Y.copy(name=name, val=val, order=len(shape))
+
     def inv(self):
         assert(self.Fourier is False)
         assert(self.order==2)
@@ -242,11 +336,10 @@ class Tensor(TensorFuns):
         return self.copy(name='inv({})'.format(self.name), val=get_inverse(self.val))
 
     def norm(self, ntype='L2', componentwise=False):
-        if componentwise:
+        if componentwise: # norms of views of the components
             scal=np.empty(self.shape)
             for ind in np.ndindex(*self.shape):
-                obj=self.copy(name='aux', val=self.val[ind], order=0)
-                scal[ind]=norm_fun(obj, ntype=ntype)
+                scal[ind]=norm_val(self.val[ind], self.N, self.Fourier, self.fft_form, ntype)
             return scal
         else:
             return norm_fun(self, ntype=ntype)
@@ -260,6 +353,12 @@ class Tensor(TensorFuns):
             ind=self.mean_index()
             for di in np.ndindex(*self.shape):
                 mean[di]=np.real(self.val[di][ind])/self.fft_coef
+        elif self.fft_form in ['s']: # components with odd parity have zero mean
+            weights=get_sym_weights(self.N)
+            parity=get_parity(self.parity, self.shape, self.dim)
+            for di in np.ndindex(*self.shape):
+                if not np.any(parity[di]):
+                    mean[di]=np.sum(weights*self.val[di])/self.pN()
         else:
             for di in np.ndindex(*self.shape):
                 mean[di]=np.mean(self.val[di])
@@ -333,6 +432,22 @@ class Tensor(TensorFuns):
         res.val=np.einsum('ijkl...->ijlk...', self.val)
         return res
 
+    def pack(self, tol=1e-10):
+        """
+        Packed storage (SymmetricTensor) of a symmetric Tensor of order 2,
+        i.e. only the components of the upper triangle are stored.
+        """
+        assert(self.order==2 and self.shape[0]==self.shape[1])
+        assert(self.parity is None)
+        if (np.linalg.norm(self.val-np.swapaxes(self.val, 0, 1))
+                >tol*max(1, np.linalg.norm(self.val))):
+            raise ValueError('Tensor ({}) is not symmetric.'.format(self.name))
+        rows, cols=np.triu_indices(self.shape[0])
+        return SymmetricTensor(name=self.name, val=np.ascontiguousarray(self.val[rows, cols]),
+                               order=1, N=self.N, Y=self.Y, multype=self.multype,
+                               Fourier=self.Fourier, fft_form=self.fft_form, origin=self.origin,
+                               fft_backend=self.fft_backend)
+
     def identity(self):
         self.val[:]=0.
         assert(self.order % 2 == 0)
@@ -341,10 +456,18 @@ class Tensor(TensorFuns):
 
     def vec(self):
         """
-        Returns one-dimensional vector (column) version of trigonometric
-        polynomial.
+        Returns one-dimensional vector version of trigonometric polynomial;
+        it is a view of values (without copy) if they are contiguous.
+        """
+        return self.val.reshape(-1)
+
+    def revec(self, x, name=None):
+        """
+        Inverse of vec: returns Tensor of the same kind (shape, grid, domain)
+        with values given by a one-dimensional vector x (as a view of x).
         """
-        return np.matrix(self.val.ravel()).transpose()
+        val=np.reshape(np.asarray(x), self.val.shape)
+        return self.copy(name=self.name if name is None else name, val=val)
 
     def zeros_like(self, name=None):
         if name is None:
@@ -394,7 +517,12 @@ class Tensor(TensorFuns):
     def axes(self): # axes for Fourier transform
         return tuple(range(self.order, self.order+self.dim))
 
-    def fourier(self, Fourier=None, copy=False):
+    def fourier(self, Fourier=None, copy=False, out=None):
+        """
+        (inverse) Fourier transform; the values are either replaced (copy=False),
+        copied to a new Tensor (copy=True), or written to a preallocated
+        Tensor out.
+        """
         assert(self.origin==0)
 
         if self.Fourier==Fourier:
@@ -403,7 +531,14 @@ class Tensor(TensorFuns):
             else:
                 return self
 
-        if copy:
+        if out is not None:
+            if self.Fourier:
+                self.ifftn(self.val, self.N, out=out.val)
+            else:
+                self.fftn(self.val, self.N, out=out.val)
+            out.update(Fourier=not self.Fourier)
+            return out
+        elif copy:
             if self.Fourier:
                 return self.copy(val=self.ifftn(self.val, self.N), Fourier=not self.Fourier)
             else:
@@ -426,9 +561,9 @@ class Tensor(TensorFuns):
             return self
         else:
             fft_form=self.fft_form
-            self.set_fft_form(fft_form='c')
+            X=self.set_fft_form(fft_form='c', copy=True) # self is not modified
 
-            val = self.val
+            val = X.val
             for ii,ax in enumerate(self.axes):
                 if self.N[ii]%2==0:
                     N0,C=np.split(val, [1], axis=ax)
@@ -467,11 +602,11 @@ class Tensor(TensorFuns):
             return self
         else:
             fft_form=self.fft_form
-            self.set_fft_form(fft_form='c')
+            X=self.set_fft_form(fft_form='c', copy=True) # self is not modified
 
             val=np.zeros(self.shape+tuple(M), dtype=self.val.dtype)
             for di in np.ndindex(*self.shape):
-                val[di]=decrease(self.val[di], M)
+                val[di]=decrease(X.val[di], M)
 
             R=self.copy(val=val, N=M, fft_form='c')
             return R.set_fft_form(fft_form=fft_form)
@@ -501,6 +636,29 @@ class Tensor(TensorFuns):
             Y=Y.fourier()
         return Y
 
+    def fold(self, parity=None, tol=1e-10):
+        """
+        Restricts a mirror-symmetric tensor to non-negative grid points
+        (fft_form='s'); parity of the components is checked against the values.
+        """
+        assert(not self.Fourier)
+        assert(self.origin==0)
+        parity=get_parity(parity, self.shape, self.dim)
+        sval=np.copy(sym_fold(self.val, self.N))
+        if (np.linalg.norm(sym_unfold(sval, self.N, parity)-self.val)
+                >tol*max(1, np.linalg.norm(self.val))):
+            raise ValueError('Tensor ({}) is not mirror-symmetric.'.format(self.name))
+        return self.copy(val=sval, fft_form='s', parity=parity)
+
+    def unfold(self, fft_form=fft_form_default):
+        """
+        Extends a mirror-symmetric tensor (fft_form='s') to the whole cell.
+        """
+        assert(not self.Fourier)
+        assert(self.fft_form in ['s'])
+        val=sym_unfold(self.val, self.N, get_parity(self.parity, self.shape, self.dim))
+        return self.copy(val=val, fft_form=fft_form, parity=None)
+
     def plot(self, ind=slice(None), N=None, filen=None, ptype='imshow'):
         if N is None:
             N = self.N
@@ -541,6 +699,113 @@ class Tensor(TensorFuns):
             plt.savefig(filen)
 
 
+class SymmetricTensor(Tensor):
+    """
+    Symmetric Tensor of order 2 (multype=21) in packed storage; only the
+    n*(n+1)/2 components of the upper triangle (numpy.triu_indices) are
+    stored, i.e. the values are of shape (n*(n+1)/2,)+N and the generic
+    operations (e.g. enlarge, set_fft_form, fourier, astype) act on them as
+    on a Tensor of order 1. The product with vectors (Tensors of order 1) is
+    evaluated directly from the packed components.
+    """
+    @property
+    def n(self): # size of the symmetric matrix
+        return int(round((np.sqrt(8*self.shape[0]+1)-1)/2))
+
+    @property
+    def mshape(self): # shape of the symmetric matrix
+        return (self.n, self.n)
+
+    def get_index(self):
+        # positions of components (i,j) in packed storage
+        n=self.n
+        ind=np.empty((n, n), dtype=np.int)
+        rows, cols=np.triu_indices(n)
+        ind[rows, cols]=ind[cols, rows]=np.arange(rows.size)
+        return ind
+
+    def unpack(self):
+        """
+        Tensor of order 2 with all components.
+        """
+        ind=self.get_index()
+        return Tensor(name=self.name, val=self.val[ind], order=2, N=self.N, Y=self.Y,
+                      multype=self.multype, Fourier=self.Fourier, fft_form=self.fft_form,
+                      origin=self.origin, fft_backend=self.fft_backend)
+
+    def __mul__(self, Y, *args, **kwargs):
+        if isinstance(Y, Tensor) and not isinstance(Y, SymmetricTensor) and Y.order==1:
+            return self.matvec(Y, *args, **kwargs)
+        elif isinstance(Y, Tensor) and not isinstance(Y, SymmetricTensor) and Y.order==2:
+            out=kwargs.get('out', None) # vectors stacked along the load axis
+            if out is None:
+                out=Y.copy(val=np.empty(Y.val.shape, np.result_type(self.val, Y.val)))
+            for y, res in zip(unstack(Y), unstack(out)):
+                self.matvec(y, out=res)
+            out.update(name='{0}({1})'.format(self.name, Y.name))
+            return out
+        return self.unpack().__mul__(Y, *args, **kwargs)
+
+    def empty_output(self, Y, name=None):
+        if isinstance(Y, Tensor) and not isinstance(Y, SymmetricTensor) and Y.order in [1, 2]:
+            if name is None:
+                name='empty({})'.format(Y.name[:10])
+            return Y.copy(name=name, val=np.empty(Y.val.shape, np.result_type(self.val, Y.val)))
+        return self.unpack().empty_output(Y, name=name)
+
+    def matvec(self, x, out=None):
+        """
+        Product with vector x (of shape (n,)); the result is written to
+        the Tensor out if it is provided.
+        """
+        assert(x.Fourier==self.Fourier)
+        assert(x.fft_form==self.fft_form)
+        assert(x.shape==(self.n,))
+        ind=self.get_index()
+        name='{0}({1})'.format(self.name, x.name)
+        if out is None:
+            out=x.copy(name=name, val=np.empty(x.val.shape, np.result_type(self.val, x.val)))
+        val=out.val
+        aux=np.empty_like(val[0])
+        for ii in range(self.n):
+            np.multiply(self.val[ind[ii, 0]], x.val[0], out=val[ii])
+            for jj in range(1, self.n):
+                np.multiply(self.val[ind[ii, jj]], x.val[jj], out=aux)
+                val[ii]+=aux
+        out.update(name=name)
+        return out
+
+    def transpose(self):
+        return self
+
+    def inv(self):
+        return self.unpack().inv().pack()
+
+    def norm(self, ntype='L2', componentwise=False):
+        return self.unpack().norm(ntype=ntype, componentwise=componentwise)
+
+    def mean(self):
+        return self.unpack().mean()
+
+    def add_mean(self, mean):
+        rows, cols=np.triu_indices(self.n)
+        return Tensor.add_mean(self, np.asarray(mean)[rows, cols])
+
+    def set_mean(self, mean):
+        rows, cols=np.triu_indices(self.n)
+        return Tensor.set_mean(self, np.asarray(mean)[rows, cols])
+
+    def calc_eigs(self, *args, **kwargs):
+        return self.unpack().calc_eigs(*args, **kwargs)
+
+    def fold(self, *args, **kwargs):
+        raise NotImplementedError('Packed Tensor on mirror-symmetric cell.')
+
+    def __repr__(self, full=False, detailed=False):
+        return self.unpack().__repr__(full=full, detailed=detailed).replace(
+            'Class : Tensor', 'Class : SymmetricTensor', 1)
+
+
 class Scalar():
     """
     Scalar value that is used to multiply VecTri or Matrix classes
@@ -563,44 +828,156 @@ class Scalar():
     def transpose(self):
         return self
 
+def stack(tensors, name=None):
+    """
+    Tensor with the values of tensors (of the same shape) stacked along
+    a leading (load) axis, e.g. the fields of several macroscopic loads
+    solved at once (see ffthompy.general.solver.CG_block).
+    """
+    X=tensors[0]
+    val=np.stack([x.val for x in tensors])
+    return X.copy(name=X.name if name is None else name, val=val, order=X.order+1)
+
+def unstack(X):
+    """
+    List of Tensors viewing the values of X along the leading (load) axis.
+    """
+    return [X.copy(name='{0}[{1}]'.format(X.name, l), val=X.val[l], order=X.order-1)
+            for l in range(X.shape[0])]
+
+# no. of values in chunks of in-place updates (Tensor.axpy, Tensor.xpay)
+updates={'chunk': 2**15}
+
+def chunks(*vals):
+    """
+    Views of chunks of at most updates['chunk'] values of arrays of the same
+    shape; the arrays are not split unless they are all C-contiguous.
+    """
+    if not all(val.flags.c_contiguous for val in vals):
+        yield vals
+        return
+    chunk=updates['chunk']
+    flat=[val.reshape(-1) for val in vals]
+    for ii in range(0, flat[0].size, chunk):
+        yield tuple(val[ii:ii+chunk] for val in flat)
+
 # @staticmethod
-def einsum(str_operator, x, y):
+def einsum(str_operator, x, y, out=None):
+    """
+    Pointwise multiplication of Tensors; the result is written to the Tensor
+    out (of the shape of result) if it is provided.
+    """
     assert(x.Fourier==y.Fourier)
     assert(np.all(x.N==y.N))
-    val=np.einsum(str_operator, x.val, y.val)
-    order=len(val.shape)-len(x.N)
-    return y.copy(name='{0}({1})'.format(x.name, y.name), val=val, order=order)
+    if isinstance(x.val, np.memmap) or isinstance(y.val, np.memmap): # out-of-core tensors
+        from ffthompy.tensors.outofcore import einsum as einsum_slabs
+        return einsum_slabs(str_operator, x, y, out=out)
+    name='{0}({1})'.format(x.name, y.name)
+    if out is None:
+        val=pointwise.einsum(str_operator, x.val, y.val)
+        order=len(val.shape)-len(x.N)
+        return y.copy(name=name, val=val, order=order)
+    pointwise.einsum(str_operator, x.val, y.val, out=out.val)
+    out.update(name=name)
+    return out
 
 def norm_fun(X, ntype):
+    return norm_val(X.val, X.N, X.Fourier, X.fft_form, ntype)
+
+def norm_val(val, N, Fourier, fft_form, ntype):
     if ntype in ['L2', 2]:
-        scal=(scalar_product(X, X))**0.5
+        scal=(scalar_product_val(val, val, N, Fourier, fft_form))**0.5
     elif ntype==1:
-        scal=np.sum(np.abs(X.val))
+        scal=np.sum(np.abs(val))
     elif ntype=='inf':
-        scal=np.max(np.abs(X.val))
+        scal=np.max(np.abs(val))
     else:
         msg="This type ({}) of norm is not implemented!".format(ntype)
         raise NotImplementedError(msg)
     return scal
 
-def scalar_product(y, x):
+# size of chunks of reproducible summation in dot (e.g. 2**16); if None,
+# the sums are evaluated by a single call of numpy.dot (BLAS)
+summation={'chunk': None}
+
+def dot(y, x, conj=False, dtype=None):
+    """
+    Sum of products of the elements of arrays y and x (conj(x) if conj=True)
+    evaluated over flattened views by numpy.dot (numpy.vdot), i.e. without
+    temporary arrays of full size. If dtype is provided, the chunks of arrays
+    are cast to dtype before the products. If summation['chunk'] is set, the
+    products in every chunk of this size are summed by numpy.add.reduce in a
+    fixed (pairwise) order instead of BLAS and the partial sums are added by
+    math.fsum, so that the result does not depend on the number of threads.
+    """
+    order='K' if y.strides==x.strides else 'C' # views also of transposed (FFT) layouts
+    y, x=y.ravel(order=order), x.ravel(order=order)
+    fun=(lambda a, b: np.vdot(b, a)) if conj else np.dot
+    chunk=summation['chunk']
+    if dtype is not None:
+        dtype=np.promote_types(np.promote_types(dtype, y.dtype), x.dtype)
+        if dtype==y.dtype and dtype==x.dtype:
+            dtype=None
+    if chunk is None and dtype is None:
+        return fun(y, x)
+
+    if chunk is not None: # products summed in fixed order
+        fun=lambda a, b: np.add.reduce(a*(np.conj(b) if conj else b))
+    chunk=chunk or 2**16
+    parts=[]
+    for ii in range(0, y.size, chunk):
+        yc, xc=y[ii:ii+chunk], x[ii:ii+chunk]
+        if dtype is not None:
+            yc, xc=yc.astype(dtype), xc.astype(dtype)
+        parts.append(fun(yc, xc))
+    parts=np.array(parts)
+    if np.iscomplexobj(parts):
+        return parts.dtype.type(complex(math.fsum(parts.real), math.fsum(parts.imag)))
+    return parts.dtype.type(math.fsum(parts))
+
+def scalar_product(y, x, dtype=None):
+    """
+    Scalar product of Tensors; the sums are accumulated in dtype
+    (e.g. numpy.float64 for Tensors in single precision) if it is provided.
+    """
     assert(isinstance(x, Tensor))
     assert(y.val.shape==x.val.shape)
     assert(y.fft_form==x.fft_form)
+    return scalar_product_val(y.val, x.val, y.N, y.Fourier, y.fft_form, dtype=dtype)
 
-    if y.Fourier:
-        if x.fft_form in ['r']:
-            if x.N[-1] % 2 == 1:
-                scal=(np.sum(y.val[...,0]*np.conj(x.val[...,0])).real +
-                      2*np.sum(y.val[...,1:]*np.conj(x.val[...,1:])).real)/np.prod(y.N)**2
-            else:
-                scal=(np.sum(y.val[...,0]*np.conj(x.val[...,0])).real +
-                      np.sum(y.val[...,-1]*np.conj(x.val[...,-1])).real +
-                      2*np.sum(y.val[...,1:-1]*np.conj(x.val[...,1:-1])).real)/np.prod(y.N)**2
-        else:
-            scal=np.sum(y.val[:]*np.conj(x.val[:])).real
+def gram_matrix(Y, X, dtype=None):
+    """
+    Matrix of scalar products of the Tensors stacked along the leading
+    (load) axis of Y and X; the products of real fields in the spatial
+    domain are evaluated at once by numpy.dot.
+    """
+    ys, xs=unstack(Y), unstack(X)
+    if (Y.Fourier or Y.fft_form in ['s'] or dtype is not None
+            or not (Y.val.flags.c_contiguous and X.val.flags.c_contiguous)):
+        return np.array([[scalar_product(y, x, dtype=dtype) for x in xs] for y in ys])
+    size=int(np.prod(Y.val.shape[1:]))
+    G=np.dot(Y.val.reshape(len(ys), size), X.val.reshape(len(xs), size).T)
+    return G/np.prod(Y.N)
+
+def scalar_product_val(yval, xval, N, Fourier, fft_form, dtype=None):
+    """
+    Scalar product of values of Tensors (of arbitrary components) on grid N.
+    """
+    if fft_form in ['s']: # weights of non-negative grid points (frequencies)
+        weights=get_sym_weights(N).ravel()
+        scal=np.einsum('ij,ij,j->', yval.reshape(-1, weights.size),
+                       xval.reshape(-1, weights.size), weights, dtype=dtype)
+        if not Fourier:
+            scal/=np.prod(N)
+    elif Fourier:
+        scal=dot(yval, xval, conj=True, dtype=dtype).real
+        if fft_form in ['r']: # Hermitian half-spectrum with doubled inner frequencies
+            scal=2*scal-dot(yval[...,0], xval[...,0], conj=True, dtype=dtype).real
+            if N[-1] % 2 == 0:
+                scal-=dot(yval[...,-1], xval[...,-1], conj=True, dtype=dtype).real
+            scal/=np.prod(N)**2
     else:
-        scal=np.sum(y.val[:]*x.val[:])/np.prod(y.N)
+        scal=dot(yval, xval, dtype=dtype)/np.prod(N)
     return scal
 
 if __name__=='__main__':
@@ -5,10 +5,13 @@ This module contains operators working with Tensor from ffthompy.tensors.objects
 import itertools
 import numpy as np
 import numpy.matlib as npmatlib
-from ffthompy.trigpol import Grid, fft_form_default
+from ffthompy.trigpol import Grid, fft_form_default, get_derivative_freq, get_derivative_factors
 from ffthompy.tensors.objects import Tensor, TensorFuns
 from ffthompy.tensors.fft import *
+from ffthompy.tensors.cache import get_kernel
+from ffthompy.tensors.projection import FourierProjection
 from copy import copy
+from functools import partial, reduce, lru_cache
 
 
 class DFT(TensorFuns):
@@ -30,8 +33,13 @@ class DFT(TensorFuns):
         0 : standard numpy.fft.fftn algorithm
         'c' : centered version of numpy.fft.fftn algorithm with zero frequency in the middle
         'r' : version of numpy.fft.fftn suitable for real data
+        's' : mirror-symmetric data stored at non-negative grid points (frequencies)
+    fft_backend : str or FFTBackend
+        backend evaluating the FFT (see ffthompy.tensors.fft); if None,
+        the global backend is used
     """
-    def __init__(self, inverse=False, N=None, fft_form=fft_form_default, **kwargs):
+    def __init__(self, inverse=False, N=None, fft_form=fft_form_default, fft_backend=None,
+                 **kwargs):
         self.__dict__.update(kwargs)
         if 'name' not in list(kwargs.keys()):
             if inverse:
@@ -41,21 +49,35 @@ class DFT(TensorFuns):
 
         self.N=np.array(N, dtype=np.int32)
         self.inverse=inverse
+        self.fft_backend=fft_backend
         self._set_fft(fft_form)
 
     def __mul__(self, x):
         return self.__call__(x)
 
-    def __call__(self, x):
+    def __call__(self, x, out=None):
+        """
+        Applies (inverse) DFT; the result is written to the Tensor out
+        (e.g. from self.empty_output) if it is provided.
+        """
         if isinstance(x, Tensor):
             assert(x.Fourier==self.inverse)
             if self.inverse:
-                return x.copy(name='iF({0})'.format(x.name[:10]),
-                              val=self.ifftn(x.val, self.N).real, Fourier=not x.Fourier)
+                name='iF({0})'.format(x.name[:10])
+                fun=self.ifftn
             else:
                 assert(x.fft_form==self.fft_form)
-                return x.copy(name='F({0})'.format(x.name[:10]),
-                              val=self.fftn(x.val, self.N), Fourier=not x.Fourier)
+                name='F({0})'.format(x.name[:10])
+                fun=self.fftn
+            if self.fft_form in ['s']: # the transform depends on parity of components
+                fun=partial(fun, parity=x.parity)
+
+            if out is None:
+                return x.copy(name=name, val=fun(x.val, self.N), Fourier=not x.Fourier)
+            else:
+                fun(x.val, self.N, out=out.val)
+                out.update(name=name, Fourier=not x.Fourier)
+                return out
 
         elif (isinstance(x, Operator) or isinstance(x, DFT)):
             return Operator(mat=[[self, x]])
@@ -63,6 +85,24 @@ class DFT(TensorFuns):
         else:
             raise ValueError('DFT.__call__')
 
+    def empty_output(self, x, name=None):
+        """
+        Allocates a Tensor that can store the result of self(x).
+        """
+        if self.fft_form in ['s']:
+            shape=x.shape+tuple(self.N_fft)
+            dtype=x.dtype
+        elif self.inverse:
+            shape=x.shape+tuple(self.N)
+            dtype=x.dtype
+        else:
+            shape=x.shape+tuple(self.N_fft)
+            dtype=complex_dtype(x.dtype)
+        val=empty(shape, dtype, backend=self.fft_backend)
+        if name is None:
+            name='empty({})'.format(x.name[:10])
+        return x.copy(name=name, val=val, Fourier=not x.Fourier)
+
     def matrix(self, shape=None):
         """
         This function returns the object as a matrix of DFT or iDFT resp.
@@ -134,15 +174,22 @@ class Operator():
             self.define_operand(operand)
 
     def __call__(self, x):
-        res=0.
+        res=None
         for summand in self.mat_rev:
             prod=x
             for matrix in summand:
                 prod=matrix(prod)
-            res=prod+res
+            res=prod if res is None else prod+res
         res.name='{0}({1})'.format(self.name[:6], x.name[:10])
         return res
 
+    def compile(self, operand):
+        """
+        Returns the execution plan (CompiledOperator) of the operator for
+        operands of the same kind (shape, dtype, grid) as operand.
+        """
+        return CompiledOperator(self, operand)
+
     def __repr__(self):
         s='Class : {0}\n    name : {1}\n    expression : '.format(self.__class__.__name__,
                                                                   self.name)
@@ -173,8 +220,12 @@ class Operator():
             operand of linear operator
         """
         if isinstance(X, Tensor):
-            Y=self(X)
+            self.plan=self.compile(X)
+            Y=self.plan(X)
             self.matshape=(Y.val.size, X.val.size)
+            self.X=X.zeros_like(name='X') # templates of operand and result
+            self.Y=Y.zeros_like(name='Y')
+            self.plan_T=None
             self.X_reshape=X.val.shape
             self.X_order=X.order
             self.X_N=X.N
@@ -187,29 +238,40 @@ class Operator():
         """
         Provides the __call__ for operand recast into one-dimensional vector.
         This is suitable for e.g. iterative solvers when trigonometric
-        polynomials are recast into one-dimensional numpy.arrays.
+        polynomials are recast into one-dimensional numpy.arrays; the vectors
+        are viewed as Tensors without copies.
 
         Parameters
         ----------
         x : one-dimensional numpy.array
         """
-        X=Tensor(val=self.revec(x), order=self.X_order, N=self.X_N)
-        AX=self.__call__(X)
+        AX=self.plan(self.X.revec(x), out=self.Y.empty_like(name='AX'))
         return AX.vec()
 
+    def rmatvec(self, y):
+        """
+        Provides the transposed operator for one-dimensional vector y
+        (see matvec).
+        """
+        if self.plan_T is None:
+            self.plan_T=self.transpose().compile(self.Y)
+        ATY=self.plan_T(self.Y.revec(y), out=self.X.empty_like(name='ATY'))
+        return ATY.vec()
+
     def vec(self, X):
         """
-        Reshape the operand (Tensor) into one-dimensional vector (column)
-        version.
+        Reshape the operand (Tensor) into one-dimensional vector version.
         """
-        return np.reshape(X, self.shape[1])
+        if isinstance(X, Tensor):
+            return X.vec()
+        return np.reshape(X, -1)
 
     def revec(self, x):
         """
         Reshape the one-dimensional vector of trig. pol. into shape occurring
         in class Tensor.
         """
-        return np.reshape(np.asarray(x), self.Y_reshape)
+        return np.reshape(np.asarray(x), self.X_reshape)
 
     def transpose(self):
         """
@@ -224,73 +286,337 @@ class Operator():
         name='({0}).T'.format(self.name[:10])
         return Operator(name=name, mat=mat)
 
-def grad(X):
-    if X.shape==(1,):
-        shape=(X.dim,)
-    else:
-        shape=X.shape+(X.dim,)
-    name='grad({0})'.format(X.name[:10])
-    gX=Tensor(name=name, shape=shape, N=X.N,
-              Fourier=True, fft_form=X.fft_form)
-    if X.Fourier:
-        FX=X
-    else:
-        F=DFT(N=X.N, fft_form=X.fft_form) # TODO:change to X.fourier()
-        FX=F(X)
+class CompiledOperator():
+    """
+    Execution plan of Operator; the chain of factors is inspected once
+    (for the operand) and the intermediate results are written to
+    preallocated buffers that are reused (ping-pong) by the factors with
+    results of the same shape and dtype. The summands are added in place.
+
+    The buffers are allocated from the metadata of the factors and of the
+    operand (empty_output), i.e. the chain is not evaluated. Only Tensors
+    (pointwise products), DFT, FourierProjection, DifferentialOperator and
+    Operator write to the buffers; other factors (e.g. scalar products or
+    the matrices of ffthompy.matvecs) are evaluated once to inspect their
+    results and allocate them in every call; DifferentialOperator applied
+    to fields in the real domain also allocates its Fourier transforms.
+
+    The result is stored in a buffer of the plan, i.e. it is overwritten
+    by the next call unless the output Tensor out is provided.
 
-    dim=len(X.N)
-    freq=Grid.get_freq(X.N, X.Y, fft_form=X.fft_form)
-    strfreq='xyz'
-    coef=2*np.pi*1j
-    val=np.empty((X.dim,)+X.shape+X.N_fft, dtype=np.complex)
+    Parameters
+    ----------
+    operator : Operator
+    operand : Tensor
+        determines the shape, dtype, and grid of operands
+    """
+    def __init__(self, operator, operand):
+        self.operator=operator
+        self.name=operator.name
+        self.plan=[]
+        self.res=None
+        pool={} # buffers for results of the same kind
+        for summand in operator.mat_rev:
+            steps=[]
+            x, xbuf=operand, None
+            for ii, matrix in enumerate(summand):
+                if isinstance(matrix, Operator):
+                    matrix=matrix.compile(x)
+                if self.with_out(matrix):
+                    y=matrix.empty_output(x)
+                else:
+                    y=matrix(x)
+                buf=None
+                if self.res is None and ii==len(summand)-1:
+                    self.res=y
+                elif self.with_out(matrix):
+                    buf=self.get_buffer(pool, y, xbuf)
+                steps.append((matrix, buf))
+                x, xbuf=y, buf
+            self.plan.append(steps)
+
+    @staticmethod
+    def with_out(matrix):
+        # factors that can write to preallocated output
+        if isinstance(matrix, Tensor):
+            return matrix.multype not in ['scal', 'scalar']
+        return isinstance(matrix, (DFT, CompiledOperator, FourierProjection,
+                                   DifferentialOperator))
+
+    @staticmethod
+    def get_buffer(pool, y, xbuf):
+        key=(y.__class__, y.val.shape, y.val.dtype, y.order, y.Fourier, y.fft_form)
+        for buf in pool.setdefault(key, []):
+            if buf is not xbuf: # the input of factor
+                return buf
+        pool[key].append(y)
+        return y
+
+    @staticmethod
+    def apply(matrix, x, out):
+        if out is None:
+            return matrix(x)
+        elif CompiledOperator.with_out(matrix):
+            return matrix(x, out=out)
+        else:
+            out.val[...]=matrix(x).val
+            return out
 
-    for ii in range(X.dim):
-        mul_str='{0},...{1}->...{1}'.format(strfreq[ii], strfreq[:dim])
-        val[ii]=np.einsum(mul_str, coef*freq[ii], FX.val, dtype=np.complex)
+    def __call__(self, x, out=None):
+        res=self.res if out is None else out
+        for isum, steps in enumerate(self.plan):
+            prod=x
+            for ii, (matrix, buf) in enumerate(steps):
+                if isum==0 and ii==len(steps)-1:
+                    buf=res
+                prod=self.apply(matrix, prod, buf)
+            if isum>0:
+                res.val+=prod.val
+        res.name='{0}({1})'.format(self.name[:6], x.name[:10])
+        return res
 
-    if X.shape==(1,):
-        gX.val=np.squeeze(val)
-    else:
-        gX.val=np.moveaxis(val, 0, X.order)
+    def empty_output(self, x, name=None):
+        """
+        Allocates a Tensor that can store the result of self(x).
+        """
+        if name is None:
+            name='empty({})'.format(x.name[:10])
+        return self.res.copy(name=name, val=np.empty_like(self.res.val))
 
-    if not X.Fourier:
-        iF=DFT(N=X.N, inverse=True, fft_form=gX.fft_form)
-        gX=iF(gX)
-    gX.name='grad({0})'.format(X.name[:10])
-    return gX
+    def __mul__(self, x):
+        return self.__call__(x)
 
-def div(X):
-    if X.shape==(1,):
-        shape=()
-    else:
-        shape=X.shape[:-1]
-    assert(X.shape[-1]==X.dim)
-    assert(X.order==1)
+    def __repr__(self):
+        return self.operator.__repr__().replace(self.operator.__class__.__name__,
+                                                self.__class__.__name__, 1)
 
-    dX=Tensor(shape=shape, N=X.N, Fourier=True, fft_form=X.fft_form)
-    if X.Fourier:
-        FX=X
-    else:
-        F=DFT(N=X.N, fft_form=X.fft_form)
-        FX=F(X)
+    def transpose(self):
+        return self.operator.transpose()
 
-    dim=len(X.N)
-    freq=Grid.get_freq(X.N, X.Y, fft_form=FX.fft_form)
-    strfreq='xyz'
-    coef=2*np.pi*1j
 
-    for ii in range(X.dim):
-        mul_str='{0},...{1}->...{1}'.format(strfreq[ii], strfreq[:dim])
-        dX.val+=np.einsum(mul_str, coef*freq[ii], FX.val[ii], dtype=np.complex)
+class DifferentialOperator(TensorFuns):
+    """
+    Differential operator (Fourier multiplier) acting on Tensors; the
+    multipliers 2*pi*i*xi of every component are stored as one-dimensional
+    factors that broadcast over the grid (see
+    ffthompy.trigpol.get_derivative_factors) and are applied in place,
+    so that no kernel is stored on the grid. Operands in the spatial domain
+    are transformed by DFT.
+
+    Parameters
+    ----------
+    N : numpy.ndarray
+        no. of grid points
+    Y : numpy.ndarray
+        size of periodic unit cell
+    fft_form : str or int
+        layout of operands in the Fourier domain (0, 'c', 'r')
+    coef : float
+        multiplier of the operator, e.g. coef=-1 for -div
+    scheme : str
+        discrete derivative (see ffthompy.trigpol.get_derivative_freq);
+        the divergence is the negative adjoint of the gradient, e.g. backward
+        differences for the gradient by forward differences
+    """
+    def __init__(self, N, Y=None, fft_form=fft_form_default, coef=1., name=None,
+                 scheme='spectral'):
+        if fft_form not in [0, 'c', 'r']:
+            raise NotImplementedError('Differential operator with fft_form ({})'.format(fft_form))
+        self.N=np.array(N, dtype=np.int)
+        self.dim=self.N.size
+        self.Y=np.ones(self.dim) if Y is None else np.array(Y, dtype=np.float)
+        self.coef=coef
+        self.scheme=scheme
+        if name is not None:
+            self.name=name
+        self._set_fft(fft_form)
+        self.N_fft=tuple(int(n) for n in self.N_fft)
+        self.factors=get_derivative_factors(self.N, self.Y, fft_form=fft_form, scheme=scheme)[0]
+        self.kernels={} # factors of kernels in precision of operands
+        self.F=DFT(N=self.N, fft_form=fft_form)
+        self.iF=DFT(N=self.N, inverse=True, fft_form=fft_form)
+
+    def get_kernel(self, dtype):
+        # factors of the kernel of every component in precision of operands
+        dtype=complex_dtype(dtype)
+        if dtype not in self.kernels:
+            self.kernels[dtype]=[[f.astype(dtype) for f in fm] for fm in self.kernel()]
+        return self.kernels[dtype]
+
+    def kernel(self):
+        return [[self.coef*fm[0]]+fm[1:] for fm in self.factors]
+
+    @staticmethod
+    def multiply(val, factors, out):
+        # product of values with the factors broadcast over the grid
+        np.multiply(val, factors[0], out=out)
+        for f in factors[1:]:
+            out*=f
+        return out
+
+    def sum_products(self, vals, kernel, out):
+        # sum of the products of values with the kernels of components
+        if any(np.may_share_memory(val, out) for val in vals): # e.g. out=x
+            vals=[val.copy() for val in vals]
+        self.multiply(vals[0], kernel[0], out=out)
+        if len(kernel)>1:
+            aux=np.empty_like(out)
+            for val, factors in zip(vals[1:], kernel[1:]):
+                out+=self.multiply(val, factors, out=aux)
+        return out
+
+    def __call__(self, x, out=None):
+        """
+        Applies the operator; the result is written to the Tensor out
+        (e.g. from self.empty_output) if it is provided.
+        """
+        assert(np.all(np.array(x.N)==self.N))
+        name='{0}({1})'.format(self.name, x.name[:10])
+        if x.Fourier:
+            assert(x.fft_form==self.fft_form)
+            res=self.apply(x, out=out)
+        else:
+            res=self.iF(self.apply(self.F(x)), out=out)
+        res.name=name
+        return res
+
+    def empty_output(self, x, name=None):
+        """
+        Allocates a Tensor that can store the result of self(x).
+        """
+        shape=self.get_shape(x.shape)
+        if x.Fourier:
+            val=np.empty(shape+self.N_fft, dtype=complex_dtype(x.dtype))
+        else:
+            val=np.empty(shape+tuple(self.N), dtype=x.dtype)
+        if name is None:
+            name='empty({})'.format(x.name[:10])
+        return Tensor(name=name, val=val, order=len(shape), N=self.N, Y=x.Y,
+                      Fourier=x.Fourier, fft_form=self.fft_form)
+
+    def _output(self, x, out):
+        # output Tensor in the Fourier domain
+        if out is None:
+            out=self.empty_output(x)
+        return out
+
+    def __mul__(self, x):
+        return self.__call__(x)
+
+    def __repr__(self):
+        return self._repr(['name', 'N', 'Y', 'fft_form', 'scheme', 'coef'])
+
+
+class Grad(DifferentialOperator):
+    """
+    Gradient of Tensors; the result of shape x.shape+(dim,) is stored
+    with the derivatives in the last component, scalars (x.shape=(1,))
+    are mapped to vectors of shape (dim,).
+    """
+    name='grad'
+
+    def get_shape(self, shape):
+        return (self.dim,) if shape==(1,) else tuple(shape)+(self.dim,)
+
+    def apply(self, x, out=None):
+        out=self._output(x, out)
+        xval=x.val[0] if x.shape==(1,) else x.val
+        axis=out.val.ndim-self.dim-1 # axis of derivatives
+        for j, factors in enumerate(self.get_kernel(x.dtype)):
+            self.multiply(xval, factors, out=out.val[axis*(slice(None),)+(j,)])
+        return out
+
+    def transpose(self):
+        return Div(self.N, self.Y, fft_form=self.fft_form, coef=-np.conj(self.coef),
+                   scheme=self.scheme)
+
+
+class Div(DifferentialOperator):
+    """
+    Divergence of Tensors with respect to the last component,
+    i.e. the result is of shape x.shape[:-1].
+    """
+    name='div'
+
+    def kernel(self):
+        return [[-self.coef*np.conj(fm[0])]+[np.conj(f) for f in fm[1:]] for fm in self.factors]
+
+    def get_shape(self, shape):
+        assert(shape[-1]==self.dim)
+        return tuple(shape[:-1])
 
-    if not X.Fourier:
-        iF=DFT(N=X.N, inverse=True, fft_form=dX.fft_form)
-        dX=iF(dX)
-    dX.name='div({0})'.format(X.name[:10])
-    return dX
+    def apply(self, x, out=None):
+        out=self._output(x, out)
+        axis=x.val.ndim-self.dim-1 # axis of derivatives
+        xvals=[x.val[axis*(slice(None),)+(j,)] for j in range(self.dim)]
+        self.sum_products(xvals, self.get_kernel(x.dtype), out=out.val)
+        return out
+
+    def transpose(self):
+        return Grad(self.N, self.Y, fft_form=self.fft_form, coef=-np.conj(self.coef),
+                    scheme=self.scheme)
+
+
+class Laplace(DifferentialOperator):
+    """
+    Laplace operator, i.e. div(grad(x)), applied as one multiplication by
+    the (real) symbol -4*pi^2*|xi|^2; the symbol is evaluated once and kept
+    in the kernel cache (see ffthompy.tensors.cache), scalars (x.shape=(1,))
+    are mapped to shape ().
+    """
+    name='laplace'
+
+    def __init__(self, *args, **kwargs):
+        DifferentialOperator.__init__(self, *args, **kwargs)
+        self.get_kernel(np.float64)
+
+    def kernel(self):
+        # -sum over components of |2*pi*xi[m]|^2
+        return -sum(reduce(np.multiply, [np.abs(f)**2 for f in fm]) for fm in self.factors)
+
+    def get_kernel(self, dtype):
+        dtype=real_dtype(dtype)
+        return get_kernel(lambda: self.kernel().astype(dtype), 'laplace', self.N, self.Y,
+                          fft_form=self.fft_form, dtype=dtype, scheme=self.scheme)
+
+    def get_shape(self, shape):
+        return () if shape==(1,) else tuple(shape)
+
+    def apply(self, x, out=None):
+        out=self._output(x, out)
+        xval=x.val[0] if x.shape==(1,) else x.val
+        np.multiply(xval, self.get_kernel(x.dtype), out=out.val)
+        if self.coef!=1:
+            out.val*=self.coef
+        return out
+
+    def transpose(self):
+        return Laplace(self.N, self.Y, fft_form=self.fft_form, coef=np.conj(self.coef),
+                       scheme=self.scheme)
+
+
+@lru_cache(maxsize=32)
+def _get_operator(cls, N, Y, fft_form, scheme):
+    return cls(N, Y, fft_form=fft_form, scheme=scheme)
+
+def get_operator(cls, N, Y=None, fft_form=fft_form_default, scheme='spectral'):
+    """
+    Differential operator (e.g. Grad) shared by the calls with the same grid,
+    so that its frequency factors are evaluated once; the operators store
+    one-dimensional factors only.
+    """
+    N=tuple(int(n) for n in N)
+    Y=None if Y is None else tuple(float(y) for y in Y)
+    return _get_operator(cls, N, Y, fft_form, scheme)
+
+def grad(X):
+    return get_operator(Grad, X.N, X.Y, fft_form=X.fft_form)(X)
+
+def div(X):
+    return get_operator(Div, X.N, X.Y, fft_form=X.fft_form)(X)
 
 def laplace(X):
-    return div(grad(X))
+    return get_operator(Laplace, X.N, X.Y, fft_form=X.fft_form)(X)
 
 def symgrad(X):
     gX=grad(X)
@@ -300,15 +626,14 @@ def potential_scalar(x, freq, mean_index):
     # get potential for scalar-valued function in Fourier space
     dim=x.shape[0]
     assert(dim==len(x.shape)-1)
-    strfreq='xyz'
     coef=2*np.pi*1j
     val=np.empty(x.shape[1:], dtype=np.complex)
     for d in range(0, dim):
         factor=np.zeros_like(freq[d], dtype=np.complex)
         inds=np.setdiff1d(np.arange(factor.size, dtype=np.int), mean_index[d])
         factor[inds]=1./(coef*freq[d][inds])
-        val[mean_index[:d]]=np.einsum('x,{0}->{0}'.format(strfreq[:dim-d]),
-                                      factor, x[d][mean_index[:d]], dtype=np.complex)
+        factor=np.reshape(factor, (factor.size,)+(dim-d-1)*(1,)) # broadcast along axis d
+        np.multiply(factor, x[d][mean_index[:d]], out=val[mean_index[:d]])
     return val
 
 def potential(X, small_strain=False):
@@ -368,23 +693,26 @@ def grad_div_tensor(N, Y=None, grad=True, div=True, fft_form=fft_form_default):
     elif div:
         return div_tensor(N, Y, fft_form=fft_form)
 
-def grad_tensor(N, Y=None, fft_form=fft_form_default):
+def grad_tensor(N, Y=None, fft_form=fft_form_default, scheme='spectral'):
     if Y is None:
         Y = np.ones_like(N)
     # scalar valued versions of gradient and divergence
     N = np.array(N, dtype=np.int)
-    dim = N.size
-
-    freq = Grid.get_xil(N, Y, fft_form=fft_form)
-    N_fft=tuple(freq[i].size for i in range(dim))
-    hGrad = np.zeros((dim,)+ N_fft) # zero initialize
-    for ind in itertools.product(*[list(range(n)) for n in N_fft]):
-        for i in range(dim):
-            hGrad[i][ind] = freq[i][ind[i]]
-    hGrad = hGrad*2*np.pi*1j
+    hGrad = get_kernel(lambda: grad_kernel(N, Y, fft_form=fft_form, scheme=scheme), 'grad', N, Y,
+                       fft_form=fft_form, scheme=scheme)
     return Tensor(name='hgrad', val=hGrad, order=1, N=N, multype='grad',
                   Fourier=True, fft_form=fft_form)
 
+def grad_kernel(N, Y, fft_form=fft_form_default, scheme='spectral'):
+    dim = N.size
+    xi, shift, N_fft = get_derivative_freq(N, Y, fft_form=fft_form, scheme=scheme)
+    hGrad = np.zeros((dim,)+N_fft, dtype=np.complex) # zero initialize
+    for i in range(dim):
+        hGrad[i] = 2*np.pi*1j*xi[i] # broadcast over the grid
+        if shift is not None:
+            hGrad[i] *= shift[i]
+    return hGrad
+
 def div_tensor(N, Y=None, fft_form=fft_form_default):
     if Y is None:
         Y = np.ones_like(N)
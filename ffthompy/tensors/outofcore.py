@@ -0,0 +1,234 @@
+"""
+This module contains out-of-core tools for Tensor; the values are stored
+in files (numpy.memmap) and the operations stream over slabs of the grid,
+i.e. over chunks of the first spatial axis, so that only a few slabs are
+kept in memory at a time.
+
+The files are created in a scratch directory (set_scratch or environment
+variable FFTHOMPY_SCRATCH), preferably on a fast local disk; the temporary
+files are removed from the directory immediately and their space is freed
+when the arrays are released.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from ffthompy.trigpol import fft_form_default
+from ffthompy.tensors.objects import Tensor, scalar_product
+from ffthompy.tensors.operators import DFT
+from ffthompy.tensors.fft import get_backend, complex_dtype
+from ffthompy.tensors import pointwise
+
+config={'dir': os.environ.get('FFTHOMPY_SCRATCH', tempfile.gettempdir()),
+        'chunk': 2**27} # approximate size of slabs in bytes
+
+def set_scratch(dirname=None, chunk=None):
+    """
+    Set the directory for files of out-of-core tensors and the size of slabs;
+    the previous settings are restored at the end of the with statement,
+    e.g. with set_scratch(chunk=2**20): ...
+
+    Parameters
+    ----------
+    dirname : str
+        scratch directory
+    chunk : int
+        approximate size (in bytes) of slabs processed in memory
+    """
+    previous=dict(config)
+    if dirname is not None:
+        os.makedirs(dirname, exist_ok=True)
+        config['dir']=dirname
+    if chunk is not None:
+        config['chunk']=int(chunk)
+    return _restore(previous)
+
+@contextmanager
+def _restore(previous):
+    try:
+        yield config
+    finally:
+        config.update(previous)
+
+def empty(shape, dtype=np.float64, filename=None):
+    """
+    Allocates numpy.memmap either in a given file or in a temporary file.
+    """
+    if filename is not None:
+        return np.memmap(filename, dtype=dtype, mode='w+', shape=tuple(shape))
+    with tempfile.NamedTemporaryFile(dir=config['dir'], suffix='.dat') as fid:
+        return np.memmap(fid, dtype=dtype, mode='w+', shape=tuple(shape))
+
+def memmap_tensor(name='', shape=(), N=None, Fourier=False, fft_form=fft_form_default,
+                  filename=None, **kwargs):
+    """
+    Tensor with zero values stored in numpy.memmap.
+    """
+    N=tuple(np.array(N, dtype=np.int))
+    if Fourier:
+        N_fft=Tensor(shape=(), N=N, fft_form=fft_form).N_fft
+        val=empty(tuple(shape)+tuple(N_fft), dtype=np.complex128, filename=filename)
+    else:
+        val=empty(tuple(shape)+N, dtype=np.float64, filename=filename)
+    for sl in slabs(val, len(shape)):
+        val[sl]=0.
+    return Tensor(name=name, val=val, order=len(shape), N=N, Fourier=Fourier,
+                  fft_form=fft_form, **kwargs)
+
+def is_outofcore(X):
+    return isinstance(X.val, np.memmap)
+
+def slices(n, nbytes, chunk=None):
+    """
+    Yields slices splitting an axis of length n of arrays of total size nbytes.
+    """
+    if chunk is None:
+        chunk=config['chunk']
+    step=max(1, int(chunk//(nbytes/n)))
+    for ii in range(0, n, step):
+        yield slice(ii, min(ii+step, n))
+
+def slabs(val, order, axis=0, chunk=None):
+    """
+    Yields indices of slabs of array val along a spatial axis.
+    """
+    ax=order+axis
+    for sl in slices(val.shape[ax], val.nbytes, chunk=chunk):
+        yield ax*(slice(None),)+(sl,)
+
+def to_outofcore(X, filename=None):
+    """
+    Copies Tensor to numpy.memmap.
+    """
+    val=empty(X.val.shape, dtype=X.val.dtype, filename=filename)
+    for sl in slabs(val, X.order):
+        val[sl]=X.val[sl]
+    return X.copy(val=val)
+
+def einsum(str_operator, x, y, out=None):
+    """
+    Pointwise multiplication (numpy.einsum with operands of shape (...)+N)
+    streaming over slabs; the result is stored in numpy.memmap.
+    """
+    assert(x.Fourier==y.Fourier)
+    assert(np.all(x.N==y.N))
+    res=None
+    for sl in slices(y.val.shape[y.order], x.val.nbytes+y.val.nbytes):
+        val=pointwise.einsum(str_operator, x.val[x.order*(slice(None),)+(sl,)],
+                             y.val[y.order*(slice(None),)+(sl,)])
+        order=val.ndim-len(x.N)
+        if res is None:
+            if out is None:
+                res=empty(val.shape[:order]+y.val.shape[y.order:], dtype=val.dtype)
+            else:
+                res=out.val
+        res[order*(slice(None),)+(sl,)]=val
+    if out is None:
+        return y.copy(name='{0}({1})'.format(x.name, y.name), val=res, order=order)
+    return out
+
+def axpy(a, x, y):
+    """
+    y = y + a*x over slabs
+    """
+    for sl in slabs(y.val, y.order):
+        y.val[sl]+=a*x.val[sl]
+    return y
+
+def xpay(x, a, y):
+    """
+    y = x + a*y over slabs
+    """
+    for sl in slabs(y.val, y.order):
+        y.val[sl]*=a
+        y.val[sl]+=x.val[sl]
+    return y
+
+def scal(x, y):
+    """
+    Scalar product of Tensors over slabs.
+    """
+    res=0.
+    for sl in slabs(y.val, y.order):
+        res+=scalar_product(x.copy(val=x.val[sl]), y.copy(val=y.val[sl]))
+    return res
+
+
+class OutOfCoreDFT(DFT):
+    """
+    (inverse) Discrete Fourier Transform of out-of-core Tensors; the n-d
+    transform is evaluated one axis at a time over slabs along another axis.
+    The results are stored in numpy.memmap; fft_form in [0, 'r'].
+    """
+    def __call__(self, x, out=None):
+        if not isinstance(x, Tensor):
+            return DFT.__call__(self, x)
+
+        assert(x.Fourier==self.inverse)
+        if self.fft_form not in [0, 'r']:
+            raise NotImplementedError('Out-of-core DFT with fft_form ({})'.format(self.fft_form))
+        if not self.inverse:
+            assert(x.fft_form==self.fft_form)
+        if out is None:
+            out=self.empty_output(x)
+
+        b=get_backend(self.fft_backend)
+        N=tuple(int(n) for n in self.N)
+        dim=len(N)
+        axes=list(range(dim))
+        if self.inverse:
+            work=empty(x.val.shape, dtype=x.val.dtype) # complex intermediate results
+            src=x.val
+            for ax in axes[:-1]: # fft_form=0 is not normalised
+                coef=b.inverse_coef((N[ax],))*(1. if self.fft_form in ['r'] else N[ax])
+                self._transform(b, src, work, x.order, ax, 'ifftn', coef)
+                src=work
+            if self.fft_form in ['r']:
+                self._transform(b, src, out.val, x.order, axes[-1], 'irfftn',
+                                b.inverse_coef((N[-1],)))
+            else:
+                self._transform(b, src, out.val, x.order, axes[-1], 'ifftn',
+                                N[-1]*b.inverse_coef((N[-1],)), real=True)
+            del work
+        else:
+            if self.fft_form in ['r']: # the first transform changes the size of last axis
+                self._transform(b, x.val, out.val, x.order, axes[-1], 'rfftn', 1.)
+                for ax in axes[:-1]:
+                    self._transform(b, out.val, out.val, x.order, ax, 'fftn', 1.)
+            else:
+                src=x.val
+                for ax in axes:
+                    self._transform(b, src, out.val, x.order, ax, 'fftn', 1./N[ax])
+                    src=out.val
+
+        name='iF({0})'.format(x.name[:10]) if self.inverse else 'F({0})'.format(x.name[:10])
+        out.update(name=name, Fourier=not x.Fourier)
+        return out
+
+    def _transform(self, b, src, dst, order, ax, direction, coef, real=False):
+        # one-dimensional transforms along axis ax over slabs along other axis
+        N=self.N[ax]
+        chunk_axis=1 if ax==0 and len(self.N)>1 else 0
+        for ind in np.ndindex(*src.shape[:order]):
+            if chunk_axis==ax: # one-dimensional grid
+                sls=[(slice(None),)]
+            else:
+                sls=slabs(src[ind], 0, axis=chunk_axis)
+            for sl in sls:
+                val=np.moveaxis(np.asarray(src[ind][sl]), ax, -1)
+                res=np.moveaxis(getattr(b, direction)(val, (N,)), -1, ax)
+                if real:
+                    res=res.real
+                np.multiply(res, coef, out=dst[ind][sl])
+
+    def empty_output(self, x, name=None):
+        if self.inverse:
+            shape=x.shape+tuple(self.N)
+            dtype=x.dtype
+        else:
+            shape=x.shape+tuple(self.N_fft)
+            dtype=complex_dtype(x.dtype)
+        if name is None:
+            name='empty({})'.format(x.name[:10])
+        return x.copy(name=name, val=empty(shape, dtype), Fourier=not x.Fourier)
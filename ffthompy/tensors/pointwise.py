@@ -0,0 +1,194 @@
+"""
+This module contains pointwise products of small matrices and vectors stored
+on a grid, i.e. arrays of shape (m,n)+N and (n,)+N with the grid axes last
+(material coefficients and dense projections applied to fields; multype 21
+and 42 of Tensor).
+
+The products are evaluated by one of the strategies:
+'einsum'   : numpy.einsum over the whole grid
+'matmul'   : numpy.matmul of matrices with the grid axes moved first
+'unrolled' : loops over the (small) matrix components with in-place
+             multiply-add of the contiguous component arrays
+'threaded' : 'einsum' or 'matmul' on slabs of the first grid axis
+             evaluated by a pool of threads (numpy releases the GIL)
+'numba'    : fused loop over grid points compiled by Numba (parallel)
+             from ffthompy.kernels; 'einsum' if Numba is not available
+The strategy is chosen globally by set_strategy(). The strategy 'auto'
+chooses 'einsum' for contiguous operands (e.g. material coefficients applied
+in the real domain) and 'matmul' on large grids otherwise (e.g. values
+in the transposed layout of FFT backends multiplied by dense projections),
+which avoids the slow strided loops of numpy.einsum; 'threaded' is chosen
+for large grids if more threads are available. The strategy 'numba' was
+not the fastest one for any shape and layout of the benchmark, so it is
+only chosen explicitly.
+
+The products of matrices with vectors stacked along a leading load axis,
+i.e. of shape (L,n)+N (see ffthompy.tensors.stack), are evaluated by one
+numpy.einsum over all loads if the strategy is 'einsum', which reads the
+matrices only once; otherwise the strategy is applied to every load.
+
+Benchmark: python examples/benchmarks/pointwise.py
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ffthompy import kernels
+
+strategies=['einsum', 'matmul', 'unrolled', 'threaded', 'numba']
+
+# operators (of numpy.einsum) of products that are evaluated by matvec;
+# the values are the numbers of row and column axes of the matrix
+contractions={'ij...,j...->i...': (1, 1),
+              'ijkl...,kl...->ij...': (2, 2)}
+
+# operators of products with stacked vectors and the corresponding contractions
+stacked={'ij...,lj...->li...': 'ij...,j...->i...',
+         'ijkl...,mkl...->mij...': 'ijkl...,kl...->ij...'}
+
+config={'strategy': os.environ.get('FFTHOMPY_POINTWISE', 'auto'),
+        'threads': int(os.environ.get('FFTHOMPY_THREADS', os.cpu_count() or 1)),
+        'min_threaded': 2**18, # min. no. of grid points for threads (strategy 'auto')
+        'min_matmul': 2**15, # min. no. of grid points for matmul (strategy 'auto')
+        'pool': None}
+
+def set_strategy(strategy='auto', threads=None):
+    """
+    Set the strategy of pointwise products (see strategies or 'auto') and
+    the number of threads of the strategy 'threaded'.
+    """
+    assert(strategy in strategies+['auto'])
+    config['strategy']=strategy
+    if threads is not None and int(threads)!=config['threads']:
+        config['threads']=int(threads)
+        if config['pool'] is not None:
+            config['pool'].shutdown()
+            config['pool']=None
+    return config
+
+def get_pool():
+    if config['pool'] is None:
+        config['pool']=ThreadPoolExecutor(max_workers=config['threads'])
+    return config['pool']
+
+def get_strategy(A, x, out, strategy=None):
+    """
+    Strategy of product of matrices A of shape (m,n)+N with vectors x of shape (n,)+N.
+    """
+    if strategy is None:
+        strategy=config['strategy']
+    if strategy not in ['auto']:
+        return strategy
+    if config['threads']>1 and x[0].size>=config['min_threaded'] and x.shape[1]>1:
+        return 'threaded'
+    return get_serial_strategy(A, x, out)
+
+def get_serial_strategy(A, x, out):
+    # strategy 'auto' in one thread
+    if x[0].size>=config['min_matmul'] and not (A[0, 0].flags.c_contiguous
+                                                and x[0].flags.c_contiguous
+                                                and out[0].flags.c_contiguous):
+        return 'matmul' # e.g. dense projections applied to values from FFT backends
+    return 'einsum'
+
+def einsum(str_operator, X, Y, out=None, strategy=None):
+    """
+    numpy.einsum of values of Tensors; the products of matrices with vectors
+    (contractions) are evaluated by matvec.
+    """
+    if str_operator in stacked and X.shape[contractions[stacked[str_operator]][0]:]==Y.shape[1:]:
+        return einsum_stacked(str_operator, X, Y, out=out, strategy=strategy)
+    rows, cols=contractions.get(str_operator, (0, 0))
+    if (str_operator not in contractions
+            or X.shape[rows:]!=Y.shape): # broadcasting of numpy.einsum
+        if out is None:
+            return np.einsum(str_operator, X, Y)
+        return np.einsum(str_operator, X, Y, out=out)
+
+    mshape, nshape=X.shape[:rows], X.shape[rows:rows+cols]
+    grid=X.shape[rows+cols:]
+    A=X.reshape((int(np.prod(mshape)), int(np.prod(nshape)))+grid)
+    x=Y.reshape((A.shape[1],)+grid)
+    if out is None:
+        res=matvec(A, x, strategy=strategy)
+        return res.reshape(mshape+grid)
+    res=out.reshape((A.shape[0],)+grid)
+    if not np.may_share_memory(res, out): # out cannot be reshaped to a view
+        res=matvec(A, x, strategy=strategy)
+        out[...]=res.reshape(out.shape)
+        return out
+    matvec(A, x, out=res, strategy=strategy)
+    return out
+
+def einsum_stacked(str_operator, X, Y, out=None, strategy=None):
+    """
+    Products of matrices X with the vectors Y stacked along the leading axis.
+    """
+    rows, cols=contractions[stacked[str_operator]]
+    mshape, grid=X.shape[:rows], X.shape[rows+cols:]
+    if out is None:
+        out=np.empty((Y.shape[0],)+mshape+grid, dtype=np.result_type(X, Y))
+    A=X.reshape((int(np.prod(mshape)), -1)+grid)
+    x=Y[0].reshape((A.shape[1],)+grid)
+    res=out[0].reshape((A.shape[0],)+grid)
+    if (get_strategy(A, x, res, strategy) in ['einsum']
+            and not (np.may_share_memory(out, X) or np.may_share_memory(out, Y))):
+        return np.einsum(str_operator, X, Y, out=out)
+    for l in range(Y.shape[0]):
+        einsum(stacked[str_operator], X, Y[l], out=out[l], strategy=strategy)
+    return out
+
+def matvec(A, x, out=None, strategy=None):
+    """
+    Pointwise product of matrices A of shape (m,n)+N with vectors x
+    of shape (n,)+N; the result (of shape (m,)+N) is written to out
+    if it is provided.
+    """
+    m, n=A.shape[:2]
+    assert(x.shape[0]==n and A.shape[2:]==x.shape[1:])
+    dtype=np.result_type(A, x)
+    if out is None:
+        out=np.empty((m,)+x.shape[1:], dtype=dtype)
+    elif np.may_share_memory(out, x) or np.may_share_memory(out, A):
+        out[...]=matvec(A, x, strategy=strategy)
+        return out
+
+    strategy=get_strategy(A, x, out, strategy)
+    if strategy in ['einsum']:
+        np.einsum('ij...,j...->i...', A, x, out=out)
+    elif strategy in ['matmul']:
+        res=np.matmul(np.moveaxis(A, (0, 1), (-2, -1)), np.moveaxis(x, 0, -1)[..., np.newaxis])
+        out[...]=np.moveaxis(res[..., 0], -1, 0)
+    elif strategy in ['unrolled']:
+        matvec_unrolled(A, x, out)
+    elif strategy in ['numba']:
+        kernels.matvec(A, x, out)
+    elif strategy in ['threaded']:
+        nslab=x.shape[1]
+        bounds=np.linspace(0, nslab, min(config['threads'], nslab)+1).astype(np.int)
+        serial=get_serial_strategy(A, x, out)
+        jobs=[]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            sl=(slice(None), slice(start, stop))
+            jobs.append(get_pool().submit(matvec, A[(slice(None),)+sl], x[sl], out=out[sl],
+                                          strategy=serial))
+        for job in jobs:
+            job.result()
+    else:
+        raise ValueError('Strategy ({}) is not supported.'.format(strategy))
+    return out
+
+def matvec_unrolled(A, x, out):
+    # in-place multiply-add of components with one auxiliary component array
+    m, n=A.shape[:2]
+    if n==1:
+        for i in range(m):
+            np.multiply(A[i, 0], x[0], out=out[i])
+        return out
+    aux=np.empty(out.shape[1:], dtype=out.dtype)
+    for i in range(m):
+        np.multiply(A[i, 0], x[0], out=out[i])
+        for j in range(1, n):
+            np.multiply(A[i, j], x[j], out=aux)
+            out[i]+=aux
+    return out
@@ -1,70 +1,597 @@
 import numpy as np
-from ffthompy.trigpol import Grid, get_Nodd, mean_index, fft_form_default
-from .objects import Tensor
+from ffthompy.trigpol import Grid, get_Nodd, mean_index, fft_form_default, sym_fold
+from ffthompy.trigpol import get_kernel_freq, get_derivative_freq
+from ffthompy.general.base import Representation
+from ffthompy.mechanics.matcoef import ElasticTensor
+from .objects import Tensor, unstack
+from .fft import complex_dtype
+from .cache import get_kernel
+from ffthompy import kernels
 import itertools
+import copy
 
 def scalar(N, Y, fft_form=fft_form_default):
-    dim = np.size(N)
     N = np.array(N, dtype=np.int)
+    G0lval, G1lval, G2lval=get_kernel(lambda: scalar_kernels(N, Y, fft_form=fft_form),
+                                      'projection.scalar', N, Y, fft_form=fft_form)
+    G0l=Tensor(name='G0', val=G0lval, order=2, N=N, Y=Y, multype=21, Fourier=True, fft_form=fft_form)
+    G1l=Tensor(name='G1', val=G1lval, order=2, N=N, Y=Y, multype=21, Fourier=True, fft_form=fft_form)
+    G2l=Tensor(name='G2', val=G2lval, order=2, N=N, Y=Y, multype=21, Fourier=True, fft_form=fft_form)
+    return G0l, G1l, G2l
 
-    xi = Grid.get_freq(N, Y, fft_form=fft_form)
-    N_fft=tuple(xi[i].size for i in range(dim))
-    hGrad = np.zeros((dim,)+N_fft) # zero initialize
-    for ind in itertools.product(*[list(range(n)) for n in N_fft]):
-        for i in range(dim):
-            hGrad[i][ind] = xi[i][ind[i]]
-
-    kok= np.einsum('i...,j...->ij...', hGrad, hGrad).real
-    k2 = np.einsum('i...,i...', hGrad, hGrad).real
+def scalar_kernels(N, Y, fft_form=fft_form_default):
+    dim = np.size(N)
+    xi, N_fft = get_kernel_freq(N, Y, fft_form=fft_form)
+    k2 = np.zeros(N_fft)
+    for i in range(dim):
+        k2 += xi[i]**2
     ind_center=mean_index(N, fft_form=fft_form)
     k2[ind_center]=1.
 
-    G0lval=np.zeros_like(kok)
-    Ival=np.zeros_like(kok)
+    G=np.zeros((3, dim, dim)+N_fft)
+    G0lval, G1lval, G2lval=G
+    for ii, jj in np.ndindex(dim, dim):
+        G1lval[ii, jj]=xi[ii]*xi[jj]/k2
+        np.negative(G1lval[ii, jj], out=G2lval[ii, jj])
     for ii in range(dim): # diagonal components
         G0lval[ii, ii][ind_center] = 1
-        Ival[ii, ii] = 1
-    G1l=Tensor(name='G1', val=kok/k2, order=2, N=N, Y=Y, multype=21, Fourier=True, fft_form=fft_form)
-    G0l=Tensor(name='G1', val=G0lval, order=2, N=N, Y=Y, multype=21, Fourier=True, fft_form=fft_form)
-    I = Tensor(name='I', val=Ival, order=2, N=N, Y=Y, multype=21, Fourier=True, fft_form=fft_form)
-    G2l=I-G1l-G0l
-    return G0l, G1l, G2l
+        G2lval[ii, ii] += 1
+        G2lval[ii, ii][ind_center] = 0
+    return G
 
 def elasticity_small_strain(N, Y, fft_form=fft_form_default):
     N = np.array(N, dtype=np.int)
-    dim = N.size
-    assert(dim==3)
-    freq = Grid.get_freq(N, Y, fft_form=fft_form)
-    N_fft=tuple(freq[i].size for i in range(dim))
-    Ghat = np.zeros(np.hstack([dim*np.ones(4, dtype=np.int), N_fft]))
-    delta  = lambda i,j: np.float(i==j)
-
-    for i, j, k, l in itertools.product(list(range(dim)), repeat=4):
-        for x, y, z in np.ndindex(*N_fft):
-            q = np.array([freq[0][x], freq[1][y], freq[2][z]])
-            if not q.dot(q) == 0:
-                Ghat[i,j,k,l,x,y,z] = -q[i]*q[j]*q[k]*q[l]/(q.dot(q))**2 + \
-                    .5*(delta(i, k)*q[j]*q[l]+delta(i, l)*q[j]*q[k]+
-                        delta(j, k)*q[i]*q[l]+delta(j, l)*q[i]*q[k])/(q.dot(q))
-
+    Ghat=get_kernel(lambda: elasticity_small_strain_kernel(N, Y, fft_form=fft_form),
+                    'projection.elasticity_small_strain', N, Y, fft_form=fft_form)
     Ghat_tensor = Tensor(name='Ghat', val=Ghat, N=N, order=4, multype=42, Fourier=True, fft_form=fft_form)
     return Ghat_tensor
 
-def elasticity_large_deformation(N, Y, fft_form=fft_form_default):
-    N = np.array(N, dtype=np.int)
+def elasticity_small_strain_kernel(N, Y, fft_form=fft_form_default):
     dim = N.size
-    assert(dim==3)
-    freq = Grid.get_freq(N, Y, fft_form=fft_form)
-    N_fft=tuple(freq[i].size for i in range(dim))
-    Ghat = np.zeros(np.hstack([dim*np.ones(4, dtype=np.int), N_fft]))
-    delta  = lambda i,j: np.float(i==j)
-
-    for i, j, k, l in itertools.product(list(range(dim)), repeat=4):
-        for x, y, z in np.ndindex(*N_fft):
-            q = np.array([freq[0][x], freq[1][y], freq[2][z]])
-            if not q.dot(q) == 0:
-                Ghat[i,j,k,l,x,y,z] = delta(i,k)*q[j]*q[l] / (q.dot(q))
+    xi, N_fft = get_kernel_freq(N, Y, fft_form=fft_form)
+    k2 = np.zeros(N_fft)
+    for i in range(dim):
+        k2 += xi[i]**2
+    k2[mean_index(N, fft_form=fft_form)]=1. # kernel is zero at zero frequency
+    delta = lambda i,j: np.float(i==j)
+
+    Ghat = np.zeros((dim, dim, dim, dim)+N_fft)
+    for i, j, k, l in itertools.product(range(dim), repeat=4):
+        if (k, l) < (i, j): # major symmetry
+            Ghat[i,j,k,l]=Ghat[k,l,i,j]
+            continue
+        Ghat[i,j,k,l] = -xi[i]*xi[j]*xi[k]*xi[l]/k2**2 + \
+            .5*(delta(i, k)*xi[j]*xi[l]+delta(i, l)*xi[j]*xi[k]+
+                delta(j, k)*xi[i]*xi[l]+delta(j, l)*xi[i]*xi[k])/k2
+    return Ghat
 
+def elasticity_large_deformation(N, Y, fft_form=fft_form_default):
+    N = np.array(N, dtype=np.int)
+    Ghat=get_kernel(lambda: elasticity_large_deformation_kernel(N, Y, fft_form=fft_form),
+                    'projection.elasticity_large_deformation', N, Y, fft_form=fft_form)
     Ghat_tensor = Tensor(name='Ghat', val=Ghat, order=4, N=N, multype=42,
                          Fourier=True, fft_form=fft_form)
     return Ghat_tensor
+
+def elasticity_large_deformation_kernel(N, Y, fft_form=fft_form_default):
+    dim = N.size
+    xi, N_fft = get_kernel_freq(N, Y, fft_form=fft_form)
+    k2 = np.zeros(N_fft)
+    for i in range(dim):
+        k2 += xi[i]**2
+    k2[mean_index(N, fft_form=fft_form)]=1. # kernel is zero at zero frequency
+
+    Ghat = np.zeros((dim, dim, dim, dim)+N_fft)
+    for i, j, l in itertools.product(range(dim), repeat=3):
+        Ghat[i,j,i,l] = xi[j]*xi[l]/k2
+    return Ghat
+
+def symmetric_kernel(G, parity=None):
+    """
+    Kernel (Fourier multiplier) on mirror-symmetric cell (fft_form='s').
+
+    The kernel is restricted to non-negative frequencies; if the parity of
+    the operand is provided, the kernel is adjusted to the operand because
+    the Fourier coefficients of components with n odd axes are stored
+    divided by 1j**n (see ffthompy.tensors.fft.sfftn). The components
+    mapping between parities with odd difference of n are zero.
+
+    Parameters
+    ----------
+    G : Tensor
+        kernel with fft_form in [0, 'c', 's']
+    parity : numpy.ndarray
+        parity of operand of shape G.shape[G.order/2:]+(dim,)
+    """
+    assert(G.Fourier)
+    if G.fft_form in [0, 'c']:
+        G=G.set_fft_form(fft_form=0, copy=True)
+        G=G.copy(val=np.copy(sym_fold(G.val.real, G.N)), fft_form='s')
+    elif G.fft_form not in ['s']:
+        raise NotImplementedError('Kernel with fft_form ({}).'.format(G.fft_form))
+
+    if parity is not None:
+        n=np.sum(parity, axis=-1) # no. of odd axes of components
+        dif=np.reshape(n, n.ndim*(1,)+n.shape)-np.reshape(n, n.shape+n.ndim*(1,))
+        factor=np.where(dif % 4 == 0, 1., -1.)*(dif % 2 == 0)
+        G=G.copy(val=G.val*np.reshape(factor, factor.shape+G.dim*(1,)).astype(G.dtype))
+    return G
+
+
+class FourierProjection(Representation):
+    """
+    Matrix-free projection (Fourier multiplier) of Tensors in the Fourier
+    domain; only the one-dimensional frequency vectors are stored and
+    the kernel is evaluated on the fly by broadcasting.
+
+    Parameters
+    ----------
+    N : numpy.ndarray
+        no. of grid points of the kernel, e.g. the kernel from
+        ffthompy.projections with grid N
+    Y : numpy.ndarray
+        size of periodic unit cell
+    NyqNul : bool
+        kernel is zero at Nyquist frequencies of even N
+    fft_form : str or int
+        layout of the operand in the Fourier domain (0, 'c', 'r')
+    Nbar : numpy.ndarray
+        grid of the operand; the kernel is enlarged by zeros (see enlarge),
+        the values at the Nyquist frequencies of even N (NyqNul=False)
+        are split between both frequencies +-N/2 of the operand grid
+    scheme : str
+        discrete derivative defining the compatible fields (see
+        ffthompy.trigpol.get_derivative_freq); the finite-difference
+        schemes are defined only on the grid N (Nbar=N)
+    """
+    def __init__(self, N, Y, NyqNul=True, fft_form=fft_form_default, Nbar=None, name='hG',
+                 scheme='spectral'):
+        if fft_form not in [0, 'c', 'r']:
+            raise NotImplementedError('Matrix-free projection with fft_form ({})'.format(fft_form))
+        self.N=np.array(N, dtype=np.int)
+        self.Nbar=self.N if Nbar is None else np.array(Nbar, dtype=np.int)
+        self.Y=np.array(Y, dtype=np.float)
+        self.NyqNul=NyqNul
+        self.fft_form=fft_form
+        self.scheme=scheme
+        self.dim=self.N.size
+        self.name=name
+        self.slab=None
+        self.set_grid(self.Nbar)
+
+    def set_grid(self, Nbar):
+        self.Nbar=np.array(Nbar, dtype=np.int)
+        if self.scheme not in ['spectral'] and not np.all(self.Nbar==self.N):
+            raise NotImplementedError('Scheme ({}) on enlarged grid'.format(self.scheme))
+        self.xi, self.shift, self.N_fft=get_derivative_freq(self.Nbar, self.Y,
+                                                           fft_form=self.fft_form,
+                                                           scheme=self.scheme, common=False)
+        self.band=self.get_band()
+        if self.slab is not None:
+            self._restrict()
+        return self
+
+    def restrict(self, axis, slc):
+        """
+        Projection restricted to the frequencies slc along the axis, e.g. to
+        the local block of DistributedTensor in the Fourier domain; the
+        frequencies of the other blocks are neither stored nor evaluated.
+        """
+        new=copy.copy(self)
+        new.slab=(axis, slc)
+        return new.set_grid(self.Nbar)
+
+    def _restrict(self):
+        axis, slc=self.slab
+        take=lambda v: v if v.shape[axis]==1 else v[axis*(slice(None),)+(slc,)]
+        self.xi=[take(x) for x in self.xi]
+        if self.shift is not None:
+            self.shift=[take(s) for s in self.shift]
+        if self.band is not None:
+            self.band=[take(w) for w in self.band]
+        N_fft=list(self.N_fft)
+        N_fft[axis]=len(range(*slc.indices(N_fft[axis])))
+        self.N_fft=tuple(N_fft)
+
+    def get_band(self):
+        """
+        Weights (along every axis) of frequencies of the operand grid Nbar
+        that are supported by the kernel with grid N.
+        """
+        band=[]
+        for k, n, nbar in zip(Grid.get_xil(self.Nbar, np.ones(self.dim), fft_form=self.fft_form),
+                              self.N, self.Nbar):
+            if self.NyqNul:
+                w=np.abs(k)<=(n-1)//2
+            elif n==nbar:
+                w=np.ones_like(k)
+            else: # Nyquist frequency split by enlarge
+                w=(np.abs(k)<n/2.)+0.5*(np.abs(k)==n/2.)
+            band.append(w)
+        if all(np.all(w==1) for w in band):
+            return None
+        return [np.reshape(w, [-1 if m==ii else 1 for m in range(self.dim)])
+                for ii, w in enumerate(band)]
+
+    def enlarge(self, M):
+        """
+        Projection on the operand grid M with the kernel supported on the grid N.
+        """
+        if np.allclose(self.Nbar, M):
+            return self
+        return copy.copy(self).set_grid(M)
+
+    def transpose(self): # the projections are self-adjoint
+        return self
+
+    def mean_index(self):
+        ind=mean_index(self.Nbar, self.fft_form)
+        if self.slab is None:
+            return ind
+        axis, slc=self.slab
+        ind=list(ind)
+        if slc.start<=ind[axis]<slc.stop:
+            ind[axis]-=slc.start
+        else: # zero frequency in another block
+            ind[axis]=slice(0, 0)
+        return tuple(ind)
+
+    def get_freq(self, dtype=np.float):
+        # frequencies in the precision of operand and norm |xi|^2 with one at zero frequency
+        xi=[x.astype(dtype) for x in self.xi]
+        xi2=np.zeros(self.N_fft, dtype=dtype)
+        for x in xi:
+            xi2+=x**2
+        xi2[xi2==0]=1.
+        return xi, xi2
+
+    def get_shift(self, dtype=np.float):
+        # phase factors of staggered components (or None) in the precision of operand
+        if self.shift is None:
+            return None
+        return [s.astype(complex_dtype(dtype)) for s in self.shift]
+
+    def apply_band(self, val, order):
+        # multiplies values (in place) by the weights of supported frequencies
+        if self.band is not None:
+            for w in self.band:
+                val*=np.reshape(w, order*(1,)+w.shape).astype(val.real.dtype)
+        return val
+
+    def _check(self, x):
+        assert(x.Fourier)
+        assert(x.fft_form==self.fft_form)
+        assert(np.all(np.array(x.N)==self.Nbar))
+
+    def _output(self, x, val, out=None):
+        name='{0}({1})'.format(self.name, x.name)
+        if out is None:
+            return x.copy(name=name, val=val)
+        out.update(name=name)
+        return out
+
+    def empty_output(self, x, name=None):
+        """
+        Allocates a Tensor that can store the result of self(x).
+        """
+        if name is None:
+            name='empty({})'.format(x.name[:10])
+        return x.empty_like(name=name)
+
+    def _call_stacked(self, x, out=None):
+        # applies the projection to the fields stacked along the leading (load) axis
+        val=np.zeros_like(x.val) if out is None else out.val
+        for xl, vl in zip(unstack(x), val):
+            self.__call__(xl, out=xl.copy(val=vl))
+        return self._output(x, val, out)
+
+    def __mul__(self, x):
+        return self.__call__(x)
+
+    def __repr__(self):
+        return self._repr(['name', 'N', 'Nbar', 'fft_form', 'NyqNul', 'scheme'])
+
+
+class ScalarProjection(FourierProjection):
+    """
+    Matrix-free projections of scalar elliptic problems acting on vector
+    fields (of shape (dim,)) in the Fourier domain:
+    kind='G0' : projection on constant fields
+    kind='G1' : xi*(xi.x)/|xi|^2, i.e. on curl-free fields with zero mean
+    kind='G2' : x-G1(x), i.e. on divergence-free fields with zero mean
+    It corresponds to the kernels from ffthompy.projections.scalar.
+    """
+    def __init__(self, N, Y, kind='G1', NyqNul=True, fft_form=fft_form_default, Nbar=None,
+                 name=None, scheme='spectral'):
+        assert(kind in ['G0', 'G1', 'G2'])
+        self.kind=kind
+        if name is None:
+            name='h{}'.format(kind)
+        FourierProjection.__init__(self, N, Y, NyqNul=NyqNul, fft_form=fft_form, Nbar=Nbar,
+                                   name=name, scheme=scheme)
+
+    def __call__(self, x, out=None):
+        """
+        Applies the projection; the result is written to the Tensor out
+        (e.g. from x.empty_like) if it is provided.
+        """
+        self._check(x)
+        if x.order==2: # fields of several loads
+            return self._call_stacked(x, out)
+        assert(x.shape==(self.dim,))
+        ind=self.mean_index()
+        val=np.zeros_like(x.val) if out is None else out.val
+        if self.kind in ['G0']:
+            val[:]=0
+            for ii in range(self.dim):
+                val[ii][ind]=x.val[ii][ind]
+        else:
+            xi, xi2=self.get_freq(dtype=x.dtype)
+            shift=self.get_shift(dtype=x.dtype)
+            if shift is None: # fused loop over grid points
+                kernels.scalar_projection(x.val, xi, xi2, val, kind=self.kind)
+            else:
+                xval=[np.conj(s)*xv for s, xv in zip(shift, x.val)]
+                xix=xi[0]*xval[0] # scalar product xi.x
+                for ii in range(1, self.dim):
+                    xix+=xi[ii]*xval[ii]
+                xix/=xi2
+                for ii in range(self.dim):
+                    np.multiply(xi[ii], xix, out=val[ii])
+                    val[ii]*=shift[ii]
+                if self.kind in ['G2']:
+                    np.subtract(x.val, val, out=val)
+            if self.kind in ['G2']:
+                for ii in range(self.dim):
+                    val[ii][ind]=0
+            self.apply_band(val, order=1)
+        return self._output(x, val, out)
+
+    def __repr__(self):
+        return self._repr(['name', 'kind', 'N', 'Nbar', 'fft_form', 'NyqNul', 'scheme'])
+
+
+class ElasticityProjection(FourierProjection):
+    """
+    Matrix-free projections of small-strain elasticity acting on strains
+    in the Fourier domain:
+    kind='G0' : projection on constant strains
+    kind='G1' : projection on compatible strains with zero mean,
+                xi*(e.xi)+(e.xi)*xi-xi*xi*(xi.e.xi)/|xi|^2 divided by |xi|^2
+    kind='G2' : x-G1(x), i.e. on equilibrated stresses with zero mean
+    The strains are stored in Mandel's notation (layout='mandel', shape (D,))
+    corresponding to the kernels hG1h+hG1s (hG2h+hG2s) from
+    ffthompy.projections.elasticity, or as full tensors (layout='full',
+    shape (dim, dim)) corresponding to the kernel from elasticity_small_strain.
+    """
+    def __init__(self, N, Y, kind='G1', layout='mandel', NyqNul=True, fft_form=fft_form_default,
+                 Nbar=None, name=None, scheme='spectral'):
+        assert(kind in ['G0', 'G1', 'G2'])
+        assert(layout in ['mandel', 'full'])
+        self.kind=kind
+        self.layout=layout
+        if name is None:
+            name='h{}'.format(kind)
+        FourierProjection.__init__(self, N, Y, NyqNul=NyqNul, fft_form=fft_form, Nbar=Nbar,
+                                   name=name, scheme=scheme)
+        self.pairs=ElasticTensor.get_mandel_pairs(self.dim)
+        self.coef=[1. if a==b else 2**.5 for a, b in self.pairs]
+
+    @property
+    def shape(self):
+        if self.layout in ['mandel']:
+            return (len(self.pairs),)
+        else:
+            return (self.dim, self.dim)
+
+    def get_strain(self, val, shift=None):
+        # symmetric strain components e[a][b] from Mandel's or full notation;
+        # the phases of staggered components are removed
+        e=[self.dim*[None] for _ in range(self.dim)]
+        if self.layout in ['mandel']:
+            for I, (a, b) in enumerate(self.pairs):
+                e[a][b]=e[b][a]=val[I]/self.coef[I]
+        else:
+            for a, b in itertools.product(range(self.dim), repeat=2):
+                e[a][b]=0.5*(val[a, b]+val[b, a]) if a!=b else val[a, a]
+        if shift is not None:
+            for a, b in itertools.product(range(self.dim), repeat=2):
+                e[a][b]=e[a][b]*np.conj(shift[a]*shift[b])
+        return e
+
+    def __call__(self, x, out=None):
+        self._check(x)
+        if x.order==len(self.shape)+1: # fields of several loads
+            return self._call_stacked(x, out)
+        assert(x.shape==self.shape)
+        ind=self.mean_index()
+        val=np.zeros_like(x.val) if out is None else out.val
+        if self.kind in ['G0']:
+            val[:]=0
+            for I in np.ndindex(*self.shape):
+                val[I][ind]=x.val[I][ind]
+        else:
+            xi, xi2=self.get_freq(dtype=x.dtype)
+            shift=self.get_shift(dtype=x.dtype)
+            e=self.get_strain(x.val, shift)
+            exi=[] # e.xi/|xi|^2
+            for a in range(self.dim):
+                exi.append(e[a][0]*xi[0])
+                for b in range(1, self.dim):
+                    exi[a]+=e[a][b]*xi[b]
+                exi[a]/=xi2
+            xiexi=xi[0]*exi[0] # xi.e.xi/|xi|^4
+            for a in range(1, self.dim):
+                xiexi+=xi[a]*exi[a]
+            xiexi/=xi2
+            if shift is None:
+                Ge=lambda a, b: xi[a]*exi[b]+xi[b]*exi[a]-xi[a]*xi[b]*xiexi
+            else:
+                Ge=lambda a, b: shift[a]*shift[b]*(xi[a]*exi[b]+xi[b]*exi[a]-xi[a]*xi[b]*xiexi)
+            if self.layout in ['mandel']:
+                for I, (a, b) in enumerate(self.pairs):
+                    val[I]=self.coef[I]*Ge(a, b)
+            else:
+                for a in range(self.dim):
+                    for b in range(a, self.dim):
+                        val[a, b]=Ge(a, b)
+                        val[b, a]=val[a, b]
+            if self.kind in ['G2']:
+                np.subtract(x.val, val, out=val)
+                for I in np.ndindex(*self.shape):
+                    val[I][ind]=0
+            self.apply_band(val, order=len(self.shape))
+        return self._output(x, val, out)
+
+    def __repr__(self):
+        return self._repr(['name', 'kind', 'layout', 'N', 'Nbar', 'fft_form', 'NyqNul',
+                           'scheme'])
+
+
+class ScalarGreen(ScalarProjection):
+    """
+    Matrix-free Green operator of scalar elliptic problems with homogeneous
+    reference medium A0 in the Fourier domain, i.e. the inverse of G*A0*G
+    on the range of the projection G; it replaces the projection G in the
+    linear systems G*A*x=b, which preconditions them (see scal and
+    ffthompy.applications):
+    kind='G1' : xi*(xi.x)/(xi.A0.xi) for reference conductivity A0
+                (a scalar or a matrix of shape (dim,dim))
+    kind='G2' : G2(x)/A0 for reference resistivity A0 (a scalar),
+                i.e. for the dual formulation
+    The operator is evaluated as the projection followed by the scaling
+    of values at every frequency.
+    """
+    def __init__(self, N, Y, A0, kind='G1', NyqNul=True, fft_form=fft_form_default, Nbar=None,
+                 name=None, scheme='spectral'):
+        assert(kind in ['G1', 'G2'])
+        A0=np.array(A0, dtype=np.float)
+        if A0.ndim==2 and np.allclose(A0, A0[0, 0]*np.eye(A0.shape[0])): # isotropic
+            A0=np.array(A0[0, 0])
+        if A0.ndim!=0 and kind in ['G2']:
+            raise NotImplementedError('Green operator of kind (G2) with anisotropic reference.')
+        self.A0=A0
+        if name is None:
+            name='hGamma{}'.format(kind[1])
+        ScalarProjection.__init__(self, N, Y, kind=kind, NyqNul=NyqNul, fft_form=fft_form,
+                                  Nbar=Nbar, name=name, scheme=scheme)
+
+    def set_grid(self, Nbar):
+        self.scale=dict() # scaling of frequencies for the precisions of operands
+        return ScalarProjection.set_grid(self, Nbar)
+
+    def get_scale(self, dtype=np.float):
+        # |xi|^2/(xi.A0.xi), or 1/A0 for isotropic reference
+        if self.A0.ndim==0:
+            return 1./self.A0
+        key=np.dtype(dtype).str
+        if key not in self.scale:
+            xi, xi2=self.get_freq(dtype=dtype)
+            xiAxi=np.zeros(self.N_fft, dtype=dtype)
+            for ii, jj in np.ndindex(self.dim, self.dim):
+                xiAxi+=self.A0[ii, jj]*xi[ii]*xi[jj]
+            xiAxi[xiAxi==0]=1.
+            self.scale[key]=xi2/xiAxi
+        return self.scale[key]
+
+    def scal(self, x, y):
+        """
+        Scalar product (x, A0*y) of fields in the real domain, in which the
+        operator Gamma0*A is self-adjoint on the range of the projection;
+        conjugate gradients with this scalar product are preconditioned
+        conjugate gradients of G*A*x=b.
+        """
+        if self.A0.ndim==0:
+            return float(self.A0*(x*y))
+        res=0.
+        for ii, jj in np.ndindex(self.dim, self.dim):
+            res+=self.A0[ii, jj]*np.sum(x.val[ii]*y.val[jj], dtype=np.float64)
+        return res/np.prod(x.N)
+
+    def __call__(self, x, out=None):
+        self._check(x)
+        if x.order==2: # fields of several loads
+            return self._call_stacked(x, out)
+        res=ScalarProjection.__call__(self, x, out=out)
+        res.val*=self.get_scale(dtype=x.dtype)
+        return res
+
+    def __repr__(self):
+        return self._repr(['name', 'kind', 'A0', 'N', 'Nbar', 'fft_form', 'NyqNul', 'scheme'])
+
+
+class ElasticityGreen(ElasticityProjection):
+    """
+    Matrix-free Green operator of small-strain elasticity with homogeneous
+    isotropic reference medium in the Fourier domain, i.e. the inverse of
+    G*A0*G on the range of the projection G (see ElasticityProjection);
+    it replaces the projection G in the linear systems (see ScalarGreen
+    and its scal). The reference
+    medium is given by the eigenvalues A0=(h0, s0) of the reference stiffness
+    (kind='G1') or compliance (kind='G2', the dual formulation) on volumetric
+    and deviatoric strains, e.g. h0=3*bulk and s0=2*mu in 3d.
+    The operator is evaluated as the projection G followed by the correction
+    of its volumetric part at every frequency.
+    """
+    def __init__(self, N, Y, A0, kind='G1', layout='mandel', NyqNul=True,
+                 fft_form=fft_form_default, Nbar=None, name=None, scheme='spectral'):
+        assert(kind in ['G1', 'G2'])
+        self.A0=tuple(float(a) for a in A0)
+        if name is None:
+            name='hGamma{}'.format(kind[1])
+        ElasticityProjection.__init__(self, N, Y, kind=kind, layout=layout, NyqNul=NyqNul,
+                                      fft_form=fft_form, Nbar=Nbar, name=name, scheme=scheme)
+
+    def scal(self, x, y):
+        # scalar product (x, A0*y), i.e. s0*(x, y) plus the volumetric part
+        h0, s0=self.A0
+        if self.layout in ['mandel']:
+            trx, try_=np.sum(x.val[:self.dim], axis=0), np.sum(y.val[:self.dim], axis=0)
+        else:
+            trx, try_=np.trace(x.val), np.trace(y.val)
+        vol=np.sum(trx*try_, dtype=np.float64)/np.prod(x.N)
+        return float(s0*(x*y)+(h0-s0)/self.dim*vol)
+
+    def __call__(self, x, out=None):
+        self._check(x)
+        if x.order==len(self.shape)+1: # fields of several loads
+            return self._call_stacked(x, out)
+        res=ElasticityProjection.__call__(self, x, out=out)
+        val=res.val
+        dim=self.dim
+        h0, s0=self.A0
+        xi, xi2=self.get_freq(dtype=x.dtype)
+        shift=self.get_shift(dtype=x.dtype)
+        e=self.get_strain(val, shift)
+        xiexi=0. # xi.e.xi/|xi|^2
+        for a, b in itertools.product(range(dim), repeat=2):
+            xiexi=xiexi+xi[a]*e[a][b]*xi[b]
+        xiexi/=xi2
+        if self.kind in ['G1']: # component along xi*xi/|xi|^2
+            coef=xiexi*(1./(s0+(h0-s0)/dim)-1./s0)
+            T=lambda a, b: xi[a]*xi[b]/xi2
+        else: # component along I-xi*xi/|xi|^2
+            tr=-xiexi
+            for a in range(dim):
+                tr=tr+e[a][a]
+            coef=tr*(1./(s0+(h0-s0)*(dim-1)/dim)-1./s0)/(dim-1)
+            T=lambda a, b: float(a==b)-xi[a]*xi[b]/xi2
+        if shift is None:
+            Le=lambda a, b: coef*T(a, b)
+        else:
+            Le=lambda a, b: shift[a]*shift[b]*coef*T(a, b)
+        val/=s0
+        if self.layout in ['mandel']:
+            for I, (a, b) in enumerate(self.pairs):
+                val[I]+=self.coef[I]*Le(a, b)
+        else:
+            for a in range(dim):
+                for b in range(a, dim):
+                    val[a, b]+=Le(a, b)
+                    if a!=b:
+                        val[b, a]+=Le(a, b)
+        return res
+
+    def __repr__(self):
+        return self._repr(['name', 'kind', 'A0', 'layout', 'N', 'Nbar', 'fft_form', 'NyqNul',
+                           'scheme'])
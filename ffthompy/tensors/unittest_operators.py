@@ -1,10 +1,18 @@
+import os
 import unittest
 import numpy as np
 from numpy.linalg import norm
 from ffthompy import PrintControl
 import ffthompy.projections as proj
 from ffthompy.tensors import Tensor, DFT, grad, div, symgrad, potential, Operator, grad_div_tensor
+from ffthompy.tensors import grad_tensor, laplace, Grad, Div, Laplace, stack
+from ffthompy.tensors.operators import get_operator
+from ffthompy.trigpol import Grid
+from ffthompy.mechanics.matcoef import ElasticTensor
 from ffthompy.tensors.projection import scalar, elasticity_small_strain, elasticity_large_deformation
+from ffthompy.tensors.projection import (symmetric_kernel, ScalarProjection,
+                                        ElasticityProjection, ScalarGreen, ElasticityGreen)
+from ffthompy.tensors import fft, distributed, cache
 import itertools
 from copy import copy
 
@@ -101,7 +109,7 @@ class Test_operators(unittest.TestCase):
 
     def test_compatibility(self):
         print('\nChecking compatibility...')
-        for dim, fft_form in itertools.product([3], fft_forms):
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
             N=5*np.ones(dim, dtype=np.int)
             F=DFT(inverse=False, N=N, fft_form=fft_form)
             iF=DFT(inverse=True, N=N, fft_form=fft_form)
@@ -174,6 +182,133 @@ class Test_operators(unittest.TestCase):
             self.assertAlmostEqual(0, (P1==P1.transpose()), delta=1e-13)
         print('...ok')
 
+    def test_differential_operators(self):
+        print('\nChecking differential operators...')
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=np.array([5, 4, 6][:dim])
+            Y=np.array([1., 2., 3.][:dim])
+            F=DFT(N=N, fft_form=fft_form)
+            iF=DFT(N=N, fft_form=fft_form, inverse=True)
+            G=Grad(N, Y, fft_form=fft_form)
+            D=Div(N, Y, fft_form=fft_form)
+            freq=Grid.get_freq(N, Y, fft_form=fft_form)
+            for shape in [(1,), (dim,), (dim, dim)]:
+                u=Tensor(name='u', shape=shape, N=N, Y=Y, fft_form=fft_form).randomize()
+                Fu=F(u)
+                # reference gradient evaluated component-wise
+                val=np.empty(shape+(dim,)+Fu.N_fft, dtype=np.complex)
+                for ii in range(dim):
+                    xi=np.reshape(freq[ii], [-1 if jj==ii else 1 for jj in range(dim)])
+                    val[(Ellipsis, ii)+dim*(slice(None),)]=2*np.pi*1j*xi*Fu.val
+                if shape==(1,):
+                    val=val[0]
+                gFu=G(Fu)
+                self.assertAlmostEqual(0, norm(gFu.val-val), delta=1e-12)
+                self.assertTrue((grad(u)==iF(gFu))[0])
+                out=G.empty_output(Fu)
+                self.assertTrue(G(Fu, out=out) is out)
+                self.assertAlmostEqual(0, norm(out.val-val), delta=1e-12)
+
+                # divergence, Laplace operator, and transpose
+                self.assertTrue((div(gFu)==D(gFu))[0])
+                self.assertAlmostEqual(0, (Laplace(N, Y, fft_form=fft_form)(Fu)==D(gFu))[1],
+                                       delta=1e-10)
+                self.assertAlmostEqual(0, (laplace(u)==iF(D(gFu)))[1], delta=1e-10)
+                self.assertTrue((Div(N, Y, fft_form=fft_form, coef=-1.)(gFu)==-D(gFu))[0])
+                if fft_form in [0, 'c']:
+                    v=F(Tensor(name='v', shape=gFu.shape, N=N, Y=Y,
+                               fft_form=fft_form).randomize())
+                    self.assertAlmostEqual(np.vdot(v.val, gFu.val),
+                                           np.vdot(G.transpose()(v).val, Fu.val), delta=1e-10)
+
+            # composition with compiled operators
+            u=Tensor(name='u', shape=(1,), N=N, Y=Y, fft_form=fft_form).randomize()
+            L=Operator(name='L', mat=[[iF, D, G, F]])
+            Lu=L(u)
+            self.assertAlmostEqual(0, (Lu==laplace(u))[1], delta=1e-10)
+            self.assertTrue((Lu==L.compile(u)(u))[0])
+
+            # kernels are stored as factors along the axes; the result written to the operand
+            self.assertTrue(all(f.size==max(f.shape) for fm in G.get_kernel(np.float)
+                                for f in fm))
+            Fu=F(u)
+            LFu=Laplace(N, Y, fft_form=fft_form)(Fu)
+            LFu2=Fu.copy(val=Fu.val[0])
+            self.assertIs(Laplace(N, Y, fft_form=fft_form)(LFu2, out=LFu2), LFu2)
+            self.assertAlmostEqual(0, norm(LFu2.val-LFu.val), delta=1e-10)
+
+            # operators (and the symbol of Laplace) shared by the calls with the same grid
+            self.assertIs(get_operator(Grad, N, Y, fft_form), get_operator(Grad, N, Y, fft_form))
+            self.assertIs(Laplace(N, Y, fft_form=fft_form).get_kernel(np.float),
+                          get_operator(Laplace, N, Y, fft_form).get_kernel(np.float))
+        print('...ok')
+
+    def test_derivative_schemes(self):
+        print('\nChecking finite-difference schemes...')
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=np.array([5, 4, 6][:dim])
+            Y=np.array([1., 2., 3.][:dim])
+            h=Y/N
+            F=DFT(N=N, fft_form=fft_form)
+            iF=DFT(N=N, fft_form=fft_form, inverse=True)
+            u=Tensor(name='u', shape=(1,), N=N, Y=Y, fft_form=fft_form).randomize()
+            shift=lambda v, axes: np.roll(v, [-1]*len(axes), axis=axes) # values at i+1
+            for scheme in ['central', 'forward', 'backward', 'rotated']:
+                # gradient compared with differences on the grid
+                gu=iF(Grad(N, Y, fft_form=fft_form, scheme=scheme)(F(u)))
+                for ii in range(dim):
+                    v=u.val[0]
+                    if scheme in ['central']:
+                        val=(shift(v, [ii])-np.roll(v, 1, axis=ii))/(2*h[ii])
+                    elif scheme in ['forward']:
+                        val=(shift(v, [ii])-v)/h[ii]
+                    elif scheme in ['backward']:
+                        val=(v-np.roll(v, 1, axis=ii))/h[ii]
+                    else: # average of forward differences over edges of grid cells
+                        val=np.zeros_like(v)
+                        others=[jj for jj in range(dim) if jj!=ii]
+                        for n in range(dim):
+                            for axes in itertools.combinations(others, n):
+                                w=shift(v, list(axes)) if axes else v
+                                val+=(shift(w, [ii])-w)/h[ii]/2**(dim-1)
+                    self.assertAlmostEqual(0, norm(gu.val[ii]-val), delta=1e-10, msg=scheme)
+
+                # projections on compatible fields
+                gFu=Grad(N, Y, fft_form=fft_form, scheme=scheme)(F(u))
+                kwargs=dict(NyqNul=False, fft_form=fft_form, scheme=scheme)
+                hG1=ScalarProjection(N, Y, kind='G1', **kwargs)
+                hG2=ScalarProjection(N, Y, kind='G2', **kwargs)
+                _, hG1d, hG2d=proj.scalar(N, Y, **kwargs)
+                self.assertAlmostEqual(0, (hG1(gFu)==gFu)[1], delta=1e-10, msg=scheme)
+                self.assertAlmostEqual(0, hG2(gFu).norm(), delta=1e-10, msg=scheme)
+                x=F(Tensor(name='x', shape=(dim,), N=N, Y=Y, fft_form=fft_form).randomize())
+                self.assertAlmostEqual(0, (hG1(hG1(x))==hG1(x))[1], delta=1e-12, msg=scheme)
+                self.assertAlmostEqual(0, (hG1d*x==hG1(x))[1], delta=1e-12, msg=scheme)
+                self.assertAlmostEqual(0, (hG2d*x==hG2(x))[1], delta=1e-12, msg=scheme)
+                x.val[(slice(None),)+x.mean_index()]=0 # G1+G2 is identity on zero-mean fields
+                self.assertAlmostEqual(0, (hG1(x)+hG2(x)==x)[1], delta=1e-12, msg=scheme)
+
+                # elasticity: symmetric gradient in Mandel's notation
+                v=Tensor(name='v', shape=(dim,), N=N, Y=Y, fft_form=fft_form).randomize()
+                gFv=Grad(N, Y, fft_form=fft_form, scheme=scheme)(F(v))
+                pairs=ElasticTensor.get_mandel_pairs(dim)
+                e=Tensor(name='e', shape=(len(pairs),), N=N, Y=Y, Fourier=True,
+                         fft_form=fft_form)
+                for I, (a, b) in enumerate(pairs):
+                    e.val[I]=(1. if a==b else 2**.5)*0.5*(gFv.val[a, b]+gFv.val[b, a])
+                G1e=ElasticityProjection(N, Y, kind='G1', **kwargs)
+                _, hG1h, hG1s, _, _=proj.elasticity(N, Y, **kwargs)
+                self.assertAlmostEqual(0, (G1e(e)==e)[1], delta=1e-10, msg=scheme)
+                x=F(Tensor(name='x', shape=(len(pairs),), N=N, Y=Y,
+                           fft_form=fft_form).randomize())
+                self.assertAlmostEqual(0, ((hG1h+hG1s)*x==G1e(x))[1], delta=1e-12, msg=scheme)
+
+                # Laplace operator
+                L=Laplace(N, Y, fft_form=fft_form, scheme=scheme)
+                D=Div(N, Y, fft_form=fft_form, scheme=scheme)
+                self.assertAlmostEqual(0, (L(F(u))==D(gFu))[1], delta=1e-10, msg=scheme)
+        print('...ok')
+
     def test_projections(self):
         print('\nChecking projections...')
 
@@ -202,5 +337,467 @@ class Test_operators(unittest.TestCase):
 
         print('...ok')
 
+    def test_fft_backends(self):
+        print('\nChecking FFT backends...')
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=dim*(4,)
+            u=Tensor(name='u', shape=(2,), N=N, Fourier=False, fft_form=fft_form).randomize()
+            Fu=DFT(N=N, fft_form=fft_form)(u)
+            for backend in fft.backends:
+                if not fft.available[backend]:
+                    continue
+                F=DFT(N=N, fft_form=fft_form, fft_backend=fft.get_backend(backend, threads=2))
+                iF=DFT(N=N, fft_form=fft_form, inverse=True, fft_backend=backend)
+                Fu2=F(u)
+                self.assertAlmostEqual(0, (Fu==Fu2)[1], delta=1e-13, msg=backend)
+                self.assertAlmostEqual(0, (u==iF(Fu2))[1], delta=1e-13, msg=backend)
+                self.assertAlmostEqual(0, (Fu==F(u))[1], delta=1e-13, msg='cached plan')
+
+                u2=u.copy(fft_backend=backend)
+                self.assertAlmostEqual(0, (Fu==u2.fourier(copy=True))[1], delta=1e-13)
+
+        self.assertIsInstance(fft.get_backend('numpy'), fft.FFTBackend)
+
+        # batches of components transformed by numpy in chunks
+        chunk=fft.config['chunk']
+        try:
+            for dim, fft_form in itertools.product([2, 3], fft_forms):
+                N=dim*(4,)
+                u=Tensor(name='u', shape=(3, 2), N=N, Fourier=False, fft_form=fft_form).randomize()
+                F=DFT(N=N, fft_form=fft_form)
+                iF=DFT(N=N, fft_form=fft_form, inverse=True)
+                Fu=F(u)
+                fft.config['chunk']=2*4**dim
+                fft.clear_plans()
+                Fu2=F(u)
+                self.assertAlmostEqual(0, (Fu==Fu2)[1], delta=1e-13)
+                self.assertAlmostEqual(0, (u==iF(Fu2))[1], delta=1e-13)
+                v=iF(Fu2, out=iF.empty_output(Fu2))
+                self.assertAlmostEqual(0, (u==v)[1], delta=1e-13)
+                fft.config['chunk']=chunk
+                fft.clear_plans()
+        finally:
+            fft.config['chunk']=chunk
+            fft.clear_plans()
+        print('...ok')
+
+    def test_single_precision(self):
+        print('\nChecking tensors in single precision...')
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=dim*(5,)
+            u=Tensor(name='u', shape=(2,), N=N, Fourier=False, fft_form=fft_form).randomize()
+            u32=u.astype(np.float32)
+            self.assertEqual(Tensor(shape=(2,), N=N, dtype=np.float32).val.dtype, np.float32)
+            Fu=DFT(N=N, fft_form=fft_form)(u)
+            for backend in fft.backends:
+                if not fft.available[backend]:
+                    continue
+                F=DFT(N=N, fft_form=fft_form, fft_backend=backend)
+                iF=DFT(N=N, fft_form=fft_form, inverse=True, fft_backend=backend)
+                Fu32=F(u32)
+                self.assertEqual(Fu32.val.dtype, np.complex64, msg=backend)
+                self.assertEqual(iF(Fu32).val.dtype, np.float32, msg=backend)
+                self.assertAlmostEqual(0, (Fu==Fu32)[1], delta=1e-5, msg=backend)
+                self.assertAlmostEqual(0, (u32==iF(Fu32))[1], delta=1e-5, msg=backend)
+
+            scal=Fu32.__mul__(Fu32, dtype=np.float64)
+            self.assertIsInstance(scal, np.float64)
+            self.assertAlmostEqual(0, scal/(Fu*Fu)-1., delta=1e-6)
+        print('...ok')
+
+    def test_dft_out(self):
+        print('\nChecking DFT with output buffers...')
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=dim*(4,)
+            F=DFT(N=N, fft_form=fft_form)
+            iF=DFT(N=N, fft_form=fft_form, inverse=True)
+            u=Tensor(name='u', shape=(dim,), N=N, Fourier=False, fft_form=fft_form).randomize()
+            Fu=F(u)
+
+            Fv=F.empty_output(u)
+            v=iF.empty_output(Fv)
+            val_Fv, val_v=Fv.val, v.val
+            for _ in range(2): # the buffers are reused
+                Fv=F(u, out=Fv)
+                v=iF(Fv, out=v)
+            self.assertTrue(Fv.val is val_Fv and v.val is val_v)
+            self.assertAlmostEqual(0, (Fu==Fv)[1], delta=1e-13)
+            self.assertAlmostEqual(0, (u==v)[1], delta=1e-13)
+
+            w=u.fourier(copy=True)
+            w=w.fourier(out=v.zeros_like())
+            self.assertAlmostEqual(0, (u==w)[1], delta=1e-13)
+        print('...ok')
+
+    def test_centered_fft(self):
+        print('\nChecking centered FFT without shifts...')
+        for N, backend in itertools.product([(5,), (4, 6), (5, 4), (3, 5, 4)],
+                                            [b for b in fft.backends if fft.available[b]]):
+            axes=tuple(range(1, len(N)+1))
+            x=np.random.random((2,)+N)
+            Fx=np.fft.fftshift(np.fft.fftn(x, N, axes=axes), axes=axes)/np.prod(N)
+            Cx=np.fft.fftshift(np.fft.fftn(np.fft.ifftshift(x, axes=axes), N, axes=axes),
+                               axes=axes)
+            self.assertAlmostEqual(0, norm(fft.fftnc(x, N, backend=backend)-Fx), delta=1e-13)
+            self.assertAlmostEqual(0, norm(fft.cfftnc(x, N, backend=backend)-Cx/np.prod(N)),
+                                   delta=1e-13)
+            self.assertAlmostEqual(0, norm(fft.icfftn(Fx, N, backend=backend)-x), delta=1e-13)
+            self.assertAlmostEqual(0, norm(fft.icfftnc(Cx/np.prod(N), N, backend=backend)-x),
+                                   delta=1e-13)
+            out=np.empty(x.shape, dtype=np.complex128) # phase modulation in the output
+            self.assertIs(fft.cfftnc(x, N, backend=backend, out=out), out)
+            self.assertAlmostEqual(0, norm(out-Cx/np.prod(N)), delta=1e-13)
+        # the phases are cached up to the memory cap
+        phases=fft.config['phases']
+        self.assertLessEqual(phases.nbytes, phases.maxsize)
+        self.assertIn(((3, 5, 4), 'in', False, 1./60, np.dtype(np.float64).str), phases)
+        # ... and all of them are read-only
+        fft.config['phases']=cache.KernelCache(maxsize=0)
+        try:
+            self.assertFalse(fft.get_phase((3, 4)).flags.writeable)
+        finally:
+            fft.config['phases']=phases
+        print('...ok')
+
+    def test_fft_wisdom(self):
+        print('\nChecking on-disk store of FFT plans...')
+        import tempfile
+        with tempfile.TemporaryDirectory() as path:
+            store=fft.WisdomStore(path)
+            key=('pyfftw', '0.0', 'fftn', (2, 5, 5), (1, 2), '<c16', 2)
+            self.assertIsNone(store.load(key))
+            store.save(key, (b'a', b'b', b''))
+            self.assertEqual(store.load(key), (b'a', b'b', b''))
+            self.assertEqual(os.listdir(path), [os.path.basename(store.filename(key))])
+
+            if fft.available['pyfftw']:
+                wisdom=fft.get_wisdom()
+                try:
+                    fft.set_wisdom(path)
+                    x=np.random.random((2, 7, 9))
+                    for _ in range(2): # the second backend loads the stored plan
+                        b=fft.PyFFTWBackend(threads=1)
+                        Fx=fft.fftn(x, (7, 9), backend=b)
+                        self.assertAlmostEqual(0, norm(Fx-np.fft.fftn(x, (7, 9))/63),
+                                               delta=1e-13)
+                    self.assertEqual(len(os.listdir(path)), 2)
+                finally:
+                    fft.config['wisdom']=wisdom
+            store.clear()
+            self.assertEqual(os.listdir(path), [])
+        print('...ok')
+
+    def test_compiled_operator(self):
+        print('\nChecking compiled operators...')
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=np.array(dim*[5])
+            D=int(dim*(dim+1)/2)
+            F=DFT(N=N, fft_form=fft_form)
+            iF=DFT(N=N, fft_form=fft_form, inverse=True)
+            _, hG1, hG2=proj.scalar(N, np.ones(dim), fft_form=fft_form)
+            G1=Operator(name='G1', mat=[[iF, hG1, F]])
+            G2=Operator(name='G2', mat=[[iF, hG2, F]])
+            A=Tensor(name='A', shape=(dim, dim), N=N, multype=21, fft_form=fft_form)
+            A.randomize()
+            x=Tensor(name='x', shape=(dim,), N=N, fft_form=fft_form).randomize()
+            GA=Operator(name='GA', mat=[[G1, A]])
+            G=Operator(name='G', mat=[[G1], [G2], [A]]) # with summands
+            for Afun in [G1, GA, G, Operator(name='AA', mat=[[A, A]])]:
+                Cfun=Afun.compile(x)
+                Ax=Afun(x)
+                for _ in range(2): # the buffers are reused
+                    self.assertTrue((Ax==Cfun(x))[0], msg=Afun.name)
+                self.assertTrue(Cfun(x) is Cfun(x.randomize()))
+                out=Cfun(x, out=x.zeros_like())
+                self.assertTrue((Afun(x)==out)[0])
+
+            # matrix-free projection of elasticity
+            A=Tensor(name='A', shape=(D, D), N=N, multype=21, fft_form=fft_form).randomize()
+            e=Tensor(name='e', shape=(D,), N=N, fft_form=fft_form).randomize()
+            hG=ElasticityProjection(N, np.ones(dim), fft_form=fft_form)
+            GA=Operator(name='GA', mat=[[iF, hG, F, A]])
+            self.assertTrue((GA(e)==GA.compile(e)(e))[0])
+
+            # the buffers are allocated without evaluation of the factors
+            calls=[]
+            class CountedDFT(DFT):
+                def __call__(self, x, out=None):
+                    calls.append(self.name)
+                    return DFT.__call__(self, x, out=out)
+            GA=Operator(name='GA', mat=[[iF, hG, CountedDFT(N=N, fft_form=fft_form), A]])
+            for X in [e, stack([e, e])]:
+                Cfun=GA.compile(X)
+                self.assertEqual(len(calls), 0)
+                self.assertTrue((GA(X)==Cfun(X))[0])
+                del calls[:]
+            prt.disable()
+            print(Cfun)
+            prt.enable()
+        print('...ok')
+
+    def test_vector_interface(self):
+        print('\nChecking one-dimensional vector interface...')
+        import scipy.sparse.linalg as spslin
+        for dim, fft_form in itertools.product([2, 3], fft_forms):
+            N=np.array(dim*[4])
+            x=Tensor(name='x', shape=(dim,), N=N, fft_form=fft_form).randomize()
+            xvec=x.vec()
+            self.assertEqual(xvec.shape, (x.val.size,))
+            self.assertTrue(np.shares_memory(xvec, x.val))
+            y=x.revec(xvec)
+            self.assertTrue(np.shares_memory(y.val, xvec))
+            self.assertTrue((x==y)[0])
+            Fx=DFT(N=N, fft_form=fft_form)(x)
+            self.assertTrue((Fx==Fx.revec(Fx.vec()))[0])
+
+            F=DFT(N=N, fft_form=fft_form)
+            iF=DFT(N=N, fft_form=fft_form, inverse=True)
+            _, hG1, _=proj.scalar(N, np.ones(dim), fft_form=fft_form)
+            A=Tensor(name='A', shape=(dim, dim), N=N, multype=21, fft_form=fft_form)
+            A.randomize() # non-symmetric
+            for Afun in [Operator(name='A', mat=[[A]]),
+                         Operator(name='GA', mat=[[iF, hG1, F, A]])]:
+                Afun.define_operand(x)
+                u, v=np.random.random(x.val.size), np.random.random(x.val.size)
+                Au=Afun.matvec(u)
+                self.assertIsInstance(Au, np.ndarray)
+                self.assertEqual(Au.shape, u.shape)
+                self.assertAlmostEqual(0, norm(Au-Afun(x.revec(u)).vec()), delta=1e-13)
+                self.assertFalse(np.shares_memory(Au, Afun.matvec(v))) # results are not reused
+                self.assertAlmostEqual(0, v.dot(Au)-Afun.rmatvec(v).dot(u), delta=1e-12)
+
+                L=spslin.LinearOperator(Afun.matshape, matvec=Afun.matvec, rmatvec=Afun.rmatvec)
+                self.assertAlmostEqual(0, norm(L.matvec(u)-Au), delta=1e-13)
+                self.assertAlmostEqual(0, norm(L.rmatvec(v)-Afun.rmatvec(v)), delta=1e-13)
+        print('...ok')
+
+    def test_kernel_cache(self):
+        print('\nChecking cache of kernels...')
+        import tempfile
+        config=cache.get_cache()
+        try:
+            N, Y=np.array([5, 6]), np.array([1., 2.])
+            G=proj.scalar(N, Y, NyqNul=True, fft_form='r')
+            kc=cache.set_cache(maxsize=3*G[0].val.nbytes)
+            G1=proj.scalar(N, Y, NyqNul=True, fft_form='r')
+            G2=proj.scalar(N, Y, NyqNul=True, fft_form='r')
+            self.assertEqual((kc.misses, kc.hits), (1, 1))
+            self.assertTrue(G2[1].val.base is G1[1].val.base)
+            self.assertFalse(G2[1].val.flags.writeable)
+            with self.assertRaises(ValueError): # in-place operations need a copy
+                G2[1].val*=2
+            for G0k, G1k in zip(G, G1):
+                self.assertTrue((G0k==G1k)[0])
+
+            # kernels of other grids evict the least recently used ones
+            proj.scalar(N, Y, NyqNul=False, fft_form='r')
+            self.assertEqual(len(kc), 1)
+            proj.scalar(N, Y, NyqNul=True, fft_form='r')
+            self.assertEqual(kc.misses, 3)
+
+            # enlarge of cached kernel does not modify it
+            hG1=G1[1].enlarge(2*N)
+            self.assertEqual(G1[1].fft_form, 'r')
+            self.assertTrue((G1[1]==G[1])[0])
+            self.assertTrue((hG1.decrease(N)==G[1])[0])
+
+            # kernels are shared by processes through the on-disk store
+            with tempfile.TemporaryDirectory() as path:
+                cache.set_cache(path=path)
+                hGrad=grad_tensor(N, Y)
+                self.assertEqual(len(os.listdir(path)), 1)
+                kc=cache.set_cache(path=path) # new process
+                hGrad2=grad_tensor(N, Y)
+                self.assertIsInstance(hGrad2.val.base, np.memmap)
+                self.assertNotIsInstance(hGrad2.val, np.memmap)
+                self.assertTrue((hGrad==hGrad2)[0])
+                kc.clear(disk=True)
+                self.assertEqual(os.listdir(path), [])
+
+            kc=cache.set_cache(enable=False)
+            proj.scalar(N, Y)
+            self.assertEqual(len(kc), 0)
+        finally:
+            cache.config['cache']=config
+        print('...ok')
+
+    def test_symmetric(self):
+        print('\nChecking tensors on mirror-symmetric cell...')
+        for N in [(5, 4), (4, 6), (3, 5, 4)]:
+            dim=len(N)
+            parity=(np.eye(dim, dtype=np.int)[0]+np.eye(dim, dtype=np.int)) % 2
+            # mirror-symmetric field with parity of minimizer of scalar problem
+            u=Tensor(name='u', shape=(dim,), N=N, Fourier=False, fft_form='s',
+                     parity=parity).randomize()
+            for ii in range(dim):
+                for ax in np.nonzero(parity[ii])[0]:
+                    u.val[ii][(slice(None),)*ax+([0, N[ax]//2] if N[ax] % 2 == 0 else 0,)]=0.
+            uf=u.unfold(fft_form=0)
+            self.assertTrue((u==uf.fold(parity))[0])
+            self.assertAlmostEqual(0, u.norm()-uf.norm(), delta=1e-13)
+            self.assertAlmostEqual(0, norm(u.mean()-uf.mean()), delta=1e-13)
+
+            Fu=DFT(N=N, fft_form='s')(u)
+            Fuf=DFT(N=N, fft_form=0)(uf)
+            self.assertAlmostEqual(0, Fu.norm()-Fuf.norm(), delta=1e-13)
+            for ii in range(dim):
+                val=Fuf.val[ii][tuple(slice(0, n//2+1) for n in N)]
+                self.assertAlmostEqual(0, norm(val-1j**parity[ii].sum()*Fu.val[ii]),
+                                       delta=1e-13)
+            self.assertTrue((u==DFT(N=N, fft_form='s', inverse=True)(Fu))[0])
+
+            # projection with kernel adjusted to the parity
+            _, hG1, _=proj.scalar(N, np.ones(dim), NyqNul=True, fft_form=0)
+            hG1s=symmetric_kernel(hG1, parity)
+            self.assertTrue((hG1(Fuf).fourier().fold(parity)==hG1s(Fu).fourier())[0])
+        print('...ok')
+
+    def test_matrix_free_projections(self):
+        print('\nChecking matrix-free projections...')
+        for dim, n, fft_form in itertools.product([2, 3], [5, 6], [0, 'r', 'c']):
+            N=np.array(dim*[n])
+            Y=np.random.random(dim)+0.5
+            for NyqNul, M in [(True, N), (False, N), (True, 2*N-1), (True, 2*N)]:
+                hG=proj.scalar(N, Y, NyqNul=NyqNul, fft_form=0)
+                u=Tensor(name='u', shape=(dim,), N=M, Fourier=False, fft_form=fft_form)
+                x=u.randomize().fourier(copy=True)
+                x0=x.set_fft_form(0, copy=True)
+                for kind, hGk in zip(['G0', 'G1', 'G2'], hG):
+                    P=ScalarProjection(N, Y, kind=kind, NyqNul=NyqNul, fft_form=fft_form)
+                    P=P.enlarge(M)
+                    Px=(hGk.enlarge(M)*x0).set_fft_form(fft_form)
+                    self.assertAlmostEqual(0, norm(P(x).val-Px.val), delta=1e-12,
+                                           msg='{} {} {}'.format(kind, M, fft_form))
+                    self.assertAlmostEqual(0, norm(P(x.astype(np.float32)).val-Px.val),
+                                           delta=1e-3*norm(x.val))
+
+                if not NyqNul: # real fields are not preserved at Nyquist frequencies
+                    continue
+                F=DFT(N=M, fft_form=fft_form)
+                iF=DFT(N=M, fft_form=fft_form, inverse=True)
+                G=Operator(name='G', mat=[[iF, P, F]])
+                self.assertAlmostEqual(0, (G(G(u))==G(u))[1], delta=1e-12)
+                prt.disable()
+                print(G)
+                prt.enable()
+
+        for dim, n, fft_form in itertools.product([2, 3], [5, 6], [0, 'r', 'c']):
+            N=np.array(dim*[n])
+            Y=np.random.random(dim)+0.5
+            D=int(dim*(dim+1)/2)
+            for NyqNul, M in [(True, N), (False, N), (True, 2*N-1)]:
+                hG=proj.elasticity(N, Y, NyqNul=NyqNul, fft_form=0)
+                x=Tensor(name='x', shape=(D,), N=M, Fourier=False, fft_form=fft_form)
+                x=x.randomize().fourier()
+                x0=x.set_fft_form(0, copy=True)
+                for kind, hGk in zip(['G0', 'G1', 'G2'], [hG[0], hG[1]+hG[2], hG[3]+hG[4]]):
+                    P=ElasticityProjection(N, Y, kind=kind, NyqNul=NyqNul, fft_form=fft_form)
+                    Px=(hGk.enlarge(M)*x0).set_fft_form(fft_form)
+                    self.assertAlmostEqual(0, norm(P.enlarge(M)(x).val-Px.val), delta=1e-12,
+                                           msg='{} {} {}'.format(kind, M, fft_form))
+
+            if dim==3: # full tensor notation
+                hG=elasticity_small_strain(N=N, Y=Y, fft_form=fft_form)
+                x=Tensor(name='x', shape=(dim, dim), N=N, Fourier=False, fft_form=fft_form)
+                x=x.randomize().fourier()
+                P=ElasticityProjection(N, Y, kind='G1', layout='full', NyqNul=False,
+                                       fft_form=fft_form)
+                self.assertAlmostEqual(0, norm(P(x).val-(hG*x).val), delta=1e-12)
+        print('...ok')
+
+    def test_green_operators(self):
+        print('\nChecking Green operators of reference media...')
+        for dim, fft_form, scheme in itertools.product([2, 3], fft_forms,
+                                                       ['spectral', 'central', 'forward']):
+            N=np.array([5, 4, 6][:dim])
+            Y=np.array([1., 2., 3.][:dim])
+            grids=[N, 2*N-1] if scheme in ['spectral'] else [N]
+            kwargs=dict(NyqNul=scheme in ['spectral'], fft_form=fft_form, scheme=scheme)
+            # the inverse of G*A0*G on the range of G is exact for colocated components
+            exact=scheme in ['spectral', 'central']
+            msg='dim={}, fft_form={}, scheme={}'.format(dim, fft_form, scheme)
+            for M, kind in itertools.product(grids, ['G1', 'G2']):
+                # scalar problem: reference conductivity (or resistivity for G2)
+                A0=np.eye(dim)+0.3*np.ones((dim, dim)) if kind in ['G1'] else 2.*np.eye(dim)
+                G=ScalarProjection(N, Y, kind=kind, **kwargs).enlarge(M)
+                Gamma=ScalarGreen(N, Y, A0, kind=kind, **kwargs).enlarge(M)
+                x=Tensor(name='x', shape=(dim,), N=M, Y=Y, fft_form=fft_form).randomize()
+                y=x.copy().randomize()
+                A0y=y.copy(val=np.einsum('ij,j...->i...', A0, y.val))
+                self.assertAlmostEqual(Gamma.scal(x, y), x*A0y, delta=1e-12, msg=msg)
+                x, y=x.fourier(), y.fourier()
+                self.assertAlmostEqual(Gamma(x)*y, x*Gamma(y), delta=1e-12, msg=msg)
+                if exact:
+                    Gx=G(x)
+                    AGx=Gx.copy(val=np.einsum('ij,j...->i...', A0, Gx.val))
+                    self.assertAlmostEqual(0, (Gamma(G(AGx))==Gx)[1], delta=1e-12, msg=msg)
+
+                # elasticity: isotropic reference stiffness (or compliance for G2)
+                h0, s0=3., 2.
+                pairs=ElasticTensor.get_mandel_pairs(dim)
+                m=np.array([1. if a==b else 0. for a, b in pairs])
+                J=np.outer(m, m)/dim
+                C0=h0*J+s0*(np.eye(len(pairs))-J)
+                G=ElasticityProjection(N, Y, kind=kind, **kwargs).enlarge(M)
+                Gamma=ElasticityGreen(N, Y, (h0, s0), kind=kind, **kwargs).enlarge(M)
+                x=Tensor(name='x', shape=(len(pairs),), N=M, Y=Y, fft_form=fft_form).randomize()
+                y=x.copy().randomize()
+                C0y=y.copy(val=np.einsum('ij,j...->i...', C0, y.val))
+                self.assertAlmostEqual(Gamma.scal(x, y), x*C0y, delta=1e-12, msg=msg)
+                x, y=x.fourier(), y.fourier()
+                self.assertAlmostEqual(Gamma(x)*y, x*Gamma(y), delta=1e-12, msg=msg)
+                if exact:
+                    Gx=G(x)
+                    CGx=Gx.copy(val=np.einsum('ij,j...->i...', C0, Gx.val))
+                    self.assertAlmostEqual(0, (Gamma(G(CGx))==Gx)[1], delta=1e-12, msg=msg)
+
+            if dim==3 and scheme in ['spectral']: # full tensor notation
+                Gamma=ElasticityGreen(N, Y, (h0, s0), layout='full', **kwargs)
+                x=Tensor(name='x', shape=(len(pairs),), N=N, Y=Y, fft_form=fft_form)
+                x=x.randomize().fourier()
+                xf=Tensor(name='x', shape=(dim, dim), N=N, Y=Y, Fourier=True, fft_form=fft_form)
+                for I, (a, b) in enumerate(pairs):
+                    c=1. if a==b else 2**-.5
+                    xf.val[a, b]=xf.val[b, a]=c*x.val[I]
+                res=Gamma(xf)
+                resm=ElasticityGreen(N, Y, (h0, s0), **kwargs)(x)
+                for I, (a, b) in enumerate(pairs):
+                    c=1. if a==b else 2**.5
+                    self.assertAlmostEqual(0, norm(c*res.val[a, b]-resm.val[I]), delta=1e-12)
+        print('...ok')
+
+    @unittest.skipIf(distributed.MPI is None, 'mpi4py is not available')
+    def test_distributed(self): # also with: mpirun -n 4 python -m pytest ...
+        print('\nChecking tensors distributed over MPI processes...')
+        for fft_form in [0, 'r']:
+            for N in [(5, 6), (4, 7, 6)]:
+                u=Tensor(name='u', shape=(2,), N=N, Fourier=False, fft_form=fft_form).randomize()
+                v=u.copy(name='v').randomize()
+                u=u.copy(val=distributed.MPI.COMM_WORLD.bcast(u.val))
+                v=v.copy(val=distributed.MPI.COMM_WORLD.bcast(v.val))
+                Fu, Fv=DFT(N=N, fft_form=fft_form)(u), DFT(N=N, fft_form=fft_form)(v)
+
+                ud, vd=distributed.distribute(u), distributed.distribute(v)
+                F=distributed.DistributedDFT(N=N, fft_form=fft_form)
+                iF=distributed.DistributedDFT(N=N, fft_form=fft_form, inverse=True)
+                Fud, Fvd=F(ud), F(vd)
+                self.assertTrue((Fu==Fud.gather())[0])
+                self.assertTrue((u==iF(Fud).gather())[0])
+                self.assertAlmostEqual(0, ud*vd-u*v, delta=1e-13)
+                self.assertAlmostEqual(0, Fud*Fvd-Fu*Fv, delta=1e-13)
+                self.assertAlmostEqual(0, Fud.norm()-Fu.norm(), delta=1e-13)
+                self.assertAlmostEqual(0, norm(ud.mean()-u.mean()), delta=1e-13)
+                self.assertAlmostEqual(0, norm(Fud.mean()-u.mean()), delta=1e-13)
+
+                # matrix-free projections on the local block of frequencies
+                dim=len(N)
+                w=Tensor(name='w', shape=(dim,), N=N, Fourier=False, fft_form=fft_form).randomize()
+                Fw=DFT(N=N, fft_form=fft_form)(w.copy(val=distributed.MPI.COMM_WORLD.bcast(w.val)))
+                Fwd=distributed.distribute(Fw)
+                for kind in ['G0', 'G1', 'G2']:
+                    hG=ScalarProjection(N, np.ones(dim), kind=kind, fft_form=fft_form)
+                    self.assertTrue((hG(Fw)==distributed.distribute(hG)(Fwd).gather())[0])
+        print('...ok')
+
 if __name__=="__main__":
     unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from ffthompy.tensors import Tensor
+from ffthompy.tensors import Tensor, SymmetricTensor, stack, unstack
+from ffthompy.tensors import objects, pointwise
 import numpy as np
 import itertools
 
@@ -46,6 +47,197 @@ class Test_tensors(unittest.TestCase):
             self.assertAlmostEqual(0, np.linalg.norm(u.val-uM.val[slc]), msg=msg)
         print('...ok')
 
+    def test_scalar_product(self):
+        print('\nChecking scalar products and norms...')
+
+        for dim, n, fft_form in itertools.product([2,3], [4,5], fft_forms):
+            msg='Tensors with: dim={}, n={}, fft_form={}'.format(dim, n, fft_form)
+            N=dim*(n,)
+
+            u=Tensor(name='u', shape=(dim,), N=N, Fourier=False, fft_form=fft_form)
+            v=u.copy(name='v')
+            u.randomize(), v.randomize()
+            Fu, Fv=u.fourier(copy=True), v.fourier(copy=True)
+
+            scal=np.sum(u.val*v.val)/np.prod(N)
+            self.assertAlmostEqual(scal, u*v, msg=msg)
+            self.assertAlmostEqual(scal, Fu*Fv, msg=msg) # Parseval's identity
+            self.assertAlmostEqual(u.norm()**2, Fu*Fu, msg=msg)
+
+            # norms of components
+            for ii in range(dim):
+                ui=u.copy(val=u.val[ii].copy(), order=0)
+                self.assertAlmostEqual(ui.norm(), u.norm(componentwise=True)[ii], msg=msg)
+                self.assertAlmostEqual(ui.fourier().norm(), Fu.norm(componentwise=True)[ii],
+                                       msg=msg)
+
+            # summation over chunks of fixed size and in higher precision
+            objects.summation['chunk']=7
+            try:
+                self.assertAlmostEqual(scal, u*v, msg=msg)
+                self.assertAlmostEqual(scal, Fu*Fv, msg=msg)
+                Fu32, Fv32=Fu.astype(np.float32), Fv.astype(np.float32)
+                self.assertAlmostEqual(scal, Fu32.__mul__(Fv32, dtype=np.float64), msg=msg,
+                                       delta=1e-5)
+            finally:
+                objects.summation['chunk']=None
+        print('...ok')
+
+    def test_axpy(self):
+        print('\nChecking in-place updates of Tensors...')
+        for dim, fft_form, Fourier, dtype in itertools.product([2,3], fft_forms, [False, True],
+                                                               [np.float64, np.float32]):
+            msg='Tensors with: dim={}, fft_form={}, Fourier={}'.format(dim, fft_form, Fourier)
+            N=dim*(5,)
+            x=Tensor(name='x', shape=(dim,), N=N, Fourier=Fourier, fft_form=fft_form,
+                     dtype=dtype).randomize()
+            y=x.copy(name='y').randomize()
+            for chunk in [None, 7]: # default and small chunks
+                if chunk is not None:
+                    objects.updates['chunk']=chunk
+                try:
+                    z=y.copy()
+                    val=z.val
+                    self.assertIs(z.axpy(0.3, x), z)
+                    self.assertIs(z.val, val)
+                    self.assertAlmostEqual(0, (z==y+0.3*x)[1], msg=msg, delta=1e-6)
+                    z=y.copy()
+                    val=z.val
+                    self.assertIs(z.xpay(x, 0.3), z)
+                    self.assertIs(z.val, val)
+                    self.assertAlmostEqual(0, (z==x+0.3*y)[1], msg=msg, delta=1e-6)
+                    self.assertEqual(z.val.dtype, y.val.dtype)
+                    # values in non-contiguous (transposed) layout
+                    z=y.copy(val=np.asfortranarray(y.val))
+                    self.assertAlmostEqual(0, (z.axpy(0.3, x)==y+0.3*x)[1], msg=msg,
+                                           delta=1e-6)
+                finally:
+                    objects.updates['chunk']=2**15
+        print('...ok')
+
+    def test_pointwise(self):
+        print('\nChecking strategies of pointwise products...')
+        threads=pointwise.config['threads']
+        pointwise.set_strategy('auto', threads=2)
+        try:
+            for dim, fft_form, multype in itertools.product([2,3], fft_forms, [21, 42]):
+                msg='Tensors with: dim={}, fft_form={}, multype={}'.format(dim, fft_form, multype)
+                N=dim*(5,)
+                shape=(dim,) if multype==21 else (dim, dim)
+                A=Tensor(name='A', shape=2*shape, N=N, Fourier=True, fft_form=fft_form,
+                         multype=multype).randomize()
+                x=Tensor(name='x', shape=shape, N=N, Fourier=False, fft_form=fft_form)
+                x=x.randomize().fourier() # values in the layout of FFT backend
+                oper='ij...,j...->i...' if multype==21 else 'ijkl...,kl...->ij...'
+                val=np.einsum(oper, A.val, x.val)
+                for strategy in pointwise.strategies+['auto']:
+                    res=pointwise.einsum(oper, A.val, x.val, strategy=strategy)
+                    self.assertAlmostEqual(0, np.linalg.norm(res-val), msg=msg, delta=1e-12)
+                    out=x.zeros_like()
+                    pointwise.einsum(oper, A.val, x.val, out=out.val, strategy=strategy)
+                    self.assertAlmostEqual(0, np.linalg.norm(out.val-val), msg=msg, delta=1e-12)
+                    pointwise.set_strategy(strategy)
+                    self.assertAlmostEqual(0, np.linalg.norm(A(x).val-val), msg=msg, delta=1e-12)
+                    pointwise.set_strategy('auto')
+                # result written to the operand
+                xval=x.val.copy()
+                self.assertIs(A(x, out=x), x)
+                self.assertAlmostEqual(0, np.linalg.norm(x.val-np.einsum(oper, A.val, xval)),
+                                       msg=msg, delta=1e-12)
+        finally:
+            pointwise.set_strategy('auto', threads=threads)
+        print('...ok')
+
+    def test_packed(self):
+        print('\nChecking Tensors in packed symmetric storage...')
+
+        for dim, n, fft_form in itertools.product([2,3], [4,5], fft_forms):
+            msg='Tensors with: dim={}, n={}, fft_form={}'.format(dim, n, fft_form)
+            N=dim*(n,)
+
+            A=Tensor(name='A', shape=(dim,dim), N=N, Fourier=False, multype=21)
+            A.randomize()
+            A=A+A.transpose()
+            PA=A.pack()
+            self.assertIsInstance(PA, SymmetricTensor)
+            self.assertEqual(PA.val.shape, (dim*(dim+1)//2,)+N, msg=msg)
+            self.assertTrue((A==PA.unpack())[0], msg=msg)
+            self.assertAlmostEqual(A.norm(), PA.norm(), msg=msg)
+
+            x=Tensor(name='x', shape=(dim,), N=N, Fourier=False)
+            x.randomize()
+            self.assertTrue((A*x==PA*x)[0], msg=msg)
+            out=x.zeros_like(name='out')
+            self.assertIs(PA(x, out=out), out)
+            self.assertTrue((A*x==out)[0], msg=msg)
+
+            # operations on the components (Fourier transform, change of fft_form)
+            FA, FPA=A.fourier(copy=True), PA.fourier(copy=True)
+            FA.set_fft_form(fft_form), FPA.set_fft_form(fft_form)
+            Fx=x.fourier(copy=True).set_fft_form(fft_form)
+            self.assertAlmostEqual(0, (FA*Fx==FPA*Fx)[1], msg=msg, delta=1e-10)
+
+            B=A.copy()
+            B.val[0,1]+=1.
+            self.assertRaises(ValueError, B.pack)
+        print('...ok')
+
+    def test_stacked(self):
+        print('\nChecking Tensors stacked along the load axis...')
+        from ffthompy.tensors.projection import ScalarProjection, ElasticityProjection
+        for dim, fft_form, multype in itertools.product([2,3], fft_forms, [21, 42]):
+            msg='Tensors with: dim={}, fft_form={}, multype={}'.format(dim, fft_form, multype)
+            N=dim*(5,)
+            shape=(dim,) if multype==21 else (dim, dim)
+            A=Tensor(name='A', shape=2*shape, N=N, Fourier=False, fft_form=fft_form,
+                     multype=multype).randomize()
+            xs=[Tensor(name='x', shape=shape, N=N, Fourier=False, fft_form=fft_form).randomize()
+                for _ in range(dim+1)]
+            X=stack(xs)
+            self.assertEqual(X.shape, (dim+1,)+shape, msg=msg)
+            for x, y in zip(xs, unstack(X)):
+                self.assertTrue((x==y)[0], msg=msg)
+
+            # products with all loads at once, also in the layout of FFT backend
+            for Fourier in [False, True]:
+                if Fourier:
+                    A, X=A.fourier(copy=True), X.fourier(copy=True)
+                for strategy in pointwise.strategies+['auto']:
+                    res=pointwise.einsum('ij...,lj...->li...' if multype==21
+                                         else 'ijkl...,mkl...->mij...', A.val, X.val,
+                                         strategy=strategy)
+                    for l, x in enumerate(unstack(X)):
+                        self.assertAlmostEqual(0, np.linalg.norm(res[l]-A(x).val), msg=msg,
+                                               delta=1e-12)
+                out=X.zeros_like()
+                self.assertIs(A(X, out=out), out)
+                for y, x in zip(unstack(out), unstack(X)):
+                    self.assertAlmostEqual(0, (y==A(x))[1], msg=msg, delta=1e-12)
+
+            # scalar products of all pairs of loads
+            G=objects.gram_matrix(X, X)
+            for (i, x), (j, y) in itertools.product(enumerate(unstack(X)), repeat=2):
+                self.assertAlmostEqual(G[i, j], x*y, msg=msg, delta=1e-12)
+
+            # symmetric coefficients in packed storage and matrix-free projections
+            if multype==21 and fft_form in [0, 'c', 'r']:
+                B=Tensor(name='B', shape=(dim, dim), N=N, Fourier=False, fft_form=fft_form,
+                         multype=21).randomize()
+                B=B+B.transpose()
+                Y=stack(xs)
+                res=B.pack()(Y)
+                for y, x in zip(unstack(res), xs):
+                    self.assertAlmostEqual(0, (y==B(x))[1], msg=msg, delta=1e-12)
+                for P, pshape in [(ScalarProjection(N, np.ones(dim), fft_form=fft_form), (dim,)),
+                                  (ElasticityProjection(N, np.ones(dim), layout='full',
+                                                        fft_form=fft_form), (dim, dim))]:
+                    Z=Tensor(name='Z', shape=(dim+1,)+pshape, N=N, Fourier=False,
+                             fft_form=fft_form).randomize().fourier()
+                    res=P(Z)
+                    for y, z in zip(unstack(res), unstack(Z)):
+                        self.assertAlmostEqual(0, (y==P(z))[1], msg=msg, delta=1e-12)
+        print('...ok')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -2,7 +2,7 @@ import numpy as np
 from ffthompy import Timer, Struct
 import ffthompy.tensors.projection as proj
 from ffthompy.general.solver import linear_solver
-from ffthompy.tensors import DFT, Operator, Tensor, grad_tensor, grad, div
+from ffthompy.tensors import DFT, Operator, Tensor, grad_tensor, grad, div, Grad, Div
 from ffthompy.trigpol import mean_index
 from ffthompy.tensorsLowRank.solver import linear_solver as linear_solver_lowrank
 from ffthompy.tensorsLowRank.projection import grad_tensor as sgrad_tensor
@@ -49,6 +49,8 @@ def homog_Ga_full_potential(Aga, pars):
     iF2=DFT(name='FiN', inverse=True, N=Nbar) # inverse DFT
 
     P = get_preconditioner(N, pars)
+    G=Grad(N) # gradient and (negative) divergence with precomputed frequencies
+    mD=Div(N, coef=-1.)
 
     E=np.zeros(dim); E[0]=1 # macroscopic load
     EN=Tensor(name='EN', N=Nbar, shape=(dim,), Fourier=False) # constant trig. pol.
@@ -56,9 +58,9 @@ def homog_Ga_full_potential(Aga, pars):
 
     def DFAFGfun(X):
         assert(X.Fourier)
-        FAX=F2(Aga*iF2(grad(X).enlarge(Nbar)))
+        FAX=F2(Aga*iF2(G(X).enlarge(Nbar)))
         FAX=FAX.project(N)
-        return -div(FAX)
+        return mD(FAX)
 
     B=div(F2(Aga(EN)).decrease(N))
     x0=Tensor(N=N, shape=(), Fourier=True) # initial approximation to solvers
@@ -92,6 +94,8 @@ def homog_GaNi_full_potential(Agani, Aga, pars):
     iF=DFT(name='FiN', inverse=True, N=N) # inverse DFT
 
     P = get_preconditioner(N, pars)
+    G=Grad(N) # gradient and (negative) divergence with precomputed frequencies
+    mD=Div(N, coef=-1.)
 
     E=np.zeros(dim); E[0]=1 # macroscopic load
     EN=Tensor(name='EN', N=N, shape=(dim,), Fourier=False) # constant trig. pol.
@@ -99,8 +103,8 @@ def homog_GaNi_full_potential(Agani, Aga, pars):
 
     def DFAFGfun(X):
         assert(X.Fourier)
-        FAX=F(Agani*iF(grad(X)))
-        return -div(FAX)
+        FAX=F(Agani*iF(G(X)))
+        return mD(FAX)
 
     B=div(F(Agani(EN)))
     x0=Tensor(N=N, shape=(), Fourier=True) # initial approximation to solvers
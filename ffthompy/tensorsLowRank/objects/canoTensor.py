@@ -2,6 +2,7 @@ import numpy as np
 from numpy import newaxis
 from ffthompy.tensorsLowRank.objects.tensors import LowRankTensorFuns
 from ffthompy.tensors import Tensor
+from ffthompy import kernels
 from ffthompy.tensorsLowRank.objects.tensors import fft_form_default
 from ffthompy.tensorsLowRank.decompositions import fast_qr
 
@@ -151,30 +152,9 @@ class CanoTensor(LowRankTensorFuns):
         else:
             coeff=np.kron(self.core, Y.core)
             newBasis=[None]*self.order
-            if self.Fourier and self.fft_form=='sr': # product of scipy rfft tensors need a special multiplication
-                for d in range(0, self.order):
-                    B=np.empty((self.r*Y.r, self.N[d]))
-                    B[:,0]=np.kron(self.basis[d][:,0],Y.basis[d][:,0])
-                    if self.N[d] % 2 != 0:
-                        ar=self.basis[d][:,1::2]
-                        ai=self.basis[d][:,2::2]
-                        br=Y.basis[d][:,1::2]
-                        bi=Y.basis[d][:,2::2]
-                        B[:,1::2]=(ar[:, newaxis, :]*br[newaxis, :, :]-ai[:, newaxis, :]*bi[newaxis, :, :]).reshape(self.r*Y.r,-1)
-                        B[:,2::2]=(ar[:, newaxis, :]*bi[newaxis, :, :]+ai[:, newaxis, :]*br[newaxis, :, :]).reshape(self.r*Y.r,-1)
-                    else:
-                        B[:,-1]=np.kron(self.basis[d][:,-1],Y.basis[d][:,-1])
-                        ar=self.basis[d][:,1:-1:2]
-                        ai=self.basis[d][:,2:-1:2]
-                        br=Y.basis[d][:,1:-1:2]
-                        bi=Y.basis[d][:,2:-1:2]
-                        B[:,1:-1:2]=(ar[:, newaxis, :]*br[newaxis, :, :]-ai[:, newaxis, :]*bi[newaxis, :, :]).reshape(self.r*Y.r,-1)
-                        B[:,2:-1:2]=(ar[:, newaxis, :]*bi[newaxis, :, :]+ai[:, newaxis, :]*br[newaxis, :, :]).reshape(self.r*Y.r,-1)
-                    newBasis[d]=B
-            else:
-                for d in range(0, self.order):
-                    newBasis[d]=np.multiply(self.basis[d][:, newaxis, :], Y.basis[d][newaxis, :, :])
-                    newBasis[d]=np.reshape(newBasis[d], (-1, self.N[d]))
+            sr=self.Fourier and self.fft_form=='sr' # product of scipy rfft tensors need a special multiplication
+            for d in range(0, self.order):
+                newBasis[d]=kernels.hadamard_basis(self.basis[d], Y.basis[d], sr=sr)
 
             return self.copy(name=self.name+'*'+Y.name, core=coeff, basis=newBasis, orthogonal=False)
 
@@ -4,6 +4,7 @@ from ffthompy.tensorsLowRank.objects.canoTensor import CanoTensor
 from ffthompy.tensorsLowRank.decompositions import fast_qr
 from ffthompy.tensorsLowRank.decompositions import HOSVD, nModeProduct, new_expand_dims
 from ffthompy.tensors import Tensor
+from ffthompy import kernels
 from ffthompy.tensorsLowRank.objects.tensors import fft_form_default
 from numpy.linalg import norm
 from numpy import newaxis
@@ -132,30 +133,9 @@ class Tucker(CanoTensor):
             assert((self.N==Y.N).any())
             newCore=np.kron(self.core, Y.core)
             newBasis=[None]*self.order
-            if self.Fourier and self.fft_form=='sr': # product of scipy rfft tensors need a special multiplication
-                for d in range(0, self.order):
-                    B=np.empty((self.r[d]*Y.r[d], self.N[d]))
-                    B[:,0]=np.kron(self.basis[d][:,0],Y.basis[d][:,0])
-                    if self.N[d] % 2 != 0:
-                        ar=self.basis[d][:,1::2]
-                        ai=self.basis[d][:,2::2]
-                        br=Y.basis[d][:,1::2]
-                        bi=Y.basis[d][:,2::2]
-                        B[:,1::2]=(ar[:, newaxis, :]*br[newaxis, :, :]-ai[:, newaxis, :]*bi[newaxis, :, :]).reshape(self.r[d]*Y.r[d],-1)
-                        B[:,2::2]=(ar[:, newaxis, :]*bi[newaxis, :, :]+ai[:, newaxis, :]*br[newaxis, :, :]).reshape(self.r[d]*Y.r[d],-1)
-                    else:
-                        B[:,-1]=np.kron(self.basis[d][:,-1],Y.basis[d][:,-1])
-                        ar=self.basis[d][:,1:-1:2]
-                        ai=self.basis[d][:,2:-1:2]
-                        br=Y.basis[d][:,1:-1:2]
-                        bi=Y.basis[d][:,2:-1:2]
-                        B[:,1:-1:2]=(ar[:, newaxis, :]*br[newaxis, :, :]-ai[:, newaxis, :]*bi[newaxis, :, :]).reshape(self.r[d]*Y.r[d],-1)
-                        B[:,2:-1:2]=(ar[:, newaxis, :]*bi[newaxis, :, :]+ai[:, newaxis, :]*br[newaxis, :, :]).reshape(self.r[d]*Y.r[d],-1)
-                    newBasis[d]=B
-            else:
-                for d in range(0, self.order):
-                    newBasis[d]=np.multiply(self.basis[d][:, newaxis, :], Y.basis[d][newaxis, :, :])
-                    newBasis[d]=np.reshape(newBasis[d], (-1, self.N[d]))
+            sr=self.Fourier and self.fft_form=='sr' # product of scipy rfft tensors need a special multiplication
+            for d in range(0, self.order):
+                newBasis[d]=kernels.hadamard_basis(self.basis[d], Y.basis[d], sr=sr)
 
             return Tucker(name=self.name+'*'+Y.name, core=newCore, basis=newBasis,
                           Fourier=self.Fourier, fft_form=self.fft_form)
@@ -377,16 +357,16 @@ if __name__=='__main__':
     t=t1*t2
     print(t)
 
-    start = time.clock()
+    start = time.perf_counter()
     tt=t.truncate(rank=2, fast=False)
-    print("time is {}".format(time.clock() - start))
+    print("time is {}".format(time.perf_counter() - start))
 
 #    print(tt)
     print((t-tt).norm())
 
-    start = time.clock()
+    start = time.perf_counter()
     tt2=t.truncate(rank=2, fast=True)
-    print("time is {}".format(time.clock() - start))
+    print("time is {}".format(time.perf_counter() - start))
 
     print((t-tt2).norm())
 #    # this is a rank-2 tensor
@@ -37,6 +37,8 @@ class Grid():
             xil[-1] = xil[-1][:int(np.fix(N[-1]/2)+1)]
         elif fft_form in [0]:
             xil = [np.fft.ifftshift(xi) for xi in xil]
+        elif fft_form in ['s']: # non-negative frequencies of mirror-symmetric cell
+            xil = [np.fft.ifftshift(xi)[:int(np.fix(N[m]/2)+1)] for m, xi in enumerate(xil)]
         return xil
 
     @staticmethod
@@ -213,12 +215,220 @@ def decrease(xN, M):
     slc=[slice(ibeg[i],iend[i],1) for i in range(N.size)]
     return xN[tuple(slc)]
 
+def get_kernel_freq(N, Y, fft_form=fft_form_default):
+    """
+    Frequencies of discrete kernels in the layout of fft_form (e.g. half-spectrum
+    of numpy.fft.rfftn for fft_form='r') as arrays that broadcast over the grid.
+
+    Returns
+    -------
+    xi : list of numpy.ndarray
+        frequencies along every axis of shape (1,...,1,n,1,...,1)
+    N_fft : tuple
+        shape of the kernels in Fourier space
+    """
+    d = np.size(N)
+    xil = Grid.get_xil(N, Y, fft_form=fft_form)
+    xi = []
+    for m in range(d):
+        Nshape = np.ones(d, dtype=np.int)
+        Nshape[m] = xil[m].size
+        xi.append(np.reshape(xil[m], Nshape))
+    N_fft = tuple(xil[m].size for m in range(d))
+    return xi, N_fft
+
+derivative_schemes = ['spectral', 'central', 'forward', 'backward', 'rotated']
+
+def get_derivative_freq(N, Y, fft_form=fft_form_default, scheme='spectral', common=True):
+    """
+    Modified frequencies of discrete derivatives on the grid N (with the step
+    h=Y/N) in the layout of fft_form (see get_kernel_freq); the derivative
+    along axis m is the Fourier multiplier 2*pi*1j*shift[m]*xi[m], where
+    shift[m] is the phase factor of staggered schemes.
+
+    scheme='spectral' : derivative of trigonometric polynomials, xi=k/Y
+    scheme='central' : central differences, xi=sin(2*pi*k/N)/(2*pi*h)
+    scheme='forward', 'backward' : forward (backward) differences located at
+        midpoints of the grid, xi=sin(pi*k/N)/(pi*h), shift=exp(+-1j*pi*k/N)
+    scheme='rotated' : rotated scheme (Willot, 2015), i.e. forward differences
+        averaged over the edges of grid cells and located at their centres,
+        xi[m]=sin(pi*k[m]/N[m])/(pi*h[m])*prod_{l!=m} cos(pi*k[l]/N[l])
+
+    Parameters
+    ----------
+    common : bool
+        if False, the phase factor common to all axes (of scheme 'rotated'),
+        which cancels in projections, is omitted
+
+    Returns
+    -------
+    xi : list of numpy.ndarray
+        real frequencies that broadcast over the grid
+    shift : list of numpy.ndarray or None
+        phase factors; None if they are equal to one
+    N_fft : tuple
+        shape of the kernels in Fourier space
+    """
+    if scheme not in derivative_schemes:
+        raise NotImplementedError('Derivative scheme ({})'.format(scheme))
+    xi, N_fft = get_kernel_freq(N, Y, fft_form=fft_form)
+    if scheme in ['spectral']:
+        return xi, None, N_fft
+
+    d = np.size(N)
+    h = np.array(Y, dtype=np.float)/np.array(N, dtype=np.float)
+    arg = [np.pi*xi[m]*h[m] for m in range(d)] # pi*k/N
+    shift = None
+    if scheme in ['central']:
+        xi = [np.sin(2*arg[m])/(2*np.pi*h[m]) for m in range(d)]
+    elif scheme in ['forward', 'backward']:
+        xi = [np.sin(arg[m])/(np.pi*h[m]) for m in range(d)]
+        sign = 1 if scheme in ['forward'] else -1
+        shift = [np.exp(sign*1j*arg[m]) for m in range(d)]
+    elif scheme in ['rotated']:
+        cos = [np.cos(arg[m]) for m in range(d)]
+        xi = []
+        for m in range(d):
+            val = np.sin(arg[m])/(np.pi*h[m])
+            for l in range(d):
+                if l != m:
+                    val = val*cos[l]
+            xi.append(val)
+        if common:
+            shift = d*[np.exp(1j*sum(arg))]
+    return xi, shift, N_fft
+
+def get_derivative_factors(N, Y, fft_form=fft_form_default, scheme='spectral'):
+    """
+    Fourier multipliers 2*pi*1j*shift[m]*xi[m] of discrete derivatives (see
+    get_derivative_freq) as products of one-dimensional factors that
+    broadcast over the grid, i.e. the kernels are not stored on the grid.
+
+    Returns
+    -------
+    factors : list
+        the derivative along axis m is the product of arrays in factors[m]
+    N_fft : tuple
+        shape of the kernels in Fourier space
+    """
+    if scheme not in ['rotated']:
+        xi, shift, N_fft = get_derivative_freq(N, Y, fft_form=fft_form, scheme=scheme)
+        factors = []
+        for m in range(np.size(N)):
+            factor = 2*np.pi*1j*xi[m]
+            if shift is not None:
+                factor = factor*shift[m]
+            factors.append([factor])
+        return factors, N_fft
+
+    xi, N_fft = get_kernel_freq(N, Y, fft_form=fft_form)
+    d = np.size(N)
+    h = np.array(Y, dtype=np.float)/np.array(N, dtype=np.float)
+    arg = [np.pi*xi[m]*h[m] for m in range(d)] # pi*k/N
+    # the common phase factor exp(1j*sum(arg)) is split between the axes
+    factors = []
+    for m in range(d):
+        factor = [2*np.pi*1j*np.sin(arg[m])/(np.pi*h[m])*np.exp(1j*arg[m])]
+        factor += [np.cos(arg[l])*np.exp(1j*arg[l]) for l in range(d) if l != m]
+        factors.append(factor)
+    return factors, N_fft
+
+def zero_nyquist(val, N, fft_form=fft_form_default):
+    """
+    Sets (in place) the values of kernel (of shape (...)+N_fft) at Nyquist
+    frequencies of even N to zero.
+    """
+    order = val.ndim-np.size(N)
+    for m, n in enumerate(N):
+        if n % 2 == 0:
+            ind = 0 if fft_form in ['c'] else n//2
+            val[(order+m)*(slice(None),)+(ind,)] = 0
+    return val
+
 def get_Nodd(N):
     Nodd = N - ((N + 1) % 2)
     return Nodd
 
 def mean_index(N, fft_form=fft_form_default):
-    if fft_form in [0, 'r']:
+    if fft_form in [0, 'r', 's']:
         return tuple(np.zeros_like(N, dtype=np.int))
     elif fft_form in ['c']:
         return tuple(np.array(np.fix(np.array(N)/2), dtype=np.int))
+
+def get_Nsym(N):
+    """
+    Number of grid points (in every dimension) of the part of a mirror-symmetric
+    cell that is stored for fft_form='s'.
+    """
+    return tuple(np.array(np.fix(np.array(N)/2)+1, dtype=np.int))
+
+def get_sym_weights(N):
+    """
+    Weights of the grid points of the stored part of mirror-symmetric cell
+    (multiplicity of the points in the whole cell).
+    """
+    weights = np.ones(get_Nsym(N))
+    for ii, n in enumerate(N):
+        w = 2*np.ones(int(np.fix(n/2)+1))
+        w[0] = 1
+        if n % 2 == 0:
+            w[-1] = 1
+        Nshape = np.ones(len(N), dtype=np.int)
+        Nshape[ii] = w.size
+        weights = weights*np.reshape(w, Nshape)
+    return weights
+
+def mirror(xN, axis, n, odd=False):
+    """
+    Extends a part of mirror-symmetric array (points 0,...,fix(n/2)) along
+    one axis to the whole period of n points.
+
+    Parameters
+    ----------
+    xN : numpy.ndarray
+        values at non-negative grid points
+    axis : int
+        axis of mirroring
+    n : int
+        no. of grid points in the whole period
+    odd : bool
+        parity of the array along the axis; if True, it is mirrored as odd function
+    """
+    rest = np.flip(np.take(xN, np.arange(1, n-xN.shape[axis]+1), axis=axis), axis=axis)
+    if odd:
+        rest = -rest
+    return np.concatenate((xN, rest), axis=axis)
+
+def sym_fold(xN, N):
+    """
+    Restriction of mirror-symmetric array of shape (...)+N to non-negative grid points.
+    """
+    Nsym = get_Nsym(N)
+    slc = (xN.ndim-len(N))*[slice(None)]+[slice(0, n) for n in Nsym]
+    return xN[tuple(slc)]
+
+def sym_unfold(xN, N, parity):
+    """
+    Extension of array from non-negative grid points to the whole cell;
+    parity (of shape (...)+(dim,)) determines even (0) or odd (1) extension
+    of every component along every axis.
+    """
+    order = xN.ndim-len(N)
+    val = np.empty(xN.shape[:order]+tuple(N), dtype=xN.dtype)
+    for ind in np.ndindex(*xN.shape[:order]):
+        xi = xN[ind]
+        for ax, n in enumerate(N):
+            xi = mirror(xi, ax, n, odd=parity[ind][ax])
+        val[ind] = xi
+    return val
+
+def get_parity(parity, shape, dim):
+    """
+    Parity of components (of given shape) of mirror-symmetric tensor along every axis;
+    zeros (even components) are returned if parity is None.
+    """
+    if parity is None:
+        return np.zeros(tuple(shape)+(dim,), dtype=np.int)
+    parity = np.array(parity, dtype=np.int)
+    assert(parity.shape==tuple(shape)+(dim,))
+    return parity
@@ -0,0 +1,103 @@
+import unittest
+import itertools
+import numpy as np
+from numpy.linalg import norm
+from ffthompy import kernels
+from ffthompy.tensors import Tensor
+from ffthompy.tensors.projection import ScalarProjection, scalar
+try: # low-rank tensors (ffthompy.tensorsLowRank) require ttpy
+    import tt
+except ImportError:
+    tt=None
+
+# variants of kernels: numpy and compiled by Numba (if it is available)
+modes=[False]+([True] if kernels.numba is not None else [])
+
+
+def sr2complex(a):
+    # values in the real layout of scipy rfft to the complex half-spectrum
+    n=a.shape[-1]
+    c=np.zeros(a.shape[:-1]+(n//2+1,), dtype=np.complex)
+    c[..., 0]=a[..., 0]
+    c[..., 1:(n+1)//2]=a[..., 1:n-1+n%2:2]+1j*a[..., 2::2][..., :(n-1)//2]
+    if n % 2 == 0:
+        c[..., -1]=a[..., -1]
+    return c
+
+
+class Test_kernels(unittest.TestCase):
+
+    def setUp(self):
+        self.numba=kernels.use_numba()
+
+    def tearDown(self):
+        kernels.set_numba(self.numba)
+
+    def test_matvec(self):
+        print('\nChecking kernels of pointwise products...')
+        for mode, dim, fft_form in itertools.product(modes, [2, 3], [0, 'r']):
+            kernels.set_numba(mode)
+            msg='numba={}, dim={}, fft_form={}'.format(mode, dim, fft_form)
+            N=dim*(6,)
+            A=Tensor(shape=(dim, dim), N=N, Fourier=False, fft_form=fft_form).randomize()
+            x=Tensor(shape=(dim,), N=N, Fourier=False, fft_form=fft_form).randomize()
+            for Fourier in [False, True]:
+                if Fourier: # complex values in the layout of FFT backend
+                    A, x=A.fourier(copy=True), x.fourier(copy=True)
+                out=x.zeros_like()
+                kernels.matvec(A.val, x.val, out.val)
+                val=np.einsum('ij...,j...->i...', A.val, x.val)
+                self.assertAlmostEqual(0, norm(out.val-val), msg=msg, delta=1e-12)
+        print('...ok')
+
+    def test_scalar_projection(self):
+        print('\nChecking kernels of scalar projections...')
+        for mode, dim, fft_form, kind in itertools.product(modes, [2, 3], [0, 'c', 'r'],
+                                                           ['G1', 'G2']):
+            kernels.set_numba(mode)
+            msg='numba={}, dim={}, fft_form={}, kind={}'.format(mode, dim, fft_form, kind)
+            N=np.array(dim*(5,))
+            Y=np.ones(dim)
+            x=Tensor(shape=(dim,), N=N, Fourier=False, fft_form=fft_form).randomize().fourier()
+            hG=scalar(N, Y, fft_form=fft_form)[1 if kind in ['G1'] else 2]
+            P=ScalarProjection(N, Y, kind=kind, fft_form=fft_form)
+            self.assertAlmostEqual(0, (P(x)==hG*x)[1], msg=msg, delta=1e-12)
+            out=x.zeros_like()
+            self.assertIs(P(x, out=out), out)
+            self.assertAlmostEqual(0, (out==hG*x)[1], msg=msg, delta=1e-12)
+        print('...ok')
+
+    def test_hadamard_basis(self):
+        print('\nChecking kernels of Hadamard products of low-rank tensors...')
+        for mode, n in itertools.product(modes, [7, 8]):
+            kernels.set_numba(mode)
+            msg='numba={}, n={}'.format(mode, n)
+            a, b=np.random.random((3, n)), np.random.random((4, n))
+            val=np.einsum('ik,jk->ijk', a, b).reshape(-1, n)
+            self.assertAlmostEqual(0, norm(kernels.hadamard_basis(a, b)-val), msg=msg)
+            # product of complex values in the real layout of scipy rfft
+            val=np.einsum('ik,jk->ijk', sr2complex(a), sr2complex(b)).reshape(12, -1)
+            res=sr2complex(kernels.hadamard_basis(a, b, sr=True))
+            self.assertAlmostEqual(0, norm(res-val), msg=msg)
+        print('...ok')
+
+    @unittest.skipIf(tt is None, 'ttpy is not available')
+    def test_hadamard_lowrank(self):
+        print('\nChecking Hadamard products of low-rank tensors by all kernels...')
+        from ffthompy.tensorsLowRank.objects import SparseTensor
+        T2d, T3d=np.random.random((5, 7)), np.random.random((5, 6, 7))
+        for kind, T in [('cano', T2d), ('tucker', T3d)]:
+            for fft_form in [0, 'sr']:
+                a=SparseTensor(kind=kind, val=T, fft_form=fft_form).fourier()
+                b=SparseTensor(kind=kind, val=T**2, fft_form=fft_form).fourier()
+                res=[]
+                for mode in modes:
+                    kernels.set_numba(mode)
+                    res.append((a*b).full())
+                for r in res[1:]:
+                    self.assertAlmostEqual(0, norm(r-res[0]), msg=kind, delta=1e-12)
+        print('...ok')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import unittest
 import numpy as np
 from ffthompy import PrintControl
 from ffthompy.problem import Problem, import_file
+from ffthompy.tensors import distributed
 import pickle as Pickle
 import os
 import sys
@@ -14,6 +15,7 @@ prt=PrintControl()
 class Test_main(unittest.TestCase):
 
     def setUp(self):
+        np.random.seed(0) # reproducible random data of examples and tutorials
         self.input_files = ['examples/scalar/scalar_2d.py',
                             'examples/scalar/scalar_3d.py',
                             'examples/scalar/from_file.py',
@@ -33,11 +35,205 @@ class Test_main(unittest.TestCase):
             self.examples(input_file)
         print('...ok')
 
-    def examples(self, input_file): # test a particular example file
+    def test_symmetric(self): # examples on mirror-symmetric cell
+        print('\nControling input files with symmetric cell...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            self.examples(input_file, solve={'symmetric': True})
+        print('...ok')
+
+    def test_dense_kernels(self): # examples with projections stored as arrays
+        print('\nControling input files with dense kernels...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            self.examples(input_file, solve={'matrix_free': False})
+        print('...ok')
+
+    def test_packed(self): # examples with symmetric coefficients and kernels in packed storage
+        print('\nControling input files with packed storage...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            self.examples(input_file, solve={'packed': True})
+            self.examples(input_file, solve={'packed': True, 'matrix_free': False})
+            conf = import_file(input_file)
+            for scheme in ['forward', 'backward']:
+                solve = dict(conf.problems[0]['solve'], packed=True, matrix_free=False,
+                             derivative=scheme)
+                prob = Problem(dict(conf.problems[0], solve=solve), conf)
+                self.assertRaises(NotImplementedError, prob.calculate)
+        print('...ok')
+
+    def test_block(self): # examples with all loads solved at once by block CG
+        print('\nControling input files with block solver...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            conf = import_file(input_file)
+            for conf_problem in conf.problems:
+                # the iterates of block CG differ from CG; both solvers are converged
+                for solve in [{}, {'packed': True, 'matrix_free': False}]:
+                    outputs = []
+                    for block in [False, True]:
+                        solver = dict(conf_problem['solver'], block=block, tol=1e-11)
+                        prob = Problem(dict(conf_problem, solver=solver,
+                                            solve=dict(conf_problem['solve'], **solve)), conf)
+                        prt.disable()
+                        prob.calculate()
+                        prt.enable()
+                        outputs.append(prob.output)
+
+                    for primdual in prob.solve['primaldual']:
+                        kwpd = 'mat_'+primdual
+                        for kw in outputs[1][kwpd]:
+                            dif = outputs[1][kwpd][kw]-outputs[0][kwpd][kw]
+                            val = np.linalg.norm(dif.ravel(), np.inf)
+                            msg = 'Incorrect ({}) in problem ({})'.format(kw, prob.name)
+                            self.assertAlmostEqual(0, val, msg=msg, delta=1e-9)
+
+                    # one result (callback and iterations) per load
+                    for primdual in prob.solve['primaldual']:
+                        results = prob.output['res_'+primdual]
+                        self.assertEqual(len(set(id(res['cb']) for res in results)),
+                                         len(results))
+                        for res in results:
+                            self.assertEqual(len(res['cb'].res_norm), res['info']['kit']+1)
+                            self.assertLessEqual(res['info']['norm_res'], 1e-11)
+
+                solver = dict(conf_problem['solver'], block=True, callback='detailed')
+                prob = Problem(dict(conf_problem, solver=solver), conf)
+                self.assertRaises(NotImplementedError, prob.calculate)
+        print('...ok')
+
+    def test_precond(self): # examples with Green operator of reference medium as preconditioner
+        print('\nControling input files with preconditioned solvers...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            conf = import_file(input_file)
+            variants = [('CG', None), ('CG', 'reference'), ('richardson', 'reference')]
+            for conf_problem in conf.problems:
+                # the basic scheme (richardson) does not need the parameter alpha
+                outputs = []
+                for kind, precond in variants:
+                    solver = dict(conf_problem['solver'], kind=kind, precond=precond, tol=1e-11,
+                                  maxiter=int(1e4))
+                    solver.pop('alpha', None)
+                    prob = Problem(dict(conf_problem, solver=solver), conf)
+                    prt.disable()
+                    prob.calculate()
+                    prt.enable()
+                    outputs.append(prob.output)
+
+                for output in outputs[1:]:
+                    for primdual in prob.solve['primaldual']:
+                        kwpd = 'mat_'+primdual
+                        for kw in output[kwpd]:
+                            dif = output[kwpd][kw]-outputs[0][kwpd][kw]
+                            val = np.linalg.norm(dif.ravel(), np.inf)
+                            msg = 'Incorrect ({}) in problem ({})'.format(kw, prob.name)
+                            self.assertAlmostEqual(0, val, msg=msg, delta=1e-9)
+
+        # preconditioned CG needs fewer iterations for different contrasts of bulk and shear
+        from ffthompy.mechanics.matcoef import ElasticTensor
+        conf = import_file('examples/elasticity/linelas_3d.py')
+        material = dict(conf.materials['square'], vals=[ElasticTensor(bulk=1, mu=10).mandel,
+                                                        ElasticTensor(bulk=10, mu=1).mandel])
+        for conf_problem in conf.problems:
+            kits = []
+            for precond in [None, 'reference']:
+                solver = dict(conf_problem['solver'], precond=precond, tol=1e-11)
+                prob = Problem(dict(conf_problem, material=material, solver=solver), conf)
+                prt.disable()
+                prob.calculate()
+                prt.enable()
+                kits.append(sum(res['info']['kit'] for primdual in prob.solve['primaldual']
+                                for res in prob.output['res_'+primdual]))
+            msg = 'Iterations ({}) in problem ({})'.format(kits, prob.name)
+            self.assertLess(kits[1], kits[0], msg=msg)
+
+        # ... and for a high-contrast anisotropic conductivity (Ga scheme, primal formulation)
+        conf = import_file('examples/scalar/scalar_2d.py')
+        material = dict(conf.materials['square'], vals=[np.diag([1., 100.]), np.diag([10., 1000.])])
+        solve = dict(conf.problems[0]['solve'], N=15*np.ones(2, dtype=np.int32))
+        kits = []
+        for precond in [None, 'reference']:
+            solver = dict(conf.problems[0]['solver'], precond=precond)
+            prob = Problem(dict(conf.problems[0], material=material, solve=solve, solver=solver),
+                           conf)
+            prt.disable()
+            prob.calculate()
+            prt.enable()
+            kits.append(sum(res['info']['kit'] for res in prob.output['res_primal']))
+        msg = 'Iterations ({}) in problem ({})'.format(kits, prob.name)
+        self.assertLess(kits[1], kits[0], msg=msg)
+        print('...ok')
+
+    def test_derivative_schemes(self): # projections by finite differences
+        print('\nControling input files with finite-difference schemes...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            conf = import_file(input_file)
+            for conf_problem in conf.problems:
+                if conf_problem['solve']['kind'] != 'GaNi':
+                    continue
+                for scheme in ['central', 'forward', 'backward', 'rotated']:
+                    variants = [{}, {'matrix_free': False}]
+                    if scheme not in ['forward', 'backward']:
+                        variants.append({'symmetric': True})
+                    outputs = []
+                    for variant in variants:
+                        solve = dict(conf_problem['solve'], derivative=scheme, **variant)
+                        # the solvers converge far below the compared differences
+                        solver = dict(conf_problem['solver'], tol=1e-11)
+                        prob = Problem(dict(conf_problem, solve=solve, solver=solver), conf)
+                        prt.disable()
+                        prob.calculate()
+                        prt.enable()
+                        outputs.append(prob.output)
+
+                    # the same homogenized matrices by all variants of projections
+                    for output in outputs[1:]:
+                        for primdual in prob.solve['primaldual']:
+                            kwpd = 'mat_'+primdual
+                            for kw in output[kwpd]:
+                                ref = outputs[0][kwpd][kw]
+                                val = np.linalg.norm((output[kwpd][kw]-ref).ravel(), np.inf)
+                                delta = 1e-9*max(1., np.linalg.norm(ref.ravel(), np.inf))
+                                msg = 'Incorrect ({}) with scheme ({})'.format(kw, scheme)
+                                self.assertAlmostEqual(0, val, msg=msg, delta=delta)
+        print('...ok')
+
+    @unittest.skipIf(distributed.MPI is None, 'mpi4py is not available')
+    def test_distributed(self): # examples with grid distributed over MPI processes
+        print('\nControling input files with distributed grid...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            self.examples(input_file, solve={'distributed': True})
+        print('...ok')
+
+    def test_single_precision(self): # examples in single precision
+        print('\nControling input files in single precision...')
+        for input_file in ['examples/scalar/scalar_2d.py',
+                           'examples/elasticity/linelas_3d.py']:
+            print('  control of file: {}'.format(input_file))
+            self.examples(input_file, solve={'dtype': np.float32},
+                          solver={'tol': 1e-5, 'accumulate': np.float64}, delta=1e-4)
+        print('...ok')
+
+    def examples(self, input_file, solve=None, solver=None, delta=1e-9): # test an example file
         basen = os.path.basename(input_file)
         conf = import_file(input_file)
 
         for conf_problem in conf.problems:
+            if solve is not None:
+                conf_problem = dict(conf_problem, solve=dict(conf_problem['solve'], **solve))
+            if solver is not None:
+                conf_problem = dict(conf_problem, solver=dict(conf_problem['solver'], **solver))
             prob = Problem(conf_problem, conf)
             prt.disable()
             prob.calculate()
@@ -61,7 +257,7 @@ class Test_main(unittest.TestCase):
                     dif = prob.output[kwpd][kw]-res[kwpd][kw]
                     val = np.linalg.norm(dif.ravel(), np.inf)
                     msg = 'Incorrect ({}) in problem ({})'.format(kw, prob.name)
-                    self.assertAlmostEqual(0, val, msg=msg, delta=1e-9)
+                    self.assertAlmostEqual(0, val, msg=msg, delta=delta)
             prt.disable()
             prob.postprocessing()
             prt.enable()
@@ -82,6 +278,7 @@ if __name__ == "__main__":
     from ffthompy.mechanics.unittest_matcoef import Test_matcoef
     from ffthompy.general.unittest_solver import Test_solvers
     from ffthompy.unittest_materials import Test_materials
+    from ffthompy.unittest_kernels import Test_kernels
     from ffthompy.tensorsLowRank.unittest_sparse import Test_tensorsLowRank
 
     suite = unittest.TestSuite()
@@ -92,6 +289,7 @@ if __name__ == "__main__":
     suite.addTest(unittest.makeSuite(Test_matcoef))
     suite.addTest(unittest.makeSuite(Test_solvers))
     suite.addTest(unittest.makeSuite(Test_materials))
+    suite.addTest(unittest.makeSuite(Test_kernels))
     suite.addTest(unittest.makeSuite(Test_tensorsLowRank))
 
     runner=unittest.TextTestRunner()